@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+
+# The fields `build_filter` emits; anything else falls back to a metadata scan.
+FILTER_FIELDS = ("city", "county", "zip_code", "languages", "free_or_low_cost")
+
+BitKey = Tuple[str, Hashable]
+
+
+class BitmapIndex:
+    """
+    Inverted index from (field, value) to a bitset over row numbers, stored as
+    Python ints. List-valued fields set one bit per element, matching
+    Pinecone's array semantics. `evaluate` turns a metadata filter into one
+    bitset with AND/OR/AND-NOT, or returns None if the filter uses a field or
+    operator the index does not cover (callers then scan metadata instead).
+    Which bits a row holds is derived from its metadata, so updates pass the
+    row's previous metadata rather than the index keeping keys per row.
+    """
+
+    def __init__(self, fields: Sequence[str] = FILTER_FIELDS):
+        self.fields = tuple(fields)
+        self.universe = 0
+        self._bits: Dict[BitKey, int] = {}
+        self._present: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, metadata: Sequence[Dict[str, Any]], fields: Sequence[str] = FILTER_FIELDS) -> "BitmapIndex":
+        """Bulk build over rows 0..n-1; bitsets are packed from NumPy arrays, not set bit by bit."""
+        index = cls(fields)
+        rows: Dict[BitKey, List[int]] = defaultdict(list)
+        present: Dict[str, List[int]] = defaultdict(list)
+        for row, md in enumerate(metadata):
+            for key in index._keys(md):
+                rows[key].append(row)
+            for field in index.fields:
+                if field in (md or {}):
+                    present[field].append(row)
+        n = len(metadata)
+        index.universe = _pack(range(n), n)
+        index._bits = {key: _pack(r, n) for key, r in rows.items()}
+        index._present = {field: _pack(r, n) for field, r in present.items()}
+        return index
+
+    def copy(self) -> "BitmapIndex":
+        with self._lock:
+            other = BitmapIndex(self.fields)
+            other.universe = self.universe
+            other._bits = dict(self._bits)
+            other._present = dict(self._present)
+        return other
+
+    def save(self, path: str) -> None:
+        """Write every bitset to one `.npz` file: little-endian bytes plus a JSON list of keys."""
+        keys: List[Any] = [["$universe"]]
+        blobs = [self.universe]
+        for field, bits in self._present.items():
+            keys.append(["$present", field])
+            blobs.append(bits)
+        for (field, value), bits in self._bits.items():
+            keys.append([field, value])
+            blobs.append(bits)
+        raw = [b.to_bytes((b.bit_length() + 7) // 8, "little") for b in blobs]
+        offsets = np.concatenate([[0], np.cumsum([len(r) for r in raw])]).astype(np.int64)
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                fields=np.frombuffer(orjson.dumps(list(self.fields)), dtype=np.uint8),
+                keys=np.frombuffer(orjson.dumps(keys), dtype=np.uint8),
+                offsets=offsets,
+                bits=np.frombuffer(b"".join(raw), dtype=np.uint8),
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "BitmapIndex":
+        with np.load(path) as data:
+            index = cls(orjson.loads(data["fields"].tobytes()))
+            keys = orjson.loads(data["keys"].tobytes())
+            offsets = data["offsets"]
+            raw = data["bits"].tobytes()
+        for i, key in enumerate(keys):
+            bits = int.from_bytes(raw[offsets[i]:offsets[i + 1]], "little")
+            if key[0] == "$universe":
+                index.universe = bits
+            elif key[0] == "$present":
+                index._present[key[1]] = bits
+            else:
+                index._bits[(key[0], key[1])] = bits
+        return index
+
+    def set_row(self, row: int, metadata: Dict[str, Any], previous: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Index (or re-index) one row; only that row's bits change. `previous`
+        is the metadata the row was indexed with, if any.
+        """
+        bit = 1 << row
+        keys = self._keys(metadata)
+        with self._lock:
+            self._clear(bit, previous)
+            for key in keys:
+                self._bits[key] = self._bits.get(key, 0) | bit
+            for field in self.fields:
+                if field in (metadata or {}):
+                    self._present[field] = self._present.get(field, 0) | bit
+            self.universe |= bit
+
+    def clear_row(self, row: int, previous: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            self._clear(1 << row, previous)
+            self.universe &= ~(1 << row)
+
+    def evaluate(self, metadata_filter: Optional[Dict[str, Any]]) -> Optional[int]:
+        result = self.universe
+        for key, cond in (metadata_filter or {}).items():
+            if key in ("$and", "$or"):
+                parts = [self.evaluate(sub) for sub in cond]
+                if any(p is None for p in parts):
+                    return None
+                if key == "$and":
+                    for p in parts:
+                        result &= p
+                else:
+                    result &= _union(parts)
+            elif key in self.fields:
+                bits = self._field(key, cond)
+                if bits is None:
+                    return None
+                result &= bits
+            else:
+                return None
+        return result
+
+    def _field(self, field: str, cond: Any) -> Optional[int]:
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        present = self._present.get(field, 0)
+        out = self.universe
+        for op, arg in cond.items():
+            if op == "$eq":
+                bits = self._lookup(field, [arg])
+            elif op == "$in":
+                bits = self._lookup(field, arg)
+            elif op == "$ne":
+                eq = self._lookup(field, [arg])
+                bits = None if eq is None else present & ~eq
+            elif op == "$nin":
+                any_of = self._lookup(field, arg)
+                bits = None if any_of is None else present & ~any_of
+            elif op == "$exists":
+                bits = present if arg else self.universe & ~present
+            else:
+                return None
+            if bits is None:
+                return None
+            out &= bits
+        return out
+
+    def _lookup(self, field: str, values: Iterable[Any]) -> Optional[int]:
+        out = 0
+        for value in values:
+            if not isinstance(value, Hashable):
+                return None
+            out |= self._bits.get((field, value), 0)
+        return out
+
+    def _keys(self, metadata: Optional[Dict[str, Any]]) -> List[BitKey]:
+        keys: List[BitKey] = []
+        for field in self.fields:
+            value = (metadata or {}).get(field)
+            for v in (value if isinstance(value, list) else [value]):
+                if v is not None and isinstance(v, Hashable):
+                    keys.append((field, v))
+        return keys
+
+    def _clear(self, bit: int, previous: Optional[Dict[str, Any]]) -> None:
+        if not self.universe & bit:
+            return
+        # Without the row's old metadata, every bitset has to be checked.
+        keys = self._keys(previous) if previous is not None else list(self._bits)
+        for key in keys:
+            remaining = self._bits.get(key, 0) & ~bit
+            if remaining:
+                self._bits[key] = remaining
+            else:
+                self._bits.pop(key, None)
+        for field, bits in list(self._present.items()):
+            self._present[field] = bits & ~bit
+
+
+def bitset_rows(bits: int) -> np.ndarray:
+    """Row numbers set in `bits`, ascending."""
+    if bits <= 0:
+        return np.empty(0, dtype=np.int64)
+    raw = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder="little"))
+
+
+def _pack(rows: Iterable[int], n: int) -> int:
+    flags = np.zeros(max(n, 1), dtype=bool)
+    flags[list(rows)] = True
+    return int.from_bytes(np.packbits(flags, bitorder="little").tobytes(), "little")
+
+
+def _union(parts: List[int]) -> int:
+    out = 0
+    for p in parts:
+        out |= p
+    return out
@@ -0,0 +1,422 @@
+from __future__ import annotations
+
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .config import (
+    BM25_B, BM25_K1, BM25_MAX_POSTINGS, BM25_MAX_QUERY_TERMS, DATASTORE_BACKEND, DATASTORE_DB_PATH,
+    DOCS_PATH, JOURNAL_PATH, META_PATH,
+)
+from .journal import EditJournal
+from .jsonl_store import RecordStore
+from .record_db import RecordDB
+from .vector_backend import match_filter
+
+log = logging.getLogger(__name__)
+
+Hit = Dict[str, Any]
+
+# Metadata fields indexed alongside the record text; agency names are what exact-term queries target.
+NAME_FIELDS = ("resource_name", "organization_name")
+CATEGORY_FIELD = "categories"
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can do for from had has have he her his how i if in into is it its "
+    "me my no not of on or our she so than that the their them then there they this to was we were what "
+    "when where which who will with you your".split()
+)
+# Tombstoned rows are squeezed out once they are this share of all rows.
+COMPACT_RATIO = 0.25
+_EMPTY_ROWS = np.zeros(0, dtype=np.int32)
+_EMPTY_TFS = np.zeros(0, dtype=np.uint16)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased alphanumeric runs, so "WIC", "SNAP" and zip codes stay whole
+    terms. Stopwords and single letters are dropped and a plural "s" is
+    stripped from longer words ("pantries" stays as is; "meals" -> "meal").
+    """
+    out = []
+    for tok in _TOKEN.findall((text or "").lower()):
+        if tok in STOPWORDS or (len(tok) == 1 and not tok.isdigit()):
+            continue
+        if len(tok) > 4 and tok.endswith("s") and not tok.endswith(("ss", "ies")):
+            tok = tok[:-1]
+        out.append(tok)
+    return out
+
+
+def document_text(text: str, metadata: Optional[Dict[str, Any]]) -> str:
+    """The text a record is indexed under: its document text plus name, organization and categories."""
+    md = metadata or {}
+    parts = [text or ""]
+    parts.extend(str(md[f]) for f in NAME_FIELDS if md.get(f))
+    categories = md.get(CATEGORY_FIELD)
+    if isinstance(categories, str):
+        categories = [categories]
+    parts.extend(str(c) for c in categories or [] if c)
+    return " ".join(parts)
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index with integer term ids. Each term's
+    postings are two NumPy arrays (row numbers as int32, term frequencies as
+    uint16); new postings collect in Python lists and are folded into the
+    arrays the next time the term is searched.
+
+    Rows are append-only: updating a record tombstones its old row and adds a
+    new one, and the tombstones are squeezed out once they reach
+    COMPACT_RATIO of all rows. Until then document frequencies still count
+    them, which only nudges idf for terms of edited records.
+    """
+
+    def __init__(
+        self,
+        k1: float = BM25_K1,
+        b: float = BM25_B,
+        max_query_terms: int = BM25_MAX_QUERY_TERMS,
+        max_postings: int = BM25_MAX_POSTINGS,
+    ):
+        self.k1 = k1
+        self.b = b
+        self.max_query_terms = max_query_terms
+        self.max_postings = max_postings
+        self.vocab: Dict[str, int] = {}
+        self._rows: List[np.ndarray] = []
+        self._tfs: List[np.ndarray] = []
+        self._pending: Dict[int, Tuple[List[int], List[int]]] = {}
+        self._ids: List[Optional[str]] = []
+        self._row_of: Dict[str, int] = {}
+        self._lengths = np.zeros(1024, dtype=np.float32)
+        self._live = np.zeros(1024, dtype=bool)
+        self._total_length = 0.0
+        self._dead = 0
+        # Per-row k1 * (1 - b + b * length / avgdl); dead rows get inf so they score 0.
+        self._norm: Optional[np.ndarray] = None
+        # Postings scored by `search` so far; the budgets above bound it per query.
+        self.postings_scored = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def build(cls, records: Iterable[Tuple[str, str]], **kwargs: Any) -> "BM25Index":
+        """Index (id, text) pairs; later duplicates of an id replace earlier ones."""
+        index = cls(**kwargs)
+        for rid, text in records:
+            index.add(rid, text)
+        with index._lock:
+            for tid in list(index._pending):
+                index._postings(tid)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def __contains__(self, rid: object) -> bool:
+        return rid in self._row_of
+
+    # ---------- updates ----------
+    def add(self, rid: str, text: str) -> None:
+        """Index `text` under `rid`, replacing whatever was indexed for it before."""
+        counts = Counter(tokenize(text))
+        with self._lock:
+            self._remove(rid)
+            row = len(self._ids)
+            if row == len(self._lengths):
+                self._lengths = np.concatenate([self._lengths, np.zeros(row, dtype=np.float32)])
+                self._live = np.concatenate([self._live, np.zeros(row, dtype=bool)])
+            length = sum(counts.values())
+            self._ids.append(rid)
+            self._row_of[rid] = row
+            self._lengths[row] = length
+            self._live[row] = True
+            self._total_length += length
+            for term, tf in counts.items():
+                tid = self.vocab.get(term)
+                if tid is None:
+                    tid = self.vocab[term] = len(self._rows)
+                    self._rows.append(_EMPTY_ROWS)
+                    self._tfs.append(_EMPTY_TFS)
+                rows, tfs = self._pending.setdefault(tid, ([], []))
+                rows.append(row)
+                tfs.append(min(tf, 65535))
+            self._norm = None
+
+    def remove(self, rid: str) -> bool:
+        with self._lock:
+            removed = self._remove(rid)
+            if removed and self._dead > COMPACT_RATIO * len(self._ids):
+                self._compact()
+            return removed
+
+    def _remove(self, rid: str) -> bool:
+        row = self._row_of.pop(rid, None)
+        if row is None:
+            return False
+        self._live[row] = False
+        self._ids[row] = None
+        self._total_length -= float(self._lengths[row])
+        self._dead += 1
+        self._norm = None
+        return True
+
+    # ---------- search ----------
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        accept: Optional[Callable[[str], bool]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        The `top_k` best (id, score) pairs for `query`, best first. With
+        `accept`, ids it rejects are skipped and lower-ranked ones take their
+        place; candidates are checked best first, so it is called only a few
+        times past top_k.
+        """
+        top_k = max(0, int(top_k))
+        with self._lock:
+            n_live = len(self._row_of)
+            if not top_k or not n_live:
+                return []
+            terms = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+            if not terms:
+                return []
+            postings = sorted((self._postings(tid) for tid in terms), key=lambda p: len(p[0]))
+
+            n_rows = len(self._ids)
+            norm = self._norms()
+            scores = np.zeros(n_rows, dtype=np.float32)
+            budget = self.max_postings
+            # Rarest terms first; they carry almost all of the signal. Long stories and
+            # very common terms are cut off by the term and postings budgets.
+            for rows, tfs in postings[:self.max_query_terms]:
+                if not len(rows):
+                    continue
+                if len(rows) > budget and budget < self.max_postings:
+                    break
+                budget -= len(rows)
+                self.postings_scored += len(rows)
+                df = min(len(rows), n_live)
+                idf = math.log(1.0 + (n_live - df + 0.5) / (df + 0.5))
+                tf = tfs.astype(np.float32)
+                # A term occurs once per row in its postings, so plain fancy-index += is safe.
+                scores[rows] += np.float32(idf * (self.k1 + 1.0)) * tf / (tf + norm[rows])
+            return self._top(scores, top_k, accept)
+
+    def _top(
+        self,
+        scores: np.ndarray,
+        top_k: int,
+        accept: Optional[Callable[[str], bool]],
+    ) -> List[Tuple[str, float]]:
+        matched = int(np.count_nonzero(scores))
+        want = top_k if accept is None else top_k * 4
+        while True:
+            if matched > want:
+                head = np.argpartition(-scores, want - 1)[:want]
+            else:
+                head = np.flatnonzero(scores)
+            head = head[np.argsort(-scores[head], kind="stable")]
+            out: List[Tuple[str, float]] = []
+            for row in head:
+                if scores[row] <= 0:
+                    break
+                rid = self._ids[row]
+                if rid is None or (accept is not None and not accept(rid)):
+                    continue
+                out.append((rid, float(scores[row])))
+                if len(out) == top_k:
+                    return out
+            if len(head) >= matched:
+                return out
+            want *= 4
+
+    def _postings(self, tid: int) -> Tuple[np.ndarray, np.ndarray]:
+        pending = self._pending.pop(tid, None)
+        if pending is not None:
+            rows, tfs = pending
+            self._rows[tid] = np.concatenate([self._rows[tid], np.asarray(rows, dtype=np.int32)])
+            self._tfs[tid] = np.concatenate([self._tfs[tid], np.asarray(tfs, dtype=np.uint16)])
+        return self._rows[tid], self._tfs[tid]
+
+    def _norms(self) -> np.ndarray:
+        if self._norm is None:
+            n_rows = len(self._ids)
+            avgdl = max(self._total_length / max(1, len(self._row_of)), 1.0)
+            norm = self.k1 * (1.0 - self.b + self.b * self._lengths[:n_rows] / avgdl)
+            norm[~self._live[:n_rows]] = np.inf
+            self._norm = norm.astype(np.float32)
+        return self._norm
+
+    def _compact(self) -> None:
+        n_rows = len(self._ids)
+        live = self._live[:n_rows].copy()
+        remap = (np.cumsum(live) - 1).astype(np.int32)
+        for tid in range(len(self._rows)):
+            rows, tfs = self._postings(tid)
+            keep = live[rows]
+            self._rows[tid] = remap[rows[keep]]
+            self._tfs[tid] = tfs[keep]
+        self._ids = [rid for rid in self._ids if rid is not None]
+        self._row_of = {rid: row for row, rid in enumerate(self._ids)}
+        lengths = self._lengths[:n_rows][live]
+        self._lengths = np.zeros(max(1024, 2 * len(lengths)), dtype=np.float32)
+        self._lengths[:len(lengths)] = lengths
+        self._live = np.zeros(len(self._lengths), dtype=bool)
+        self._live[:len(lengths)] = True
+        self._dead = 0
+        self._norm = None
+
+
+# ---------- record sources ----------
+class _JsonlRecords:
+    """The prepared JSONL files with the admin edit journal replayed over them."""
+
+    def __init__(self, docs_path: str, meta_path: str, journal_path: str):
+        self.docs = RecordStore(docs_path)
+        self.meta = RecordStore(meta_path)
+        for entry in EditJournal(journal_path).entries():
+            if entry.get("op") == "record":
+                self.put(entry["id"], entry.get("text") or "", entry.get("metadata") or {})
+
+    def __iter__(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        for rid in sorted(set(self.docs) | set(self.meta), key=lambda x: str(x)):
+            yield rid, *self.get(rid)
+
+    def get(self, rid: str) -> Tuple[str, Dict[str, Any]]:
+        return (self.docs.get(rid) or {}).get("text") or "", self.meta.get(rid) or {}
+
+    def put(self, rid: str, text: str, metadata: Dict[str, Any]) -> None:
+        self.docs[rid] = {"id": rid, "text": text}
+        self.meta[rid] = metadata
+
+    def close(self) -> None:
+        self.docs.close()
+        self.meta.close()
+
+
+class _DBRecords:
+    """The admin SQLite database; edits are already there by the time the index hears of them."""
+
+    def __init__(self, path: str):
+        self.db = RecordDB(path)
+
+    def __iter__(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        return self.db.iter_records()
+
+    def get(self, rid: str) -> Tuple[str, Dict[str, Any]]:
+        row = self.db.get(rid)
+        return ("", {}) if row is None else (row[0], row[1])
+
+    def put(self, rid: str, text: str, metadata: Dict[str, Any]) -> None:
+        pass
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def _open_records():
+    if DATASTORE_BACKEND == "sqlite":
+        return _DBRecords(DATASTORE_DB_PATH)
+    return _JsonlRecords(DOCS_PATH, META_PATH, JOURNAL_PATH)
+
+
+class LexicalIndex:
+    """
+    BM25 over the admin's records (prepared JSONL + journal, or the SQLite
+    store), answering with hits shaped like vector hits: metadata is the
+    record's metadata plus `text`, as upserted. The index is built on a
+    background thread the first time it is asked for; until then `search`
+    returns None and callers stay dense-only. Admin edits reach it through
+    `update_record`, including edits made while it is still building.
+    """
+
+    def __init__(self, open_records: Callable[[], Any] = _open_records):
+        self._open_records = open_records
+        self.records: Any = None
+        self.index: Optional[BM25Index] = None
+        self.state = "idle"
+        self._edits: List[Tuple[str, str, Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start(self) -> None:
+        with self._lock:
+            if self.state != "idle":
+                return
+            self.state = "building"
+        threading.Thread(target=self._build, name="bm25-build", daemon=True).start()
+
+    def _build(self) -> None:
+        try:
+            t0 = time.perf_counter()
+            records = self._open_records()
+            index = BM25Index.build((rid, document_text(text, md)) for rid, text, md in records)
+            with self._lock:
+                # Edits that raced the build; replaying one that was already read is harmless.
+                for rid, text, md in self._edits:
+                    records.put(rid, text, md)
+                    index.add(rid, document_text(text, md))
+                self._edits.clear()
+                self.records, self.index, self.state = records, index, "ready"
+            log.info(
+                "Indexed %d records (%d terms) in %.2fs", len(index), len(index.vocab), time.perf_counter() - t0
+            )
+        except Exception as e:
+            log.exception("Building the lexical index failed: %s", e)
+            with self._lock:
+                self.state = "failed"
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+    ) -> Optional[List[Hit]]:
+        if not self.ready:
+            self.start()
+            return None
+        hits: Dict[str, Hit] = {}
+
+        def accept(rid: str) -> bool:
+            text, md = self.records.get(rid)
+            hit_md = {**md, "text": text}
+            if not match_filter(hit_md, metadata_filter):
+                return False
+            hits[rid] = {"id": rid, "metadata": hit_md}
+            return True
+
+        ranked = self.index.search(query, top_k, accept)
+        return [{**hits[rid], "score": score} for rid, score in ranked]
+
+    def update_record(self, rid: str, text: str, metadata: Dict[str, Any]) -> None:
+        with self._lock:
+            if self.state == "building":
+                self._edits.append((rid, text, metadata))
+                return
+            if self.state != "ready":
+                return
+            self.records.put(rid, text, metadata)
+        self.index.add(rid, document_text(text, metadata))
+
+    def close(self) -> None:
+        with self._lock:
+            if self.records is not None:
+                self.records.close()
+            self.records, self.index, self.state = None, None, "idle"
+
+
+# singleton
+lexical_index = LexicalIndex()
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+log = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU map with an optional per-entry TTL.
+    A `max_items` of 0 disables the cache (every lookup misses, nothing is stored).
+    `on_evict(key, value)` runs, outside the lock, for entries dropped by size,
+    expiry or `pop`.
+    """
+
+    def __init__(
+        self,
+        max_items: int,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+    ):
+        self.max_items = max(0, int(max_items))
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self._clock = clock
+        self._on_evict = on_evict
+        self._data: "OrderedDict[Hashable, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires, value = entry
+            expired = expires is not None and expires <= self._clock()
+            if expired:
+                del self._data[key]
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+        if self._on_evict is not None:
+            self._on_evict(key, value)
+        return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if not self.max_items:
+            return
+        expires = self._clock() + self.ttl if self.ttl else None
+        evicted = []
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                old_key, (_, old_value) = self._data.popitem(last=False)
+                evicted.append((old_key, old_value))
+                self.evictions += 1
+        if self._on_evict is not None:
+            for old_key, old_value in evicted:
+                self._on_evict(old_key, old_value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        if self._on_evict is not None:
+            self._on_evict(key, entry[1])
+        return entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Snapshot of live entries, oldest first; does not touch recency or stats."""
+        with self._lock:
+            now = self._clock()
+            return [
+                (key, value) for key, (expires, value) in self._data.items()
+                if expires is None or expires > now
+            ]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "max_items": self.max_items,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class SQLiteStore:
+    """
+    Persistent key -> bytes table in a SQLite file (WAL mode), safe to share
+    between processes. Entries carry an optional `tag` for bulk invalidation.
+    The table is trimmed to `max_entries`, dropping the least recently read rows.
+    A read refreshes a row's `last_used` only once it is more than `touch_after`
+    seconds old, so hot rows are not rewritten on every hit; eviction order is
+    exact to within that window.
+    Any SQLite error is logged and treated as a miss so callers never fail on it.
+    """
+
+    def __init__(self, path: str, table: str, max_entries: int, touch_after: float = 600.0):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table!r}")
+        self.path = path
+        self.table = table
+        self.max_entries = max(0, int(max_entries))
+        self.touch_after = max(0.0, float(touch_after))
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            parent = os.path.dirname(self.path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path, timeout=5.0, check_same_thread=False, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, tag TEXT, last_used REAL NOT NULL)"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_last_used ON {self.table}(last_used)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_tag ON {self.table}(tag)")
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, bytes]:
+        if not self.enabled or not keys:
+            return {}
+        found: Dict[str, bytes] = {}
+        now = time.time()
+        stale: List[str] = []
+        try:
+            with self._lock:
+                conn = self._connection()
+                for chunk in _chunks(list(keys), 500):
+                    marks = ",".join("?" * len(chunk))
+                    rows = conn.execute(
+                        f"SELECT key, value, last_used FROM {self.table} WHERE key IN ({marks})", chunk
+                    ).fetchall()
+                    for k, v, last_used in rows:
+                        found[k] = v
+                        if now - last_used > self.touch_after:
+                            stale.append(k)
+                if stale:
+                    conn.executemany(
+                        f"UPDATE {self.table} SET last_used = ? WHERE key = ?",
+                        [(now, k) for k in stale],
+                    )
+        except sqlite3.Error as exc:
+            log.warning("SQLite read failed (%s): %s", self.table, exc)
+            return {}
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, bytes, Optional[str]]]) -> None:
+        if not self.enabled:
+            return
+        now = time.time()
+        rows = [(key, value, tag, now) for key, value, tag in items]
+        if not rows:
+            return
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO {self.table} (key, value, tag, last_used)"
+                        " VALUES (?, ?, ?, ?)",
+                        rows,
+                    )
+                    self._evict(conn)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as exc:
+            log.warning("SQLite write failed (%s): %s", self.table, exc)
+
+    def delete_tag(self, tag: str) -> int:
+        if not self.enabled:
+            return 0
+        try:
+            with self._lock:
+                cur = self._connection().execute(
+                    f"DELETE FROM {self.table} WHERE tag = ?", (tag,)
+                )
+                return cur.rowcount or 0
+        except sqlite3.Error as exc:
+            log.warning("SQLite delete failed (%s): %s", self.table, exc)
+            return 0
+
+    def count(self) -> int:
+        if not self.enabled:
+            return 0
+        try:
+            with self._lock:
+                return self._connection().execute(
+                    f"SELECT COUNT(*) FROM {self.table}"
+                ).fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        excess = total - self.max_entries
+        if excess > 0:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f" SELECT key FROM {self.table} ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
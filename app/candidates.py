@@ -1,8 +1,16 @@
 from __future__ import annotations
 
-from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set
+import asyncio
+import logging
+from functools import partial
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
-from .retriever import retrieve
+from .bm25 import lexical_index
+from .config import HYBRID_SEARCH, NAMESPACE, RRF_K
+from .fanout import DEFAULT_CALL_TIMEOUT, run_bounded
+from .retriever import retrieve, retrieve_async, retrieve_many, retrieve_many_async
+
+log = logging.getLogger(__name__)
 
 DEFAULT_FULL_TOP_K = 10
 DEFAULT_PER_NEED_TOP_K = 10
@@ -13,6 +21,7 @@ MAX_CANDIDATES = 50
 
 Hit = Dict[str, object]
 Need = Dict[str, str]
+Vector = List[float]
 
 
 def _normalize_service_id(hit: Hit) -> Optional[str]:
@@ -111,35 +120,315 @@ def multi_need_retrieve(
     max_candidates: int = MAX_CANDIDATES,
     retrieve_kwargs: Optional[Dict[str, object]] = None,
     grouped_top_k: Optional[int] = None,
+    max_workers: int = 1,
+    call_timeout: Optional[float] = DEFAULT_CALL_TIMEOUT,
+    embed_fn: Optional[Callable[[List[str]], Sequence[Vector]]] = None,
+    retrieve_many_fn: Callable[..., Sequence[Sequence[Hit]]] = retrieve_many,
+    hybrid: Optional[bool] = None,
 ) -> Dict[str, List[Dict[str, object]]]:
-    """Run vector searches for the full story and optionally each need."""
+    """
+    Run vector searches for the full story and optionally each need.
+
+    With `max_workers` > 1 the story search and the per-need searches are sent
+    concurrently on a bounded thread pool; any call still running after
+    `call_timeout` seconds contributes no hits. Results are merged in the same
+    order as the serial path, so grouping is identical either way.
+
+    When `embed_fn` is given, every query text is embedded in one batch call
+    and the vectors are searched through `retrieve_many_fn` instead of calling
+    `retrieve_fn` once per query.
+
+    With `hybrid` (default: HYBRID_SEARCH) each query is also run against the
+    BM25 index and the two rankings are fused with reciprocal rank fusion, so
+    exact terms like "WIC" or a zip code surface even when the embedding
+    misses them. Until the BM25 index has been built, searches stay dense-only.
+    """
 
     story_query = (user_story or "").strip()
     if not story_query:
         return {}
 
-    buckets: Dict[str, Dict[str, object]] = {}
+    needs = list(needs or [])
+    grouped_limit = max(
+        1, int(grouped_top_k) if grouped_top_k else DEFAULT_GROUPED_RESULTS_PER_NEED
+    )
 
+    jobs = _plan_queries(story_query, needs, full_top_k, per_need_top_k, per_need_limit)
     retrieve_opts = dict(retrieve_kwargs or {})
 
-    full_hits = retrieve_fn(story_query, top_k=full_top_k, **retrieve_opts)
-    for hit in full_hits or []:
-        if isinstance(hit, dict):
-            _add_hit(buckets, hit)
+    if embed_fn is not None:
+        results = _retrieve_batched(
+            jobs,
+            embed_fn,
+            retrieve_many_fn,
+            retrieve_opts,
+            max_workers=max_workers,
+            call_timeout=call_timeout,
+        )
+    elif max_workers and max_workers > 1:
+        calls = [
+            partial(retrieve_fn, query, top_k=top_k, **retrieve_opts)
+            for query, top_k, _ in jobs
+        ]
+        results = run_bounded(
+            calls,
+            max_workers=max_workers,
+            timeout=call_timeout,
+            default=[],
+            label="candidates",
+        )
+    else:
+        results = [
+            retrieve_fn(query, top_k=top_k, **retrieve_opts) for query, top_k, _ in jobs
+        ]
+
+    if (HYBRID_SEARCH if hybrid is None else hybrid):
+        results = _fuse_lexical(jobs, results, retrieve_opts)
+    return _merge_results(jobs, results, needs, max_candidates, grouped_limit)
+
+
+async def multi_need_retrieve_async(
+    user_story: str,
+    needs: Optional[Iterable[Need]] = None,
+    *,
+    retrieve_fn: Callable[..., Awaitable[Sequence[Hit]]] = retrieve_async,
+    full_top_k: int = DEFAULT_FULL_TOP_K,
+    per_need_top_k: int = DEFAULT_PER_NEED_TOP_K,
+    per_need_limit: int = MAX_NEEDS,
+    max_candidates: int = MAX_CANDIDATES,
+    retrieve_kwargs: Optional[Dict[str, object]] = None,
+    grouped_top_k: Optional[int] = None,
+    call_timeout: Optional[float] = DEFAULT_CALL_TIMEOUT,
+    embed_fn: Optional[Callable[[List[str]], Awaitable[Sequence[Vector]]]] = None,
+    retrieve_many_fn: Callable[..., Awaitable[Sequence[Sequence[Hit]]]] = retrieve_many_async,
+    hybrid: Optional[bool] = None,
+) -> Dict[str, List[Dict[str, object]]]:
+    """
+    Async twin of `multi_need_retrieve`: every search is awaited concurrently
+    on the event loop instead of a thread pool, with the same merge order.
+    """
+
+    story_query = (user_story or "").strip()
+    if not story_query:
+        return {}
 
     needs = list(needs or [])
     grouped_limit = max(
         1, int(grouped_top_k) if grouped_top_k else DEFAULT_GROUPED_RESULTS_PER_NEED
     )
 
+    jobs = _plan_queries(story_query, needs, full_top_k, per_need_top_k, per_need_limit)
+    retrieve_opts = dict(retrieve_kwargs or {})
+
+    results = await _search_jobs_async(
+        jobs, retrieve_fn, embed_fn, retrieve_many_fn, retrieve_opts, call_timeout
+    )
+    if (HYBRID_SEARCH if hybrid is None else hybrid):
+        results = _fuse_lexical(jobs, results, retrieve_opts)
+    return _merge_results(jobs, results, needs, max_candidates, grouped_limit)
+
+
+async def search_needs_async(
+    user_story: str,
+    needs: Optional[Iterable[Need]],
+    *,
+    retrieve_fn: Callable[..., Awaitable[Sequence[Hit]]] = retrieve_async,
+    per_need_top_k: int = DEFAULT_PER_NEED_TOP_K,
+    per_need_limit: int = MAX_NEEDS,
+    retrieve_kwargs: Optional[Dict[str, object]] = None,
+    call_timeout: Optional[float] = DEFAULT_CALL_TIMEOUT,
+    embed_fn: Optional[Callable[[List[str]], Awaitable[Sequence[Vector]]]] = None,
+    retrieve_many_fn: Callable[..., Awaitable[Sequence[Sequence[Hit]]]] = retrieve_many_async,
+) -> List[Sequence[Hit]]:
+    """
+    Run only the per-need searches, returning one hit list per planned need.
+    Pairs with a separately run story search through `group_search_results`,
+    so the story search does not have to wait for needs extraction.
+    """
+    story_query = (user_story or "").strip()
+    if not story_query:
+        return []
+    jobs = _plan_queries(story_query, list(needs or []), 0, per_need_top_k, per_need_limit)[1:]
+    if not jobs:
+        return []
+    return await _search_jobs_async(
+        jobs, retrieve_fn, embed_fn, retrieve_many_fn, dict(retrieve_kwargs or {}), call_timeout
+    )
+
+
+def group_search_results(
+    user_story: str,
+    needs: Optional[Iterable[Need]],
+    story_hits: Optional[Sequence[Hit]],
+    need_hits: Sequence[Optional[Sequence[Hit]]],
+    *,
+    per_need_limit: int = MAX_NEEDS,
+    max_candidates: int = MAX_CANDIDATES,
+    grouped_top_k: Optional[int] = None,
+    retrieve_kwargs: Optional[Dict[str, object]] = None,
+    hybrid: Optional[bool] = None,
+) -> Dict[str, List[Dict[str, object]]]:
+    """
+    Merge a story search and `search_needs_async` output exactly as `multi_need_retrieve` would.
+    Hybrid fusion needs the searches' `retrieve_kwargs` to apply the same filter to BM25 hits.
+    """
+    story_query = (user_story or "").strip()
+    if not story_query:
+        return {}
+    needs = list(needs or [])
+    grouped_limit = max(
+        1, int(grouped_top_k) if grouped_top_k else DEFAULT_GROUPED_RESULTS_PER_NEED
+    )
+    jobs = _plan_queries(story_query, needs, 0, 0, per_need_limit)
+    results: List[Optional[Sequence[Hit]]] = [story_hits, *need_hits]
+    if (HYBRID_SEARCH if hybrid is None else hybrid):
+        results = _fuse_lexical(jobs, results, dict(retrieve_kwargs or {}))
+    return _merge_results(jobs, results, needs, max_candidates, grouped_limit)
+
+
+async def _search_jobs_async(
+    jobs: Sequence[Tuple[str, int, Optional[str]]],
+    retrieve_fn: Callable[..., Awaitable[Sequence[Hit]]],
+    embed_fn: Optional[Callable[[List[str]], Awaitable[Sequence[Vector]]]],
+    retrieve_many_fn: Callable[..., Awaitable[Sequence[Sequence[Hit]]]],
+    retrieve_opts: Dict[str, object],
+    call_timeout: Optional[float],
+) -> List[Sequence[Hit]]:
+    if embed_fn is not None:
+        try:
+            vectors = await embed_fn([query for query, _, _ in jobs])
+            return list(await retrieve_many_fn(
+                vectors,
+                top_k=[top_k for _, top_k, _ in jobs],
+                queries=[query for query, _, _ in jobs],
+                timeout=call_timeout,
+                **retrieve_opts,
+            ) or [])
+        except Exception as exc:
+            log.error("Batch retrieval failed: %s", exc)
+            return [[] for _ in jobs]
+
+    return list(await asyncio.gather(*[
+        _await_with_timeout(retrieve_fn(query, top_k=top_k, **retrieve_opts), call_timeout)
+        for query, top_k, _ in jobs
+    ]))
+
+
+async def _await_with_timeout(awaitable: Awaitable[Sequence[Hit]], timeout: Optional[float]) -> Sequence[Hit]:
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        log.warning("Search timed out after %ss; skipping.", timeout)
+    except Exception as exc:
+        log.error("Search failed: %s", exc)
+    return []
+
+
+def _merge_results(
+    jobs: Sequence[Tuple[str, int, Optional[str]]],
+    results: Sequence[Optional[Sequence[Hit]]],
+    needs: Sequence[Need],
+    max_candidates: int,
+    grouped_limit: int,
+) -> Dict[str, List[Dict[str, object]]]:
+    """Fold per-query hits into buckets in plan order, then group them by need."""
+    buckets: Dict[str, Dict[str, object]] = {}
+    for (_, _, matched_need), hits in zip(jobs, results):
+        for hit in hits or []:
+            if isinstance(hit, dict):
+                _add_hit(buckets, hit, matched_need=matched_need)
+
+    candidates = _finalize_candidates(buckets, max_candidates)
     if not needs:
-        candidates = _finalize_candidates(buckets, max_candidates)
         limit = min(grouped_limit, len(candidates))
         if limit == 0:
             return {}
         return {"general": candidates[:limit]}
 
-    context_slice = _story_slice(user_story)
+    return _group_candidates_by_need(candidates, needs, grouped_limit)
+
+
+def _fuse_lexical(
+    jobs: Sequence[Tuple[str, int, Optional[str]]],
+    results: Sequence[Optional[Sequence[Hit]]],
+    retrieve_opts: Dict[str, object],
+) -> List[Optional[Sequence[Hit]]]:
+    """Fuse each query's dense hits with its BM25 hits (same filter, same top_k)."""
+    namespace = retrieve_opts.get("namespace")
+    if namespace and namespace != NAMESPACE:
+        # The lexical index holds the prepared records, i.e. the default namespace.
+        return list(results)
+    fused: List[Optional[Sequence[Hit]]] = []
+    for (query, top_k, _), hits in zip(jobs, results):
+        hits = [hit for hit in hits or [] if isinstance(hit, dict)]
+        lexical = lexical_index.search(
+            query, top_k or len(hits) or DEFAULT_PER_NEED_TOP_K, retrieve_opts.get("metadata_filters")
+        )
+        if lexical is None:
+            return list(results)
+        fused.append(_rrf_fuse([hits, lexical]))
+    return fused
+
+
+def _rrf_fuse(rankings: Sequence[Sequence[Hit]], k: int = RRF_K) -> List[Hit]:
+    """
+    Reciprocal rank fusion: each hit scores sum(1 / (k + rank)) over the
+    rankings it appears in. The first ranking's copy of a hit is kept, so
+    dense hits keep the index's metadata.
+    """
+    fused: Dict[str, Hit] = {}
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            service_id = _normalize_service_id(hit)
+            if not service_id:
+                continue
+            fused.setdefault(service_id, hit)
+            scores[service_id] = scores.get(service_id, 0.0) + 1.0 / (k + rank)
+    ordered = sorted(fused, key=lambda sid: scores[sid], reverse=True)
+    return [{**fused[sid], "score": scores[sid]} for sid in ordered]
+
+
+def _retrieve_batched(
+    jobs: Sequence[Tuple[str, int, Optional[str]]],
+    embed_fn: Callable[[List[str]], Sequence[Vector]],
+    retrieve_many_fn: Callable[..., Sequence[Sequence[Hit]]],
+    retrieve_opts: Dict[str, object],
+    *,
+    max_workers: int,
+    call_timeout: Optional[float],
+) -> List[Sequence[Hit]]:
+    """Embed all planned queries at once, then search with the precomputed vectors."""
+    try:
+        vectors = embed_fn([query for query, _, _ in jobs])
+    except Exception as exc:
+        log.error("Batch embedding failed: %s", exc)
+        return [[] for _ in jobs]
+
+    results = retrieve_many_fn(
+        vectors,
+        top_k=[top_k for _, top_k, _ in jobs],
+        queries=[query for query, _, _ in jobs],
+        max_workers=max(1, int(max_workers or 1)),
+        timeout=call_timeout,
+        **retrieve_opts,
+    )
+    return list(results or [])
+
+
+def _plan_queries(
+    story_query: str,
+    needs: Sequence[Need],
+    full_top_k: int,
+    per_need_top_k: int,
+    per_need_limit: int,
+) -> List[Tuple[str, int, Optional[str]]]:
+    """Return (query, top_k, matched_need) for the story search and each need search."""
+    jobs: List[Tuple[str, int, Optional[str]]] = [(story_query, full_top_k, None)]
+    if not needs:
+        return jobs
+
+    context_slice = _story_slice(story_query)
     for need in needs[:per_need_limit]:
         if not isinstance(need, dict):
             continue
@@ -150,13 +439,8 @@ def multi_need_retrieve(
         per_need_query = query
         if context_slice:
             per_need_query = f"{query} Context: {context_slice}"
-        hits = retrieve_fn(per_need_query, top_k=per_need_top_k, **retrieve_opts)
-        for hit in hits or []:
-            if isinstance(hit, dict):
-                _add_hit(buckets, hit, matched_need=slug or None)
-
-    candidates = _finalize_candidates(buckets, max_candidates)
-    return _group_candidates_by_need(candidates, needs, grouped_limit)
+        jobs.append((per_need_query, per_need_top_k, slug or None))
+    return jobs
 
 
 def _finalize_candidates(
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import logging
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .config import OPENAI_API_KEY, PINECONE_API_KEY, PINECONE_INDEX_NAME, VECTOR_BACKEND
+
+log = logging.getLogger(__name__)
+
+# Seconds spent per startup step (imports, each client build, warm-up), in the order they ran.
+startup_timings: Dict[str, float] = {}
+
+
+@contextmanager
+def timed(step: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[step] = round(startup_timings.get(step, 0.0) + time.perf_counter() - t0, 4)
+
+
+class LazyClient:
+    """
+    Stands in for an SDK client until something first uses it: attribute
+    access builds the real object once (thread-safe) and delegates to it.
+    Modules keep a module-level name, as before, without paying for the
+    SDK import, the client or its connection pool at import time.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self._name = name
+        self._factory = factory
+        self._client: Any = None
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def resolve_client(self) -> Any:
+        """The real client, built on the first call."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    with timed(self._name):
+                        self._client = self._factory()
+                    log.info("Built %s in %.2fs", self._name, startup_timings[self._name])
+        return self._client
+
+    def replace_client(self, client: Any) -> Any:
+        """Serve `client` from now on (benchmark stand-ins); returns the one it replaces, if built."""
+        with self._lock:
+            previous, self._client = self._client, client
+        return previous
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.resolve_client(), attr)
+
+    def __repr__(self) -> str:
+        return f"<LazyClient {self._name} ({'built' if self._client is not None else 'not built'})>"
+
+
+_registry: List[LazyClient] = []
+
+
+def _openai():
+    from openai import OpenAI
+    return OpenAI(api_key=OPENAI_API_KEY)
+
+
+def _async_openai():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=OPENAI_API_KEY)
+
+
+def _pinecone():
+    from pinecone import Pinecone
+    return Pinecone(api_key=PINECONE_API_KEY)
+
+
+# One client (and connection pool) per upstream, shared by every module.
+openai_client = LazyClient("openai", _openai)
+async_openai_client = LazyClient("async_openai", _async_openai)
+# Bulk indexing retries on its own (with Retry-After); same pool, SDK retries off.
+openai_indexing_client = LazyClient(
+    "openai_indexing", lambda: openai_client.resolve_client().with_options(max_retries=0)
+)
+pinecone_client = LazyClient("pinecone", _pinecone)
+# Resolving the index by name is a network call (describe_index).
+pinecone_index = LazyClient(
+    "pinecone_index", lambda: pinecone_client.resolve_client().Index(name=PINECONE_INDEX_NAME)
+)
+pinecone_async_index = LazyClient(
+    "pinecone_async_index", lambda: pinecone_client.resolve_client().IndexAsyncio(host=pinecone_index.host)
+)
+
+
+def warm_up(extra: Optional[Dict[str, Callable[[], Any]]] = None) -> Dict[str, Any]:
+    """
+    Build the clients a worker needs before it takes traffic (called from the
+    FastAPI lifespan), then any `extra` named steps. A failing step is logged
+    and left to be retried lazily on first use.
+    """
+    steps: Dict[str, Callable[[], Any]] = {
+        "openai": openai_client.resolve_client,
+        "async_openai": async_openai_client.resolve_client,
+    }
+    if VECTOR_BACKEND == "pinecone":
+        steps["pinecone_index"] = pinecone_index.resolve_client
+    steps.update(extra or {})
+    with timed("warm_up"):
+        for name, step in steps.items():
+            try:
+                step()
+            except Exception as e:
+                log.warning("Warm-up of %s failed: %s", name, e)
+    return startup_report()
+
+
+def startup_report() -> Dict[str, Any]:
+    return {
+        "timings": dict(startup_timings),
+        "built": [c._name for c in _registry if c._client is not None],
+        # Peak resident set size of this worker; Linux reports KiB.
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
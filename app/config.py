@@ -1,3 +1,4 @@
+import logging
 import os
 from dotenv import load_dotenv
 
@@ -11,11 +12,121 @@ NAMESPACE = os.getenv("NAMESPACE", "__default__")
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
 GEN_MODEL = os.getenv("GEN_MODEL", "gpt-4.1-mini")
 
-def print_config():
-    print(">>> [config] Loaded environment variables.")
-    print(f">>> [config] PINECONE_INDEX_NAME = {PINECONE_INDEX_NAME}")
-    print(f">>> [config] NAMESPACE = {NAMESPACE}")
-    print(f">>> [config] EMBED_MODEL = {EMBED_MODEL}")
-    print(f">>> [config] GEN_MODEL = {GEN_MODEL}")
-    print(f">>> [config] OPENAI_API_KEY present? {'yes' if bool(OPENAI_API_KEY) else 'no'}")
-    print(f">>> [config] PINECONE_API_KEY present? {'yes' if bool(PINECONE_API_KEY) else 'no'}")
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+# OpenAI/Pinecone clients are shared and built on first use (app/clients.py); with
+# CLIENT_WARMUP on, each worker builds them in the FastAPI lifespan before serving.
+CLIENT_WARMUP = os.getenv("CLIENT_WARMUP", "1").strip().lower() not in ("0", "false", "no")
+
+# Prepared records and the admin edit journal; read by the admin DataStore and the lexical index.
+DOCS_PATH = os.getenv("DOCS_PATH", os.path.join(DATA_DIR, "prepared_documents.jsonl"))
+META_PATH = os.getenv("META_PATH", os.path.join(DATA_DIR, "prepared_metadata.jsonl"))
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", os.path.join(DATA_DIR, "edits.journal"))
+
+# Logging (app/log.py): the app.* loggers write through a queue of LOG_QUEUE_SIZE records
+# to one background thread, as JSON lines (LOG_FORMAT=json) or the ">>> [module]" console
+# format (LOG_FORMAT=text). LOG_LEVEL=DEBUG adds per-query dumps such as the top match.
+# Lines marked as sampled (per-call chatter) are written at LOG_SAMPLE_RATE.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").strip().lower()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Vector search backend: "pinecone" (hosted index), "ivf" (see below) or "local" (in-memory NumPy
+# matrix built by scripts/build_local_index.py under LOCAL_INDEX_DIR).
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").strip().lower()
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(DATA_DIR, "local_index"))
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32")
+# "ivf": approximate search over memory-mapped k-means partitions (built with
+# scripts/build_local_index.py --format ivf). IVF_NPROBE partitions are scanned
+# per query and the best top_k * IVF_RERANK rows are rescored in float32.
+IVF_INDEX_DIR = os.getenv("IVF_INDEX_DIR", os.path.join(DATA_DIR, "ivf_index"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+IVF_RERANK = int(os.getenv("IVF_RERANK", "4"))
+
+# Hybrid retrieval: multi_need_retrieve also ranks each query against an in-memory BM25
+# index of the prepared records (text, name, organization, categories) and fuses the two
+# rankings with reciprocal rank fusion, 1 / (RRF_K + rank). Query terms are scored rarest
+# first, stopping after BM25_MAX_QUERY_TERMS terms or once BM25_MAX_POSTINGS postings have
+# been read, which bounds the lexical half's cost for long stories and very common words.
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "0").strip().lower() in ("1", "true", "yes")
+RRF_K = int(os.getenv("RRF_K", "60"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+BM25_MAX_QUERY_TERMS = int(os.getenv("BM25_MAX_QUERY_TERMS", "32"))
+BM25_MAX_POSTINGS = int(os.getenv("BM25_MAX_POSTINGS", "100000"))
+
+# Embedding cache: in-process LRU in front of a SQLite file shared by all workers.
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(DATA_DIR, "cache.sqlite3"))
+EMBED_CACHE_MEMORY_ITEMS = int(os.getenv("EMBED_CACHE_MEMORY_ITEMS", "4096"))
+EMBED_CACHE_DISK_ITEMS = int(os.getenv("EMBED_CACHE_DISK_ITEMS", "200000"))
+
+# Card summary cache, in the same SQLite file; keyed by resource content, need and GEN_MODEL.
+SUMMARY_CACHE_MEMORY_ITEMS = int(os.getenv("SUMMARY_CACHE_MEMORY_ITEMS", "2048"))
+SUMMARY_CACHE_DISK_ITEMS = int(os.getenv("SUMMARY_CACHE_DISK_ITEMS", "100000"))
+
+# Search result cache; entries also drop whenever an admin upsert changes the index.
+# Other workers learn of the change through the SQLite cache file, checked at most
+# every RETRIEVAL_CACHE_SYNC seconds.
+RETRIEVAL_CACHE_ITEMS = int(os.getenv("RETRIEVAL_CACHE_ITEMS", "1024"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "300"))
+RETRIEVAL_CACHE_SYNC = float(os.getenv("RETRIEVAL_CACHE_SYNC", "1"))
+
+# Needs extraction cache: exact match on the normalized story, then cosine
+# similarity of the story embedding against recent stories (in-process only).
+NEEDS_CACHE_ITEMS = int(os.getenv("NEEDS_CACHE_ITEMS", "1024"))
+NEEDS_CACHE_TTL = float(os.getenv("NEEDS_CACHE_TTL", "3600"))
+NEEDS_CACHE_SIMILARITY = float(os.getenv("NEEDS_CACHE_SIMILARITY", "0.97"))
+
+# Bulk re-embed/upsert (DataStore.reembed_and_upsert). Embedding requests are
+# packed up to the token/item limits; upserts go out INDEX_UPSERT_BATCH at a time.
+INDEX_EMBED_BATCH_TOKENS = int(os.getenv("INDEX_EMBED_BATCH_TOKENS", "100000"))
+INDEX_EMBED_BATCH_ITEMS = int(os.getenv("INDEX_EMBED_BATCH_ITEMS", "512"))
+INDEX_UPSERT_BATCH = int(os.getenv("INDEX_UPSERT_BATCH", "100"))
+INDEX_MAX_WORKERS = int(os.getenv("INDEX_MAX_WORKERS", "4"))
+INDEX_MAX_RETRIES = int(os.getenv("INDEX_MAX_RETRIES", "6"))
+
+# Admin edits are appended to an fsync'd journal under DATA_DIR and folded into the
+# JSONL files on save, or in the background once the journal passes this size.
+JOURNAL_COMPACT_BYTES = int(os.getenv("JOURNAL_COMPACT_BYTES", str(8 * 1024 * 1024)))
+
+# Review progress (reviewed/dirty ids) is written behind: progress.json is rewritten
+# PROGRESS_FLUSH_DELAY seconds after the first unsaved change, or after
+# PROGRESS_FLUSH_CHANGES changes, whichever comes first, and on shutdown.
+PROGRESS_FLUSH_DELAY = float(os.getenv("PROGRESS_FLUSH_DELAY", "2.0"))
+PROGRESS_FLUSH_CHANGES = int(os.getenv("PROGRESS_FLUSH_CHANGES", "500"))
+
+# The admin DataStore loads on its first admin call, not at import, and reads the
+# prepared JSONL files through an offset index (<file>.idx) instead of parsing them
+# whole. DATASTORE_LAZY=0 loads at import as before.
+DATASTORE_LAZY = os.getenv("DATASTORE_LAZY", "1").strip().lower() not in ("0", "false", "no")
+DATASTORE_RECORD_CACHE_ITEMS = int(os.getenv("DATASTORE_RECORD_CACHE_ITEMS", "2048"))
+# Admin record storage: "jsonl" (prepared_*.jsonl + edit journal) or "sqlite" (one WAL
+# database, imported from the JSONL files on first start, safe to share between workers).
+DATASTORE_BACKEND = os.getenv("DATASTORE_BACKEND", "jsonl").strip().lower()
+DATASTORE_DB_PATH = os.getenv("DATASTORE_DB_PATH", os.path.join(DATA_DIR, "datastore.sqlite3"))
+
+# Admin record paging (/api/admin/records): Pinecone hydration fetches up to
+# ADMIN_FETCH_BATCH ids per request; merged records are kept in an LRU.
+ADMIN_RECORD_CACHE_ITEMS = int(os.getenv("ADMIN_RECORD_CACHE_ITEMS", "2048"))
+ADMIN_FETCH_BATCH = int(os.getenv("ADMIN_FETCH_BATCH", "100"))
+ADMIN_PAGE_MAX = int(os.getenv("ADMIN_PAGE_MAX", "200"))
+ADMIN_PREFETCH_COUNT = int(os.getenv("ADMIN_PREFETCH_COUNT", "20"))
+# Local copy of the namespace's Pinecone metadata (scripts/sync_pinecone_snapshot.py or
+# POST /api/admin/snapshot/sync). Once synced, admin hydration reads it instead of Pinecone.
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", os.path.join(DATA_DIR, "pinecone_snapshot.jsonl"))
+SNAPSHOT_FETCH_WORKERS = int(os.getenv("SNAPSHOT_FETCH_WORKERS", "4"))
+
+log = logging.getLogger(__name__)
+
+
+def log_config():
+    log.info("Loaded environment variables.")
+    log.info("PINECONE_INDEX_NAME = %s", PINECONE_INDEX_NAME)
+    log.info("NAMESPACE = %s", NAMESPACE)
+    log.info("VECTOR_BACKEND = %s", VECTOR_BACKEND)
+    log.info("HYBRID_SEARCH = %s", HYBRID_SEARCH)
+    log.info("EMBED_MODEL = %s", EMBED_MODEL)
+    log.info("GEN_MODEL = %s", GEN_MODEL)
+    log.info("OPENAI_API_KEY present? %s", "yes" if bool(OPENAI_API_KEY) else "no")
+    log.info("PINECONE_API_KEY present? %s", "yes" if bool(PINECONE_API_KEY) else "no")
@@ -1,13 +1,30 @@
-import os, json, time, traceback
+import os, bisect, json, logging, time, threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List
 import orjson
 
-from pinecone import Pinecone
-from openai import OpenAI
-
 from .config import (
-    OPENAI_API_KEY, PINECONE_API_KEY, PINECONE_INDEX_NAME, NAMESPACE, EMBED_MODEL
+    NAMESPACE, EMBED_MODEL, DATA_DIR,
+    VECTOR_BACKEND, JOURNAL_COMPACT_BYTES, DATASTORE_LAZY,
+    ADMIN_RECORD_CACHE_ITEMS, ADMIN_FETCH_BATCH, ADMIN_PAGE_MAX, ADMIN_PREFETCH_COUNT, SNAPSHOT_PATH,
+    DATASTORE_BACKEND, DATASTORE_DB_PATH, DOCS_PATH, META_PATH, JOURNAL_PATH
 )
+from .bm25 import lexical_index
+from .cache import LRUCache
+from .clients import openai_indexing_client, pinecone_index
+from .embed_cache import embed_cached
+from .indexer import BulkIndexer
+from .journal import EditJournal
+from .jsonl_store import RecordStore
+from .manifest import EMBED, METADATA, SKIP, IndexManifest
+from .pinecone_snapshot import PineconeSnapshot
+from .record_db import RecordDB
+from .progress import ProgressStore
+from .result_cache import retrieval_cache
+from .retriever import backend as vector_backend
+from .summary_cache import summary_cache
+
+log = logging.getLogger(__name__)
 
 # --------- simple env-driven security ----------
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
@@ -17,10 +34,8 @@ def require_admin(token: str):
         raise PermissionError("ADMIN token missing or invalid")
 
 # --------- paths ----------
-DATA_DIR = os.getenv("DATA_DIR", "data")
-DOCS_PATH = os.getenv("DOCS_PATH", os.path.join(DATA_DIR, "prepared_documents.jsonl"))
-META_PATH = os.getenv("META_PATH", os.path.join(DATA_DIR, "prepared_metadata.jsonl"))
 PROG_PATH = os.getenv("PROG_PATH", os.path.join(DATA_DIR, "progress.json"))
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", os.path.join(DATA_DIR, "index_manifest.json"))
 
 os.makedirs(DATA_DIR, exist_ok=True)
 
@@ -103,79 +118,208 @@ def _flatten_metadata(md: dict) -> dict:
 
 
 
-def _read_jsonl(path: str) -> Dict[str, Dict[str, Any]]:
-    if not os.path.exists(path): return {}
-    out = {}
-    with open(path, "rb") as f:
-        for line in f:
-            if not line.strip(): continue
-            obj = orjson.loads(line)
-            rid = str(obj.get("id") or obj.get("resource_id"))
-            if rid: out[rid] = obj
-    return out
-
-def _write_jsonl(path: str, rows: List[Dict[str, Any]]):
-    with open(path, "wb") as f:
-        for row in rows:
-            f.write(orjson.dumps(row))
-            f.write(b"\n")
+def _index_fields(md: dict) -> dict:
+    """Flattened values the admin query filters on (see record_db.QUERY_FIELDS)."""
+    flat = _flatten_metadata(md)
+    return {k: flat.get(k) for k in ("city", "county", "zip_code", "categories")}
 
-def _read_progress() -> Dict[str, Any]:
-    if not os.path.exists(PROG_PATH): return {"reviewed": [], "dirty": []}
-    with open(PROG_PATH, "rb") as f: return orjson.loads(f.read())
-
-def _write_progress(p: Dict[str, Any]):
-    with open(PROG_PATH, "wb") as f: f.write(orjson.dumps(p))
+def _matches(fields: dict, reviewed: bool, dirty: bool, filters: Dict[str, Any]) -> bool:
+    """Same semantics as RecordDB.query: case-insensitive city/county/category, exact zip."""
+    def _eq(a, b): return a is not None and str(a).lower() == str(b).lower()
+    for k in ("city", "county"):
+        if filters.get(k) not in (None, "") and not _eq(fields.get(k), filters[k]): return False
+    if filters.get("zip_code") not in (None, "") and str(fields.get("zip_code")) != str(filters["zip_code"]): return False
+    if filters.get("category") not in (None, "") and not any(_eq(c, filters["category"]) for c in fields.get("categories") or []):
+        return False
+    if filters.get("reviewed") is not None and reviewed != bool(filters["reviewed"]): return False
+    if filters.get("dirty") is not None and dirty != bool(filters["dirty"]): return False
+    return True
 
 class DataStore:
-    def __init__(self):
-        print(">>> [datastore] Loading JSONL datasets...")
-        self.docs = _read_jsonl(DOCS_PATH)   # id -> {id,text}
-        self.meta = _read_jsonl(META_PATH)   # id -> {...}
-        self.ids = sorted(set(self.docs) | set(self.meta), key=lambda x: str(x))
-        self.progress = _read_progress()
-        self.dirty = set(self.progress.get("dirty", []))
-        self.reviewed = set(self.progress.get("reviewed", []))
-        print(f">>> [datastore] Loaded {len(self.ids)} ids. docs={len(self.docs)} meta={len(self.meta)}")
-
-        # clients
-        self.pc = Pinecone(api_key=PINECONE_API_KEY)
-        self.index = self.pc.Index(PINECONE_INDEX_NAME)
-        self.oai = OpenAI(api_key=OPENAI_API_KEY)
+    def __init__(self, lazy: bool = DATASTORE_LAZY):
+        self.last_index_report: Dict[str, Any] = {}
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        # Public /ask workers never touch admin data, so by default nothing is read until the first admin call.
+        if not lazy:
+            self._ensure_loaded()
+
+    def _ensure_loaded(self):
+        if self._loaded: return
+        with self._load_lock:
+            if self._loaded: return
+            t0 = time.perf_counter()
+            self.manifest = IndexManifest(MANIFEST_PATH, EMBED_MODEL)
+            self._lock = threading.RLock()
+            self._compact_lock = threading.Lock()
+            self._compacting = False
+            # Merged + flattened admin views, keyed by id; edits drop their entry and bump the generation.
+            self.record_cache = LRUCache(ADMIN_RECORD_CACHE_ITEMS)
+            self._record_gen = 0
+            self._prefetching = set()
+            self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="admin-prefetch")
+            if DATASTORE_BACKEND == "sqlite":
+                self.db = RecordDB(DATASTORE_DB_PATH)
+                if not self.db.count():
+                    self._import_into_db()
+                # Same read interface as the JSONL stores; every write is a single-row transaction.
+                self.docs, self.meta, self.progress = self.db.docs, self.db.meta, self.db.progress
+                self.journal = None
+                self.ids = self.db.ids()
+            else:
+                self.db = None
+                self._load_jsonl()
+            log.info(
+                "Loaded %d ids in %.2fs. docs=%d meta=%d",
+                len(self.ids), time.perf_counter() - t0, len(self.docs), len(self.meta),
+            )
+
+            # Shared clients (app/clients.py), built on first use.
+            # Only needed to hydrate records from Pinecone; the local backend has no remote copy.
+            self.index = pinecone_index if VECTOR_BACKEND == "pinecone" else None
+            self.snapshot = PineconeSnapshot(SNAPSHOT_PATH) if self.index is not None else None
+            # BulkIndexer owns retries (with Retry-After); the SDK's own would double them.
+            self.oai = openai_indexing_client
+            self._loaded = True
 
     # ---------- public helpers ----------
     def summary(self) -> Dict[str, Any]:
+        self._ensure_loaded()
         return {
             "total": len(self.ids),
-            "reviewed_count": len(self.reviewed),
-            "dirty_count": len(self.dirty),
+            "reviewed_count": len(self.progress.reviewed),
+            "dirty_count": len(self.progress.dirty),
+            "progress_pending": self.progress.pending,
             "docs_path": DOCS_PATH,
             "meta_path": META_PATH,
-            "progress_path": PROG_PATH
+            "progress_path": PROG_PATH,
+            "storage": DATASTORE_BACKEND,
+            "db_path": DATASTORE_DB_PATH if self.db is not None else None,
+            "manifest_path": MANIFEST_PATH,
+            "journal_path": JOURNAL_PATH,
+            "journal_bytes": self.journal.size() if self.journal is not None else 0,
+            "manifest_count": len(self.manifest),
+            "last_index_report": self.last_index_report,
+            "snapshot_synced_at": self.snapshot.state.get("synced_at") if self.snapshot else None,
+            "snapshot_count": len(self.snapshot) if self.snapshot else 0,
         }
 
     def get_combined_by_index(self, index: int) -> Dict[str, Any]:
+        self._ensure_loaded()
         index = max(0, min(index, len(self.ids)-1))
-        rid = self.ids[index]
+        record = self.get_records(index, 1, prefetch=False)["records"][0]
+        # Single-record paging (the old UI) still gets the next few hydrated ahead of time.
+        if index + 1 < len(self.ids):
+            self._prefetch(index + 1, ADMIN_PREFETCH_COUNT)
+        return record
+
+    def get_records(self, start: int = 0, count: int = 20, prefetch: bool = True) -> Dict[str, Any]:
+        """
+        Records `start`..`start+count` for the admin UI, hydrated from Pinecone with
+        one multi-id fetch for whatever is not cached. The following window is
+        then hydrated in the background so paging forward doesn't wait on Pinecone.
+        """
+        self._ensure_loaded()
+        total = len(self.ids)
+        start = max(0, min(start, total-1))
+        count = max(1, min(count, ADMIN_PAGE_MAX))
+        ids = self.ids[start:start+count]
+        hydrated = self._hydrate(ids)
+        records = [
+            {
+                "index": start + offset,
+                "id": rid,
+                "reviewed": rid in self.progress.reviewed,
+                "dirty": rid in self.progress.dirty,
+                **hydrated[rid],
+                "total": total,
+            }
+            for offset, rid in enumerate(ids)
+        ]
+        if prefetch and start + count < total:
+            self._prefetch(start + count, count)
+        return {"start": start, "count": len(records), "total": total, "records": records}
+
+    def query(self, filters: Dict[str, Any], offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+        """
+        Records matching every given filter (city, county, zip_code, category,
+        reviewed, dirty), ordered by id. SQLite storage answers from its
+        indexes; JSONL storage scans the metadata.
+        """
+        self._ensure_loaded()
+        offset, limit = max(0, offset), max(1, min(limit, ADMIN_PAGE_MAX))
+        if self.db is not None:
+            total, rows = self.db.query(filters, offset, limit)
+        else:
+            total, rows = self._scan(filters, offset, limit)
+        records = []
+        for rid, md, reviewed, dirty in rows:
+            flat = _flatten_metadata(md)
+            records.append({
+                "index": bisect.bisect_left(self.ids, rid),
+                "id": rid,
+                **{k: flat.get(k) for k in ("resource_name", "organization_name", "city", "county", "zip_code", "categories")},
+                "reviewed": reviewed,
+                "dirty": dirty,
+            })
+        return {"total": total, "offset": offset, "limit": limit, "records": records}
+
+    def _scan(self, filters: Dict[str, Any], offset: int, limit: int):
+        total, page = 0, []
+        for rid in self.ids:
+            md = self.meta.get(rid, {"id": rid})
+            reviewed, dirty = rid in self.progress.reviewed, rid in self.progress.dirty
+            if not _matches(_index_fields(md), reviewed, dirty, filters): continue
+            if offset <= total < offset + limit: page.append((rid, md, reviewed, dirty))
+            total += 1
+        return total, page
+
+    def _hydrate(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        out, missing = {}, []
+        for rid in ids:
+            cached = self.record_cache.get(rid)
+            if cached is None: missing.append(rid)
+            else: out[rid] = cached
+        if not missing:
+            return out
+        gen = self._record_gen
+        remote = self._fetch_remote(missing)
+        fresh = {rid: self._merge(rid, remote.get(rid) or {}) for rid in missing}
+        with self._lock:
+            # An edit landed while we were fetching; serve this result but don't cache it.
+            if gen == self._record_gen:
+                for rid, rec in fresh.items(): self.record_cache.set(rid, rec)
+        out.update(fresh)
+        return out
 
+    def _fetch_remote(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Pinecone metadata for `ids` (for hydration/fallback), ADMIN_FETCH_BATCH ids per request."""
+        if self.index is None:
+            return {}
+        if self.snapshot is not None and self.snapshot.synced:
+            # Synced snapshot: no network call at all.
+            return self.snapshot.get_many(ids)
+        out = {}
+        for i in range(0, len(ids), ADMIN_FETCH_BATCH):
+            chunk = ids[i:i+ADMIN_FETCH_BATCH]
+            try:
+                fetched = self.index.fetch(ids=chunk, namespace=NAMESPACE or "")
+            except Exception as e:
+                log.warning("Pinecone fetch failed for %d ids (%s..): %s", len(chunk), chunk[0], e)
+                continue
+            for rid, vec in (getattr(fetched, "vectors", None) or {}).items():
+                # Some SDKs return dict; some return object
+                if isinstance(vec, dict):
+                    out[rid] = vec.get("metadata") or {}
+                else:
+                    out[rid] = getattr(vec, "metadata", {}) or {}
+        return out
+
+    def _merge(self, rid: str, pine_md: Dict[str, Any]) -> Dict[str, Any]:
         # Local on-disk
         doc_local = self.docs.get(rid, {"id": rid, "text": ""})
         md_local  = self.meta.get(rid, {"id": rid})
-
-        # Pinecone (for hydration/fallback)
-        pine_doc_text = None
-        pine_md = {}
-        try:
-            fetched = self.index.fetch(ids=[rid], namespace=NAMESPACE or "")
-            vec = (getattr(fetched, "vectors", None) or {}).get(rid)
-            # Some SDKs return dict; some return object
-            if isinstance(vec, dict):
-                pine_md = vec.get("metadata") or {}
-            else:
-                pine_md = getattr(vec, "metadata", {}) or {}
-            pine_doc_text = (pine_md or {}).get("text") or None
-        except Exception as e:
-            print(f">>> [datastore] Pinecone fetch failed for id={rid}: {e}")
+        pine_doc_text = (pine_md or {}).get("text") or None
 
         # Merge pinecone + local, then FLATTEN
         merged_md_raw = {**(pine_md or {}), **(md_local or {})}  # local overrides
@@ -191,75 +335,257 @@ class DataStore:
             else:
                 merged_md[k] = _u(merged_md[k])
 
-        out = {
-            "index": index,
-            "id": rid,
-            "reviewed": rid in self.reviewed,
-            "dirty": rid in self.dirty,
+        return {
             "document": {"id": rid, "text": merged_doc_text or "Unknown"},
             "metadata": merged_md,
-            "total": len(self.ids)
         }
-        return out
+
+    def sync_snapshot(self, full: bool = False) -> Dict[str, Any]:
+        """Refresh the local Pinecone snapshot; incremental unless `full`."""
+        self._ensure_loaded()
+        if self.snapshot is None:
+            return {"ok": False, "error": f"no Pinecone index (VECTOR_BACKEND={VECTOR_BACKEND})"}
+        synced_at = self.snapshot.state.get("synced_at") or 0
+        # Ids upserted since the last sync (by any process sharing the manifest) may have changed remotely.
+        stale = [rid for rid, e in self.manifest.entries.items() if e.get("upserted_at", 0) > synced_at]
+        report = self.snapshot.sync(self.index, NAMESPACE or "", full=full, stale=stale)
+        with self._lock:
+            self._record_gen += 1
+            self.record_cache.clear()
+        return report
+
+    def drift(self) -> Dict[str, Any]:
+        """Differences between the local JSONL records and the Pinecone snapshot."""
+        self._ensure_loaded()
+        if self.snapshot is None or not self.snapshot.synced:
+            return {"ok": False, "error": "Pinecone snapshot not synced yet"}
+        def local(rid):
+            return self.docs.get(rid, {}).get("text", ""), self.meta.get(rid, {})
+        return {"ok": True, **self.snapshot.drift(self.ids, local)}
+
+    def _prefetch(self, start: int, count: int):
+        key = (start, count)
+        with self._lock:
+            if key in self._prefetching: return
+            self._prefetching.add(key)
+
+        def run():
+            try:
+                self._hydrate(self.ids[start:start+count])
+            except Exception as e:
+                log.warning("Prefetch of records %d..%d failed: %s", start, start + count, e)
+            finally:
+                with self._lock: self._prefetching.discard(key)
+
+        self._prefetcher.submit(run)
 
 
     def update_record(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         rid = str(payload.get("id"))
         if not rid: return {"ok": False, "error": "id required"}
-        print(f">>> [datastore] Updating record {rid}")
-        # update doc text
+        self._ensure_loaded()
+        log.info("Updating record %s", rid)
         text = (payload.get("text") or "").strip()
-        if rid not in self.docs: self.docs[rid] = {"id": rid, "text": text}
-        else: self.docs[rid]["text"] = text
-        # update metadata (store everything except 'text' & 'document')
+        # store everything except 'text' & 'document' as metadata
         md = payload.get("metadata") or {}
         md["id"] = rid
-        self.meta[rid] = md
-        # update progress flags
-        if payload.get("reviewed") is True: self.reviewed.add(rid)
-        self.dirty.add(rid)
-        self._flush_progress()
-        return {"ok": True, "id": rid, "dirty_count": len(self.dirty), "reviewed_count": len(self.reviewed)}
+        entry = {"op": "record", "id": rid, "text": text, "metadata": md,
+                 "reviewed": payload.get("reviewed") is True, "ts": time.time()}
+        with self._lock:
+            if self.db is not None:
+                is_new = rid not in self.db
+                self.db.put(rid, text, md, _index_fields(md), reviewed=True if entry["reviewed"] else None,
+                            dirty=self.manifest.classify(rid, text, md) != SKIP)
+                if is_new: bisect.insort(self.ids, rid)
+            else:
+                # Durable first: once the journal has it, the edit survives a crash.
+                self.journal.append(entry)
+                self._apply(entry)
+            self._record_gen += 1
+            self.record_cache.pop(rid)
+        summary_cache.invalidate_resource(rid)
+        # In-process backends refilter on the edited fields right away (their bitmap
+        # index is updated in place); the vector itself changes on the next upsert.
+        if vector_backend.update_metadata(rid, md | {"text": text}, NAMESPACE or ""):
+            retrieval_cache.invalidate()
+        # The lexical index has no upsert step: edited text is searchable immediately.
+        lexical_index.update_record(rid, text, md)
+        if self.db is None: self._maybe_compact()
+        return {"ok": True, "id": rid, "dirty_count": len(self.progress.dirty),
+                "reviewed_count": len(self.progress.reviewed)}
 
     def save_all(self) -> Dict[str, Any]:
-        print(">>> [datastore] Saving JSONL files...")
-        _write_jsonl(DOCS_PATH, [self.docs[i] for i in self.ids])
-        _write_jsonl(META_PATH, [self.meta.get(i, {"id": i}) for i in self.ids])
-        self._flush_progress()
+        # Every edit is already durable (journal or SQLite); saving folds it into the base files.
+        if self.db is not None:
+            self.db.checkpoint()
+            return {"ok": True, "db_path": DATASTORE_DB_PATH}
+        return self.compact()
+
+    def compact(self) -> Dict[str, Any]:
+        """Rewrite the base JSONL files from memory, then drop the journal."""
+        self._ensure_loaded()
+        if self.db is not None:
+            return {"ok": False, "error": "SQLite storage has no journal to compact"}
+        with self._compact_lock:
+            with self._lock:
+                ids = list(self.ids)
+                docs, meta = dict(self.docs.overlay), dict(self.meta.overlay)
+                # Edits made while the files are written go to a fresh journal segment.
+                self.journal.rotate()
+            log.info("Compacting %d edited records into JSONL files (%d total)", len(docs), len(ids))
+            t0 = time.perf_counter()
+            self.docs.compact(ids, docs, lambda i: {"id": i, "text": ""})
+            self.meta.compact(ids, meta, lambda i: {"id": i})
+            with self._lock:
+                self.docs.forget(docs)
+                self.meta.forget(meta)
+            # The rotated journal is the only durable copy of the write-behind dirty/reviewed flags
+            # for these edits until progress reaches disk, so flush before deleting it.
+            self.progress.flush()
+            self.journal.finish_rotation()
+        log.info("Compaction done in %.2fs", time.perf_counter() - t0)
         return {"ok": True, "docs_path": DOCS_PATH, "meta_path": META_PATH}
 
     def reembed_and_upsert(self, only_dirty: bool = True) -> Dict[str, Any]:
-        targets = list(self.dirty) if only_dirty else list(self.ids)
-        print(f">>> [datastore] Upserting {len(targets)} items to Pinecone (only_dirty={only_dirty})")
-        count = 0; errors = 0
+        self._ensure_loaded()
+        targets = sorted(self.progress.dirty) if only_dirty else list(self.ids)
+        log.info("Upserting %d items to %s (only_dirty=%s)", len(targets), vector_backend.name, only_dirty)
+        records, metadata_only, skipped, unchanged = [], [], [], []
         for rid in targets:
-            try:
-                text = self.docs.get(rid, {}).get("text", "")
-                md   = self.meta.get(rid, {})
-                if not text:
-                    print(f"!!! [datastore] Skipping {rid} (no text)")
-                    continue
-
-                emb = self.oai.embeddings.create(model=EMBED_MODEL, input=text).data[0].embedding
-                vector = {
-                    "id": rid,
-                    "values": emb,
-                    "metadata": md | {"text": text}
-                }
-                self.index.upsert(vectors=[vector], namespace=NAMESPACE or "")
-                count += 1
-            except Exception as e:
-                print(f"!!! [datastore] ERROR upserting {rid}: {e}")
-                errors += 1
+            text = self.docs.get(rid, {}).get("text", "")
+            md   = self.meta.get(rid, {})
+            if not text:
+                log.warning("Skipping %s (no text)", rid)
+                skipped.append(rid)
+                continue
+            record = (rid, text, md | {"text": text})
+            change = self.manifest.classify(rid, text, md)
+            if change == EMBED: records.append(record)
+            elif change == METADATA: metadata_only.append(record)
+            else: unchanged.append(rid)
+        log.info(
+            "%d to re-embed, %d metadata-only, %d unchanged", len(records), len(metadata_only), len(unchanged)
+        )
+
+        indexer = BulkIndexer(
+            embed_fn=lambda texts: embed_cached(texts, self._embed_texts),
+            upsert_fn=lambda vectors: vector_backend.upsert(vectors, namespace=NAMESPACE or ""),
+            update_fn=lambda rid, md: vector_backend.set_metadata(rid, md, namespace=NAMESPACE or ""),
+        )
+        report = indexer.run(records, metadata_only)
+        self.last_index_report = {
+            k: v for k, v in report.items() if k not in ("upserted_ids", "updated_ids")
+        }
 
+        done = set(report["upserted_ids"]) | set(report["updated_ids"])
+        if done:
+            self.manifest.record_many(rec for rec in records + metadata_only if rec[0] in done)
+            self.manifest.save()
+            if self.snapshot is not None:
+                upserted = set(report["upserted_ids"])
+                self.snapshot.apply((rid, md) for rid, _, md in records if rid in upserted)
+                self.snapshot.apply(((rid, md) for rid, _, md in metadata_only if rid in done), merge=True)
+                self.snapshot.save()
+            vector_backend.flush()
+            # The index changed; cached search results may now be stale.
+            retrieval_cache.invalidate()
+        # Failed ids stay dirty, so the next run retries only those.
+        self.progress.clear_dirty(done)
+        self.progress.clear_dirty(unchanged)
         if only_dirty:
-            self.dirty.clear()
-            self._flush_progress()
-        return {"ok": True, "upserted": count, "errors": errors}
+            self.progress.clear_dirty(skipped)
+        return {
+            "ok": True,
+            "upserted": report["upserted"],
+            "metadata_updated": report["metadata_updated"],
+            "unchanged": len(unchanged),
+            "errors": report["failed"],
+            "failed_ids": report["failed_ids"],
+            "skipped": len(skipped),
+            "seconds": report["seconds"],
+            "records_per_s": report["records_per_s"],
+            "tokens_per_s": report["tokens_per_s"],
+        }
+
+    def close(self):
+        """Persist write-behind state; called on app shutdown."""
+        if not self._loaded: return
+        self._prefetcher.shutdown(wait=False, cancel_futures=True)
+        if self.db is not None:
+            self.db.close()
+        else:
+            self.progress.close()
+            self.journal.close()
+            self.docs.close()
+            self.meta.close()
+        if self.snapshot is not None: self.snapshot.close()
 
     # ---------- internal ----------
-    def _flush_progress(self):
-        _write_progress({"reviewed": sorted(self.reviewed), "dirty": sorted(self.dirty)})
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        resp = self.oai.embeddings.create(model=EMBED_MODEL, input=texts)
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+    def _apply(self, entry: Dict[str, Any]):
+        if entry.get("op") == "record":
+            rid = entry["id"]
+            if rid not in self.docs and rid not in self.meta:
+                bisect.insort(self.ids, rid)
+            # Replace rather than mutate, so a compaction snapshot never sees half an edit.
+            self.docs[rid] = {**self.docs.get(rid, {}), "id": rid, "text": entry["text"]}
+            self.meta[rid] = entry["metadata"]
+            if entry.get("reviewed"): self.progress.mark_reviewed(rid)
+            # Only records that differ from what the index holds need an upsert.
+            self.progress.set_dirty(rid, self.manifest.classify(rid, entry["text"], entry["metadata"]) != SKIP)
+
+    def _load_jsonl(self):
+        log.info("Loading JSONL datasets")
+        self.docs = RecordStore(DOCS_PATH)   # id -> {id,text}
+        self.meta = RecordStore(META_PATH)   # id -> {...}
+        self.ids = sorted(set(self.docs) | set(self.meta), key=lambda x: str(x))
+        self.progress = ProgressStore(PROG_PATH)
+        # Edits since the last compaction live in the journal, not in the files above.
+        self.journal = EditJournal(JOURNAL_PATH)
+        self._replay_journal()
+
+    def _import_into_db(self):
+        """First start on SQLite: load the JSONL files, progress and journal, and copy them in."""
+        self._load_jsonl()
+        rows = (
+            (rid, self.docs.get(rid, {}).get("text", ""), md, _index_fields(md),
+             rid in self.progress.reviewed, rid in self.progress.dirty)
+            for rid, md in ((rid, self.meta.get(rid, {"id": rid})) for rid in self.ids)
+        )
+        n = self.db.put_many(rows)
+        log.info("Imported %d records into %s", n, DATASTORE_DB_PATH)
+        self.progress.close()
+        self.journal.close()
+        self.docs.close()
+        self.meta.close()
+
+    def _replay_journal(self):
+        n = 0
+        for entry in self.journal.entries():
+            self._apply(entry)
+            n += 1
+        if n:
+            log.info("Replayed %d journal entries from %s", n, JOURNAL_PATH)
+
+    def _maybe_compact(self):
+        """Compact in the background once the journal passes JOURNAL_COMPACT_BYTES."""
+        with self._lock:
+            if self._compacting or self.journal.size() < JOURNAL_COMPACT_BYTES:
+                return
+            self._compacting = True
+
+        def run():
+            try:
+                self.compact()
+            except Exception as e:
+                log.exception("Background compaction failed: %s", e)
+            finally:
+                self._compacting = False
+
+        threading.Thread(target=run, name="journal-compact", daemon=True).start()
 
 # singleton
 ds = DataStore()
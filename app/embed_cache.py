@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+from array import array
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .cache import LRUCache, SQLiteStore
+from .config import (
+    CACHE_DB_PATH, EMBED_CACHE_DISK_ITEMS, EMBED_CACHE_MEMORY_ITEMS, EMBED_MODEL
+)
+
+Vector = List[float]
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different copies of a text share one entry."""
+    return " ".join((text or "").split())
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (model, normalized text).
+
+    Tier 1 is an in-process LRU; tier 2 is a SQLite table of float32 vectors
+    that survives restarts and is shared by every worker on the host. The
+    async methods serve memory hits on the event loop and run SQLite reads
+    and writes in a worker thread.
+    """
+
+    def __init__(self, model: str, memory: LRUCache, store: Optional[SQLiteStore] = None):
+        self.model = model
+        self.memory = memory
+        self.store = store
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        raw = f"{self.model}\x00{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[Vector]]:
+        keys = [self.key(t) for t in texts]
+        out = self._from_memory(keys)
+        self._from_disk(keys, out)
+        return out
+
+    async def get_many_async(self, texts: Sequence[str]) -> List[Optional[Vector]]:
+        keys = [self.key(t) for t in texts]
+        out = self._from_memory(keys)
+        if self.store and any(v is None for v in out):
+            await asyncio.to_thread(self._from_disk, keys, out)
+        else:
+            self._from_disk(keys, out)
+        return out
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Vector]) -> None:
+        rows = self._to_memory(texts, vectors)
+        if self.store:
+            self.store.put_many(rows)
+
+    async def put_many_async(self, texts: Sequence[str], vectors: Sequence[Vector]) -> None:
+        rows = self._to_memory(texts, vectors)
+        if self.store:
+            await asyncio.to_thread(self.store.put_many, rows)
+
+    def _from_memory(self, keys: List[str]) -> List[Optional[Vector]]:
+        out: List[Optional[Vector]] = [self.memory.get(k) for k in keys]
+        with self._lock:
+            self.memory_hits += sum(1 for v in out if v is not None)
+        return out
+
+    def _from_disk(self, keys: List[str], out: List[Optional[Vector]]) -> None:
+        """Fill the memory misses in `out` from SQLite, in place."""
+        missing = [k for k, v in zip(keys, out) if v is None]
+        found = self.store.get_many(missing) if (self.store and missing) else {}
+        for pos, k in enumerate(keys):
+            if out[pos] is None and k in found:
+                vec = _decode(found[k])
+                self.memory.set(k, vec)
+                out[pos] = vec
+        with self._lock:
+            self.disk_hits += len(found)
+            self.misses += sum(1 for v in out if v is None)
+
+    def _to_memory(self, texts: Sequence[str], vectors: Sequence[Vector]) -> List[Tuple[str, bytes, None]]:
+        rows = []
+        for text, vec in zip(texts, vectors):
+            k = self.key(text)
+            self.memory.set(k, list(vec))
+            rows.append((k, _encode(vec), None))
+        return rows
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            counters = {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+        counters["memory_size"] = len(self.memory)
+        counters["memory_max_items"] = self.memory.max_items
+        counters["disk_max_items"] = self.store.max_entries if self.store else 0
+        return counters
+
+
+def _encode(vec: Sequence[float]) -> bytes:
+    return array("f", vec).tobytes()
+
+
+def _decode(blob: bytes) -> Vector:
+    arr = array("f")
+    arr.frombytes(blob)
+    return arr.tolist()
+
+
+embedding_cache = EmbeddingCache(
+    EMBED_MODEL,
+    LRUCache(EMBED_CACHE_MEMORY_ITEMS),
+    SQLiteStore(CACHE_DB_PATH, "embeddings", EMBED_CACHE_DISK_ITEMS),
+)
+
+
+def embed_cached(
+    texts: Sequence[str],
+    embed_fn: Callable[[List[str]], Sequence[Vector]],
+    cache: EmbeddingCache = embedding_cache,
+) -> List[Vector]:
+    """
+    Return one embedding per text, calling `embed_fn` once for the cache
+    misses only (deduplicated by normalized text) and storing the results.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    out = cache.get_many(texts)
+    batch = _pending(texts, out, cache)
+    if not batch:
+        return out
+    fresh = _checked(batch, embed_fn(batch))
+    cache.put_many(batch, fresh)
+    return _merge(texts, out, batch, fresh, cache)
+
+
+async def embed_cached_async(
+    texts: Sequence[str],
+    embed_fn: Callable[[List[str]], Awaitable[Sequence[Vector]]],
+    cache: EmbeddingCache = embedding_cache,
+) -> List[Vector]:
+    """
+    Async twin of `embed_cached`; `embed_fn` is awaited for the misses and
+    SQLite is only touched from a worker thread.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    out = await cache.get_many_async(texts)
+    batch = _pending(texts, out, cache)
+    if not batch:
+        return out
+    fresh = _checked(batch, await embed_fn(batch))
+    await cache.put_many_async(batch, fresh)
+    return _merge(texts, out, batch, fresh, cache)
+
+
+def _pending(texts: List[str], out: List[Optional[Vector]], cache: EmbeddingCache) -> List[str]:
+    """The missed texts, one per normalized text."""
+    pending: Dict[str, str] = {}
+    for text, vec in zip(texts, out):
+        if vec is None:
+            pending.setdefault(cache.key(text), text)
+    return list(pending.values())
+
+
+def _checked(batch: List[str], fresh: Sequence[Vector]) -> List[Vector]:
+    fresh = list(fresh)
+    if len(fresh) != len(batch):
+        raise ValueError(f"Expected {len(batch)} embeddings, got {len(fresh)}")
+    return fresh
+
+
+def _merge(
+    texts: List[str],
+    out: List[Optional[Vector]],
+    batch: List[str],
+    fresh: List[Vector],
+    cache: EmbeddingCache,
+) -> List[Vector]:
+    by_key = {cache.key(t): v for t, v in zip(batch, fresh)}
+    return [vec if vec is not None else by_key[cache.key(t)] for t, vec in zip(texts, out)]
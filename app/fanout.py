@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, List, Optional, Sequence
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_CALL_TIMEOUT = 15.0
+
+Call = Callable[[], Any]
+
+
+def run_bounded(
+    calls: Sequence[Call],
+    *,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    timeout: Optional[float] = DEFAULT_CALL_TIMEOUT,
+    default: Any = None,
+    label: str = "fanout",
+) -> List[Any]:
+    """
+    Run zero-argument callables on a bounded thread pool.
+
+    Results come back in the same order as `calls`, so callers can merge them
+    deterministically. A call that raises or is still running `timeout`
+    seconds after the fan-out started yields `default` instead of a result.
+    """
+    calls = list(calls)
+    if not calls:
+        return []
+
+    workers = max(1, min(int(max_workers or 1), len(calls)))
+    if workers == 1 and timeout is None:
+        return [_run_one(call, default, label) for call in calls]
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=label)
+    try:
+        # Each call runs in a copy of the caller's context, so its logs keep the request id.
+        futures = [executor.submit(contextvars.copy_context().run, call) for call in calls]
+        deadline = None if timeout is None else time.monotonic() + float(timeout)
+        results: List[Any] = []
+        for pos, future in enumerate(futures):
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                results.append(future.result(timeout=remaining))
+            except FutureTimeout:
+                log.warning("Call %d timed out after %ss; skipping.", pos, timeout, extra={"label": label})
+                future.cancel()
+                results.append(default)
+            except Exception as exc:
+                log.error("Call %d failed: %s", pos, exc, extra={"label": label})
+                results.append(default)
+        return results
+    finally:
+        # Never block the caller on stragglers that already missed the deadline.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_one(call: Call, default: Any, label: str) -> Any:
+    try:
+        return call()
+    except Exception as exc:
+        log.error("Call failed: %s", exc, extra={"label": label})
+        return default
@@ -1,10 +1,21 @@
-import os, json, traceback
-from typing import Dict, List
-from openai import OpenAI
-from .config import OPENAI_API_KEY, GEN_MODEL
+import asyncio, os, json, logging, time, traceback
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from .clients import async_openai_client, openai_client
+from .config import GEN_MODEL
+from .log import SAMPLED
+from .metrics import FALLBACKS, OPERATION_SECONDS, record_openai_usage
+from .summary_cache import NeedRef, SummaryKey, content_hash, need_key, summary_cache
 
-print(">>> [generator] Initializing OpenAI client for generation...")
-client = OpenAI(api_key=OPENAI_API_KEY)
+log = logging.getLogger(__name__)
+
+# Shared clients, built on first use (see app/clients.py).
+client = openai_client
+aclient = async_openai_client
+
+_SUMMARY_SECONDS = OPERATION_SECONDS.labels("card_summaries")
+_PLAN_SECONDS = OPERATION_SECONDS.labels("action_plan")
+_SUMMARY_FALLBACKS = FALLBACKS.labels("card_summaries")
+_PLAN_FALLBACKS = FALLBACKS.labels("action_plan")
 
 SYSTEM_PROMPT = """You are a helpful assistant that routes people to local community resources.
 Use ONLY the provided resources. Keep summaries factual; do not invent contact details."""
@@ -14,13 +25,175 @@ def _slice(s: str | None, n: int = 900) -> str:
     s = s.strip()
     return s if len(s) <= n else s[:n] + "..."
 
-def generate_card_summaries(user_query: str, retrieved: List[Dict]) -> Dict[str, str]:
+SUMMARY_SCHEMA = {
+  "name":"card_summaries",
+  "schema":{
+    "type":"object",
+    "properties":{
+      "cards":{
+        "type":"array",
+        "items":{
+          "type":"object",
+          "properties":{
+            "id":{"type":"string"},
+            "summary":{"type":"string"}
+          },
+          "required":["id","summary"],
+          "additionalProperties":False
+        }
+      }
+    },
+    "required":["cards"],
+    "additionalProperties":False
+  }
+}
+
+# Build a super-compact prompt
+SUMMARY_PROMPT = (
+    "For each item, write a concise 1–2 sentence summary tailored to the user's question. "
+    "Mention what it provides and any clear eligibility/cost/language. Respond in JSON only."
+)
+
+# Need-keyed summaries are shared by everyone with that need, so the prompt carries no story.
+NEED_SUMMARY_PROMPT = (
+    "For each item, write a concise 1–2 sentence summary of how it helps with the item's `need`. "
+    "Mention what it provides and any clear eligibility/cost/language. Respond in JSON only."
+)
+
+PLAN_PROMPT = (
+    "Write a compassionate, empowering action plan for the person described in the user story. "
+    "Use two to three paragraphs. The first paragraph should acknowledge their situation. "
+    "Subsequent paragraph(s) should suggest concrete next steps, referencing the kinds of resources available "
+    "for each need (e.g., food pantries, rental assistance). Stay factual and concise. Whenever you mention a "
+    "specific resource or organization from the provided JSON, include the citation marker [cite: RESOURCE_ID] "
+    "immediately after the mention, using the resource's `id` value. If an item has an empty id, describe it "
+    "without a citation."
+)
+
+def generate_card_summaries(
+    user_query: str,
+    retrieved: List[Dict],
+    need: Optional[str] = None,
+    needs: Optional[Dict[str, NeedRef]] = None,
+) -> Dict[str, str]:
     """
     Return dict: {match_id: summary (1–2 sentences)} using structured outputs.
-    Falls back to a deterministic summary if the model call fails.
+    Summaries already cached for (resource content, need or query) are reused;
+    only the rest go to the model. Cards listed in `needs` (resource id ->
+    (need slug, need query)) are written for their need's query alone and
+    cached per slug; the others are written for `user_query` and cached per
+    `need`, if given (then `user_query` must be that need's query), else per
+    query. At most one call per kind. Falls back to a deterministic summary
+    if the model call fails.
+    """
+    log.info("Generating per-card summaries", extra={"items": len(retrieved), **SAMPLED})
+    items = _summary_items(retrieved)
+    summaries, missing, entries = _split_cached(items, user_query, need, needs)
+
+    # Try structured output first
+    for question, batch in _summary_calls(user_query, missing):
+        try:
+            with _SUMMARY_SECONDS.time():
+                resp = client.responses.create(**_summary_request(question, batch))
+            record_openai_usage("responses", GEN_MODEL, resp)
+            fresh = _parse_summaries(resp.output_text)
+            log.info("Summaries generated", extra={"items": len(fresh), **SAMPLED})
+            _store_summaries(fresh, entries)
+            summaries.update(fresh)
+        except Exception as e:
+            log.warning("Structured output failed; using fallback: %s", e)
+            _SUMMARY_FALLBACKS.inc()
+
+    return _fill_fallback_summaries(items, summaries)
+
+
+async def generate_card_summaries_async(
+    user_query: str,
+    retrieved: List[Dict],
+    fallback: bool = True,
+    need: Optional[str] = None,
+    needs: Optional[Dict[str, NeedRef]] = None,
+) -> Dict[str, str]:
     """
-    print(f">>> [generator] Generating per-card summaries for {len(retrieved)} items")
+    Async twin of `generate_card_summaries` built on AsyncOpenAI; its calls
+    run concurrently. With `fallback=False` only model-written summaries are
+    returned, so callers can pair it with `fallback_card_summaries` computed
+    independently.
+    """
+    log.info("Generating per-card summaries (async)", extra={"items": len(retrieved), **SAMPLED})
+    items = _summary_items(retrieved)
+    # The summary cache may read SQLite; keep that off the event loop.
+    summaries, missing, entries = await asyncio.to_thread(_split_cached, items, user_query, need, needs)
+
+    async def summarize(question: Optional[str], batch: List[Dict]) -> Dict[str, str]:
+        try:
+            with _SUMMARY_SECONDS.time():
+                resp = await aclient.responses.create(**_summary_request(question, batch))
+            record_openai_usage("responses", GEN_MODEL, resp)
+            fresh = _parse_summaries(resp.output_text)
+            log.info("Summaries generated", extra={"items": len(fresh), **SAMPLED})
+            await asyncio.to_thread(_store_summaries, fresh, entries)
+            return fresh
+        except Exception as e:
+            log.warning("Structured output failed; using fallback: %s", e)
+            _SUMMARY_FALLBACKS.inc()
+            return {}
 
+    for fresh in await asyncio.gather(*[summarize(q, b) for q, b in _summary_calls(user_query, missing)]):
+        summaries.update(fresh)
+
+    return _fill_fallback_summaries(items, summaries) if fallback else summaries
+
+
+def _split_cached(
+    items: List[Dict],
+    user_query: str,
+    need: Optional[str],
+    needs: Optional[Dict[str, NeedRef]] = None,
+) -> Tuple[Dict[str, str], List[Dict], Dict[str, SummaryKey]]:
+    """
+    Return (cached summaries by id, items still needing the model, cache entry by id).
+    Items in `needs` are sent to the model with their need's query as `need`.
+    """
+    needs = needs or {}
+    entries = {
+        it["id"]: (
+            it["id"],
+            content_hash(it),
+            needs[it["id"]][0] if it["id"] in needs else need_key(need, user_query),
+        )
+        for it in items if it["id"]
+    }
+    ids = list(entries)
+    cached = summary_cache.get_many([entries[i] for i in ids])
+    summaries = {i: text for i, text in zip(ids, cached) if text is not None}
+    missing = [
+        {**it, "need": needs[it["id"]][1]} if it["id"] in needs else it
+        for it in items if not it["id"] or it["id"] not in summaries
+    ]
+    if summaries:
+        log.info("Summary cache hits", extra={"hits": len(summaries), "items": len(items), **SAMPLED})
+    return summaries, missing, entries
+
+
+def _summary_calls(user_query: str, missing: List[Dict]) -> List[Tuple[Optional[str], List[Dict]]]:
+    """(question, items) per model call: need-tagged items go without the query."""
+    by_need = [it for it in missing if "need" in it]
+    by_query = [it for it in missing if "need" not in it]
+    return [(q, batch) for q, batch in ((None, by_need), (user_query, by_query)) if batch]
+
+
+def _store_summaries(fresh: Dict[str, str], entries: Dict[str, SummaryKey]) -> None:
+    ids = [i for i in fresh if i in entries and fresh[i]]
+    summary_cache.put_many([entries[i] for i in ids], [fresh[i] for i in ids])
+
+
+def fallback_card_summaries(retrieved: List[Dict]) -> Dict[str, str]:
+    """Deterministic metadata-only summaries; needs no model call."""
+    return _fill_fallback_summaries(_summary_items(retrieved), {})
+
+
+def _summary_items(retrieved: List[Dict]) -> List[Dict]:
     items = []
     for r in retrieved:
         md = r.get("metadata", {}) or {}
@@ -34,75 +207,56 @@ def generate_card_summaries(user_query: str, retrieved: List[Dict]) -> Dict[str,
             "languages": md.get("languages") or [],
             "categories": md.get("categories") or []
         })
+    return items
 
-    schema = {
-      "name":"card_summaries",
-      "schema":{
-        "type":"object",
-        "properties":{
-          "cards":{
-            "type":"array",
-            "items":{
-              "type":"object",
-              "properties":{
-                "id":{"type":"string"},
-                "summary":{"type":"string"}
-              },
-              "required":["id","summary"],
-              "additionalProperties":False
+
+def _summary_request(user_query: Optional[str], items: List[Dict]) -> Dict:
+    items_json = json.dumps(items, ensure_ascii=False)
+    if user_query is None:
+        content = f"Items JSON:\n{items_json}\n{NEED_SUMMARY_PROMPT}"
+    else:
+        content = f"User question: {user_query}\nItems JSON:\n{items_json}\n{SUMMARY_PROMPT}"
+    return {
+        "model": GEN_MODEL,
+        "input": [
+            {"role":"system","content":SYSTEM_PROMPT},
+            {"role":"user","content": content}
+        ],
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": SUMMARY_SCHEMA["name"],
+                "schema": SUMMARY_SCHEMA["schema"] # <-- THIS IS CORRECT
             }
-          }
         },
-        "required":["cards"],
-        "additionalProperties":False
-      }
     }
 
-    # Build a super-compact prompt
-    prompt = (
-        "For each item, write a concise 1–2 sentence summary tailored to the user's question. "
-        "Mention what it provides and any clear eligibility/cost/language. Respond in JSON only."
-    )
 
-    # Try structured output first
-    try:
-        resp = client.responses.create(
-            model=GEN_MODEL,
-            input=[
-                {"role":"system","content":SYSTEM_PROMPT},
-                {"role":"user","content": f"User question: {user_query}\nItems JSON:\n{json.dumps(items, ensure_ascii=False)}\n{prompt}"}
-            ],
-            text={
-                "format": {
-                    "type": "json_schema",
-                    "name": schema["name"],
-                    "schema": schema["schema"] # <-- THIS IS CORRECT
-                }
-            },
-        )
-        data = json.loads(resp.output_text)
-        summaries = {str(c["id"]): c["summary"].strip() for c in data.get("cards", []) if c.get("id")}
-        print(f">>> [generator] Summaries generated for {len(summaries)} items.")
-    except Exception as e:
-        print(">>> [generator] Structured output failed; using fallback:", e)
-        summaries = {}
+def _parse_summaries(output_text: str) -> Dict[str, str]:
+    data = json.loads(output_text)
+    return {str(c["id"]): c["summary"].strip() for c in data.get("cards", []) if c.get("id")}
+
 
+def _fill_fallback_summaries(items: List[Dict], summaries: Dict[str, str]) -> Dict[str, str]:
     # Fallback: deterministic single-line summary using metadata
     if len(summaries) < len(items):
         for it in items:
             mid = it["id"]
             if not mid or mid in summaries:
                 continue
-            services = ", ".join(it.get("categories") or []) or "services"
-            langs = ", ".join(it.get("languages") or []) or ""
-            bits = [
-                f"{it.get('name') or 'Resource'} — {it.get('org') or 'Organization'} provides {services.lower()}",
-                f"({it['fees']})" if it.get("fees") else "",
-                f"Languages: {langs}" if langs else "",
-            ]
-            summaries[mid] = " ".join([b for b in bits if b]).strip()
+            summaries[mid] = _fallback_summary(it)
+    return summaries
 
-    return summaries
+
+def _fallback_summary(it: Dict) -> str:
+    services = ", ".join(it.get("categories") or []) or "services"
+    langs = ", ".join(it.get("languages") or []) or ""
+    bits = [
+        f"{it.get('name') or 'Resource'} — {it.get('org') or 'Organization'} provides {services.lower()}",
+        f"({it['fees']})" if it.get("fees") else "",
+        f"Languages: {langs}" if langs else "",
+    ]
+    return " ".join([b for b in bits if b]).strip()
 
 
 def generate_action_plan(user_query: str, grouped_results: Dict[str, List[Dict]]) -> str:
@@ -112,8 +266,89 @@ def generate_action_plan(user_query: str, grouped_results: Dict[str, List[Dict]]
     if not story or not grouped_results:
         return ""
 
-    print(">>> [generator] Generating action plan narrative...")
+    log.info("Generating action plan narrative", extra=SAMPLED)
+    plan_payload = _plan_payload(grouped_results)
 
+    try:
+        with _PLAN_SECONDS.time():
+            resp = client.responses.create(**_plan_request(story, plan_payload))
+        record_openai_usage("responses", GEN_MODEL, resp)
+        text = resp.output_text.strip()
+        if text:
+            return text
+    except Exception as exc:
+        log.warning("Failed to generate action plan: %s", exc)
+
+    _PLAN_FALLBACKS.inc()
+    return _fallback_plan(plan_payload)
+
+
+async def generate_action_plan_async(user_query: str, grouped_results: Dict[str, List[Dict]]) -> str:
+    """Async twin of `generate_action_plan` built on AsyncOpenAI."""
+
+    story = (user_query or "").strip()
+    if not story or not grouped_results:
+        return ""
+
+    log.info("Generating action plan narrative (async)", extra=SAMPLED)
+    plan_payload = _plan_payload(grouped_results)
+
+    try:
+        with _PLAN_SECONDS.time():
+            resp = await aclient.responses.create(**_plan_request(story, plan_payload))
+        record_openai_usage("responses", GEN_MODEL, resp)
+        text = resp.output_text.strip()
+        if text:
+            return text
+    except Exception as exc:
+        log.warning("Failed to generate action plan: %s", exc)
+
+    _PLAN_FALLBACKS.inc()
+    return _fallback_plan(plan_payload)
+
+
+async def stream_action_plan_async(
+    user_query: str, grouped_results: Dict[str, List[Dict]]
+) -> AsyncIterator[str]:
+    """
+    Yield the action plan as text deltas from the Responses streaming API.
+    If the stream fails before any text arrives, the fallback narrative is
+    yielded as a single chunk instead.
+    """
+
+    story = (user_query or "").strip()
+    if not story or not grouped_results:
+        return
+
+    log.info("Streaming action plan narrative", extra=SAMPLED)
+    plan_payload = _plan_payload(grouped_results)
+
+    emitted = False
+    t0 = time.perf_counter()
+    try:
+        stream = await aclient.responses.create(**_plan_request(story, plan_payload), stream=True)
+        async for event in stream:
+            event_type = getattr(event, "type", "")
+            if event_type == "response.completed":
+                record_openai_usage("responses", GEN_MODEL, getattr(event, "response", None))
+            if event_type != "response.output_text.delta":
+                continue
+            delta = getattr(event, "delta", "") or ""
+            if delta:
+                emitted = True
+                yield delta
+    except Exception as exc:
+        log.warning("Action plan stream failed: %s", exc)
+    finally:
+        # Time to the last delta, including the client reading each chunk in between.
+        _PLAN_SECONDS.observe(time.perf_counter() - t0)
+
+    if not emitted:
+        _PLAN_FALLBACKS.inc()
+        yield _fallback_plan(plan_payload)
+
+
+def _plan_payload(grouped_results: Dict[str, List[Dict]]) -> List[Dict]:
     plan_payload = []
     for slug, resources in grouped_results.items():
         label = str(slug or "support options").replace("-", " ").title()
@@ -134,39 +369,28 @@ def generate_action_plan(user_query: str, grouped_results: Dict[str, List[Dict]]
                 "categories": md.get("categories") or [],
             })
         plan_payload.append({"need": slug, "label": label, "resources": entries})
+    return plan_payload
 
-    prompt = (
-        "Write a compassionate, empowering action plan for the person described in the user story. "
-        "Use two to three paragraphs. The first paragraph should acknowledge their situation. "
-        "Subsequent paragraph(s) should suggest concrete next steps, referencing the kinds of resources available "
-        "for each need (e.g., food pantries, rental assistance). Stay factual and concise. Whenever you mention a "
-        "specific resource or organization from the provided JSON, include the citation marker [cite: RESOURCE_ID] "
-        "immediately after the mention, using the resource's `id` value. If an item has an empty id, describe it "
-        "without a citation."
-    )
 
-    try:
-        resp = client.responses.create(
-            model=GEN_MODEL,
-            input=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {
-                    "role": "user",
-                    "content": (
-                        f"User story: {story}\n"
-                        f"Grouped results JSON: {json.dumps(plan_payload, ensure_ascii=False)}\n"
-                        f"{prompt}"
-                    ),
-                },
-            ],
-        )
-        text = resp.output_text.strip()
-        if text:
-            return text
-    except Exception as exc:
-        print(">>> [generator] Failed to generate action plan:", exc)
+def _plan_request(story: str, plan_payload: List[Dict]) -> Dict:
+    return {
+        "model": GEN_MODEL,
+        "input": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": (
+                    f"User story: {story}\n"
+                    f"Grouped results JSON: {json.dumps(plan_payload, ensure_ascii=False)}\n"
+                    f"{PLAN_PROMPT}"
+                ),
+            },
+        ],
+    }
 
-    print(">>> [generator] Using fallback action plan narrative.")
+
+def _fallback_plan(plan_payload: List[Dict]) -> str:
+    log.info("Using fallback action plan narrative.")
 
     parts = [
         "We understand your situation and are here to help connect you with nearby support.",
@@ -196,4 +420,3 @@ def generate_action_plan(user_query: str, grouped_results: Dict[str, List[Dict]]
         "Please contact these organizations to confirm details like hours, eligibility, and availability."
     )
     return "\n\n".join(parts)
-
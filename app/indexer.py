@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import email.utils
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .config import (
+    INDEX_EMBED_BATCH_ITEMS, INDEX_EMBED_BATCH_TOKENS, INDEX_MAX_RETRIES,
+    INDEX_MAX_WORKERS, INDEX_UPSERT_BATCH,
+)
+
+log = logging.getLogger(__name__)
+
+# (id, text, metadata) for one record to embed and upsert.
+Record = Tuple[str, str, Dict[str, Any]]
+Vector = List[float]
+
+# Retry these; any other 4xx means the request itself is bad.
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+class BatchFailed(Exception):
+    """A batch failed permanently (non-retryable error or retries exhausted)."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap upper-bound-ish token count (~4 characters per token) for batching."""
+    return len(text or "") // 4 + 1
+
+
+def plan_embed_batches(
+    records: Sequence[Record],
+    max_tokens: int = INDEX_EMBED_BATCH_TOKENS,
+    max_items: int = INDEX_EMBED_BATCH_ITEMS,
+) -> List[List[Record]]:
+    """Greedily pack records into embedding requests under both limits, keeping input order."""
+    batches: List[List[Record]] = []
+    current: List[Record] = []
+    tokens = 0
+    for rec in records:
+        cost = estimate_tokens(rec[1])
+        if current and (tokens + cost > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, tokens = [], 0
+        current.append(rec)
+        tokens += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+class BulkIndexer:
+    """
+    Embeds and upserts many records: embedding requests carry as many texts as
+    the token budget allows, upserts go out in groups of `upsert_batch`, and
+    `max_workers` batches are in flight at once.
+
+    Calls that fail with 429/5xx/connection errors are retried with backoff,
+    honouring Retry-After when the error carries one. A batch rejected as bad
+    (other 4xx) is split in half until the offending records are isolated,
+    so only those ids end up in `failed_ids`.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], Sequence[Vector]],
+        upsert_fn: Callable[[List[Dict[str, Any]]], Any],
+        *,
+        update_fn: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+        max_workers: int = INDEX_MAX_WORKERS,
+        embed_batch_tokens: int = INDEX_EMBED_BATCH_TOKENS,
+        embed_batch_items: int = INDEX_EMBED_BATCH_ITEMS,
+        upsert_batch: int = INDEX_UPSERT_BATCH,
+        max_retries: int = INDEX_MAX_RETRIES,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.embed_fn = embed_fn
+        self.upsert_fn = upsert_fn
+        self.update_fn = update_fn
+        self.max_workers = max(1, int(max_workers))
+        self.embed_batch_tokens = embed_batch_tokens
+        self.embed_batch_items = embed_batch_items
+        self.upsert_batch = max(1, int(upsert_batch))
+        self.max_retries = max(0, int(max_retries))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_progress = on_progress or _log_progress
+        self._sleep = sleep
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def run(self, records: Sequence[Record], metadata_only: Sequence[Record] = ()) -> Dict[str, Any]:
+        """
+        Embed and upsert `records`; for `metadata_only` records just call
+        `update_fn(id, metadata)`, with no embedding request.
+        """
+        records = list(records)
+        metadata_only = list(metadata_only)
+        if metadata_only and self.update_fn is None:
+            raise ValueError("metadata_only records need an update_fn")
+        batches = plan_embed_batches(records, self.embed_batch_tokens, self.embed_batch_items)
+        updates = [
+            metadata_only[start:start + self.upsert_batch]
+            for start in range(0, len(metadata_only), self.upsert_batch)
+        ]
+        self._started = self._clock()
+        self._state = {
+            "total": len(records) + len(metadata_only), "done": 0, "tokens": 0, "retries": 0,
+            "upserted_ids": [], "updated_ids": [], "failed_ids": [], "errors": [],
+        }
+        log.info(
+            "%d records in %d embedding batches, %d metadata-only updates (%d workers, upsert batch %d)",
+            len(records), len(batches), len(metadata_only), self.max_workers, self.upsert_batch,
+        )
+        if batches or updates:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="indexer") as pool:
+                futures = [pool.submit(self._index_batch, batch) for batch in batches]
+                futures += [pool.submit(self._update_batch, batch) for batch in updates]
+                for future in as_completed(futures):
+                    future.result()
+        return self._report()
+
+    # ---------- per batch ----------
+    def _index_batch(self, batch: List[Record]) -> None:
+        try:
+            vectors = self._call(lambda: list(self.embed_fn([text for _, text, _ in batch])), "embed")
+            if len(vectors) != len(batch):
+                raise BatchFailed(f"expected {len(batch)} embeddings, got {len(vectors)}")
+        except BatchFailed as exc:
+            self._split_or_fail(batch, exc, self._index_batch)
+            return
+
+        payload = [
+            {"id": rid, "values": vec, "metadata": md}
+            for (rid, _, md), vec in zip(batch, vectors)
+        ]
+        for start in range(0, len(payload), self.upsert_batch):
+            self._upsert(batch[start:start + self.upsert_batch], payload[start:start + self.upsert_batch])
+
+    def _upsert(self, records: List[Record], payload: List[Dict[str, Any]]) -> None:
+        try:
+            self._call(lambda: self.upsert_fn(payload), "upsert")
+        except BatchFailed as exc:
+            by_id = {p["id"]: p for p in payload}
+            self._split_or_fail(
+                records, exc, lambda part: self._upsert(part, [by_id[rid] for rid, _, _ in part])
+            )
+            return
+        self._record_done(records, ok=True)
+
+    def _update_batch(self, records: List[Record]) -> None:
+        done: List[Record] = []
+        for rec in records:
+            rid, _, md = rec
+            try:
+                self._call(lambda: self.update_fn(rid, md), "update")
+                done.append(rec)
+            except BatchFailed as exc:
+                log.warning("Giving up on %s: %s", rid, exc)
+                self._record_done([rec], ok=False, error=str(exc))
+        if done:
+            self._record_done(done, ok=True, key="updated_ids")
+
+    def _split_or_fail(self, records: List[Record], exc: Exception, retry: Callable[[List[Record]], None]) -> None:
+        if len(records) > 1 and not getattr(exc, "retryable", False):
+            mid = len(records) // 2
+            retry(records[:mid])
+            retry(records[mid:])
+            return
+        log.warning("Giving up on %s: %s", [rid for rid, _, _ in records], exc)
+        self._record_done(records, ok=False, error=str(exc))
+
+    # ---------- retries ----------
+    def _call(self, fn: Callable[[], Any], label: str) -> Any:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn()
+            except Exception as exc:
+                retryable = is_retryable(exc)
+                if not retryable or attempt == self.max_retries:
+                    failure = BatchFailed(f"{label} failed: {exc}")
+                    failure.retryable = retryable
+                    raise failure from exc
+                delay = retry_after_seconds(exc)
+                if delay is None:
+                    # Exponential backoff with full jitter.
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                delay = min(delay, self.max_delay)
+                with self._lock:
+                    self._state["retries"] += 1
+                log.info("%s attempt %d failed (%s); retrying in %.1fs", label, attempt + 1, exc, delay)
+                self._sleep(delay)
+
+    # ---------- progress ----------
+    def _record_done(
+        self,
+        records: List[Record],
+        ok: bool,
+        error: Optional[str] = None,
+        key: str = "upserted_ids",
+    ) -> None:
+        with self._lock:
+            state = self._state
+            state["done"] += len(records)
+            if key == "upserted_ids":
+                state["tokens"] += sum(estimate_tokens(text) for _, text, _ in records)
+            state[key if ok else "failed_ids"].extend(rid for rid, _, _ in records)
+            if error:
+                state["errors"].append(error)
+            snapshot = self._report_locked()
+        self.on_progress(snapshot)
+
+    def _report(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._report_locked()
+
+    def _report_locked(self) -> Dict[str, Any]:
+        state = self._state
+        elapsed = max(1e-9, self._clock() - self._started)
+        return {
+            "total": state["total"],
+            "done": state["done"],
+            "upserted": len(state["upserted_ids"]),
+            "metadata_updated": len(state["updated_ids"]),
+            "failed": len(state["failed_ids"]),
+            "upserted_ids": list(state["upserted_ids"]),
+            "updated_ids": list(state["updated_ids"]),
+            "failed_ids": list(state["failed_ids"]),
+            "retries": state["retries"],
+            "errors": list(state["errors"][-10:]),
+            "seconds": round(elapsed, 2),
+            "records_per_s": round(state["done"] / elapsed, 1),
+            "tokens_per_s": round(state["tokens"] / elapsed, 1),
+        }
+
+
+def _log_progress(report: Dict[str, Any]) -> None:
+    log.info(
+        "%d/%d records (%d failed, %s rec/s, ~%s tok/s)",
+        report["done"], report["total"], report["failed"], report["records_per_s"], report["tokens_per_s"],
+    )
+
+
+def status_code(exc: Exception) -> Optional[int]:
+    for source in (exc, getattr(exc, "response", None)):
+        for attr in ("status_code", "status"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def is_retryable(exc: Exception) -> bool:
+    status = status_code(exc)
+    if status is None:
+        # No HTTP status: connection resets, timeouts and the like.
+        return not isinstance(exc, (ValueError, TypeError, KeyError))
+    return status in _RETRYABLE_STATUS or status >= 500
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP-date), if the error has one."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or getattr(exc, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
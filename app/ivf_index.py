@@ -0,0 +1,425 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import mmap
+import os
+import time
+from typing import Any, Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+
+from .bitmap_index import BitmapIndex, bitset_rows
+from .config import NAMESPACE
+from .vector_backend import Hit, LocalBackend, VectorBackend, _unit_rows, match_filter
+
+log = logging.getLogger(__name__)
+
+_CODE_DTYPES = ("int8", "float16")
+# Rows are scored / assigned this many at a time so no step materializes a full float32 copy.
+_BLOCK = 16384
+
+
+class IVFShard:
+    """
+    One namespace of an inverted-file index, read from disk with mmap.
+
+    Rows are grouped by k-means partition. Each row is stored twice: as int8
+    (with a per-row scale) or float16 codes for the coarse scan, and as float32
+    for the exact rerank. Only `centroids`, `offsets` and the bitmap index
+    over the filterable fields live on the heap; everything else, including
+    ids, metadata and the id lookup table, is paged in on demand.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.centroids = np.load(os.path.join(folder, "centroids.npy"))
+        self.offsets = np.load(os.path.join(folder, "offsets.npy"))
+        self.codes = np.load(os.path.join(folder, "codes.npy"), mmap_mode="r")
+        scales_path = os.path.join(folder, "scales.npy")
+        self.scales = np.load(scales_path, mmap_mode="r") if os.path.exists(scales_path) else None
+        self.vectors = np.load(os.path.join(folder, "vectors.npy"), mmap_mode="r")
+        self.record_offsets = np.load(os.path.join(folder, "record_offsets.npy"), mmap_mode="r")
+        self._records_file = open(os.path.join(folder, "records.jsonl"), "rb")
+        self._records = mmap.mmap(self._records_file.fileno(), 0, access=mmap.ACCESS_READ)
+        hashes_path = os.path.join(folder, "id_hashes.npy")
+        if os.path.exists(hashes_path):
+            self.id_hashes = np.load(hashes_path, mmap_mode="r")
+            self.id_rows = np.load(os.path.join(folder, "id_rows.npy"), mmap_mode="r")
+        else:
+            self.id_hashes = self.id_rows = None
+        bitmap_path = os.path.join(folder, "bitmap.npz")
+        if os.path.exists(bitmap_path):
+            self.bitmap = BitmapIndex.load(bitmap_path)
+        else:
+            # Shards written before build_ivf saved bitmaps: index the records now.
+            t0 = time.perf_counter()
+            self.bitmap = BitmapIndex.build([self.record(pos)[1] for pos in range(len(self))])
+            log.info("Built bitmap index for %s in %.2fs", folder, time.perf_counter() - t0)
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    @property
+    def dim(self) -> int:
+        return int(self.centroids.shape[1])
+
+    def record(self, pos: int) -> Tuple[str, Dict[str, Any]]:
+        start, end = int(self.record_offsets[pos]), int(self.record_offsets[pos + 1])
+        obj = orjson.loads(self._records[start:end])
+        return str(obj["id"]), obj.get("metadata") or {}
+
+    def find(self, rid: str) -> Optional[int]:
+        """Row of `rid`, looked up by id hash in the table `build_ivf` saves."""
+        if self.id_hashes is None:
+            return self._scan(rid)
+        rid = str(rid)
+        h = np.uint64(_id_hash(rid))
+        lo = int(np.searchsorted(self.id_hashes, h, side="left"))
+        hi = int(np.searchsorted(self.id_hashes, h, side="right"))
+        for pos in self.id_rows[lo:hi]:
+            if self.record(int(pos))[0] == rid:
+                return int(pos)
+        return None
+
+    def _scan(self, rid: str) -> Optional[int]:
+        """Byte search over the records file, for shards built without an id table."""
+        needle = b'{"id":' + orjson.dumps(str(rid)) + b","
+        if self._records[:len(needle)] == needle:
+            at = 0
+        else:
+            at = self._records.find(b"\n" + needle)
+            if at < 0:
+                return None
+            at += 1
+        return int(np.searchsorted(self.record_offsets, at))
+
+    def search(
+        self,
+        q: np.ndarray,
+        top_k: int,
+        metadata_filter: Optional[Dict[str, Any]],
+        nprobe: int,
+        rerank: int,
+        skip: Collection[str] = frozenset(),
+    ) -> List[Hit]:
+        """
+        Scan the `nprobe` partitions nearest to `q` with the compact codes,
+        rerank the best `top_k * rerank` rows exactly in float32, then walk them
+        best first. Filters on bitmap-indexed fields restrict the rows up
+        front; when fewer rows pass than a probe would scan, those rows are
+        scored exactly instead. Other filters are checked row by row over
+        every probed row.
+        """
+        bits = self.bitmap.evaluate(metadata_filter) if metadata_filter else None
+        if bits is not None:
+            allowed = bitset_rows(bits)
+            if not len(allowed):
+                return []
+            if len(allowed) <= self._probe_size(nprobe):
+                return self._walk(allowed, q, top_k, None, skip)
+            positions, approx = self._probe(q, nprobe)
+            keep = np.isin(positions, allowed, assume_unique=True)
+            positions, approx = positions[keep], approx[keep]
+            metadata_filter = None
+        else:
+            positions, approx = self._probe(q, nprobe)
+        if not len(positions):
+            return []
+        pool = len(positions) if metadata_filter else min(len(positions), top_k * max(1, rerank) + len(skip))
+        if pool < len(positions):
+            best = np.argpartition(-approx, pool - 1)[:pool]
+            positions = positions[best]
+        return self._walk(positions, q, top_k, metadata_filter, skip)
+
+    def _walk(
+        self,
+        positions: np.ndarray,
+        q: np.ndarray,
+        top_k: int,
+        metadata_filter: Optional[Dict[str, Any]],
+        skip: Collection[str],
+    ) -> List[Hit]:
+        positions = np.sort(positions)  # sequential reads from the float32 mmap
+        exact = np.asarray(self.vectors[positions], dtype=np.float32) @ q
+        order = np.argsort(-exact, kind="stable")
+
+        hits: List[Hit] = []
+        for i in order:
+            rid, md = self.record(int(positions[i]))
+            if rid in skip or (metadata_filter and not match_filter(md, metadata_filter)):
+                continue
+            hits.append({"id": rid, "score": float(exact[i]), "metadata": md})
+            if len(hits) >= top_k:
+                break
+        return hits
+
+    def exact_search(self, q: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """Brute force over the float32 rows; the baseline for `evaluate`."""
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), _BLOCK):
+            scores[start:start + _BLOCK] = np.asarray(self.vectors[start:start + _BLOCK]) @ q
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(p), float(scores[p])) for p in top]
+
+    def close(self) -> None:
+        self._records.close()
+        self._records_file.close()
+
+    def _probe(self, q: np.ndarray, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        nlist = len(self.centroids)
+        nprobe = max(1, min(int(nprobe), nlist))
+        cent = self.centroids @ q
+        probe = np.argpartition(-cent, nprobe - 1)[:nprobe] if nprobe < nlist else np.arange(nlist)
+        positions, scores = [], []
+        for p in probe:
+            start, end = int(self.offsets[p]), int(self.offsets[p + 1])
+            if start == end:
+                continue
+            positions.append(np.arange(start, end))
+            scores.append(self._approx_scores(start, end, q))
+        if not positions:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return np.concatenate(positions), np.concatenate(scores)
+
+    def _probe_size(self, nprobe: int) -> int:
+        """Rows a probe of `nprobe` average-sized partitions would scan."""
+        return int(len(self) * min(nprobe, len(self.centroids)) / max(1, len(self.centroids)))
+
+    def _approx_scores(self, start: int, end: int, q: np.ndarray) -> np.ndarray:
+        out = np.empty(end - start, dtype=np.float32)
+        for s in range(start, end, _BLOCK):
+            e = min(end, s + _BLOCK)
+            block = np.asarray(self.codes[s:e], dtype=np.float32) @ q
+            if self.scales is not None:
+                block *= self.scales[s:e]
+            out[s - start:e - start] = block
+        return out
+
+
+class IVFBackend(VectorBackend):
+    """
+    Approximate search over prebuilt IVF shards (see `build_ivf`), one folder
+    per namespace. Admin upserts land in an exact `LocalBackend` overlay kept
+    in `<path>/_delta` that shadows the same ids in the shards until the
+    index is rebuilt offline.
+    """
+
+    name = "ivf"
+
+    def __init__(self, path: Optional[str], nprobe: int, rerank: int):
+        self.path = path
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self._shards: Dict[str, IVFShard] = {}
+        self.delta = LocalBackend(path=os.path.join(path, "_delta") if path else None)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards.values()) + len(self.delta)
+
+    def query(self, vector, top_k, metadata_filter=None, namespace=None) -> List[Hit]:
+        ns = namespace or NAMESPACE
+        if top_k <= 0:
+            return []
+        overlay = self.delta.query(vector, top_k, metadata_filter, ns)
+        shard = self._shards.get(ns)
+        if shard is None:
+            return overlay
+        q = _unit_rows(np.asarray(vector, dtype=np.float32)[None, :])[0]
+        if q.shape[0] != shard.dim:
+            raise ValueError(f"Query dimension {q.shape[0]} does not match index dimension {shard.dim}")
+        hits = shard.search(
+            q, top_k, metadata_filter, self.nprobe, self.rerank, skip=self.delta.ids(ns)
+        )
+        if overlay:
+            hits = sorted(hits + overlay, key=lambda h: h["score"], reverse=True)[:top_k]
+        return hits
+
+    def upsert(self, vectors, namespace=None) -> None:
+        self.delta.upsert(vectors, namespace)
+
+    def update_metadata(self, rid, metadata, namespace=None) -> bool:
+        ns = namespace or NAMESPACE
+        if str(rid) in self.delta.ids(ns):
+            return self.delta.update_metadata(rid, metadata, ns)
+        shard = self._shards.get(ns)
+        pos = shard.find(rid) if shard else None
+        if pos is None:
+            return False
+        # The shard is read-only; the edited row moves to the overlay with its stored vector.
+        values = np.asarray(shard.vectors[pos], dtype=np.float32)
+        self.delta.upsert([{"id": str(rid), "values": values, "metadata": metadata}], ns)
+        return True
+
+    def flush(self) -> None:
+        self.delta.flush()
+
+    @classmethod
+    def load(cls, path: str, nprobe: int = 8, rerank: int = 4) -> "IVFBackend":
+        backend = cls(path, nprobe, rerank)
+        if not os.path.isdir(path):
+            log.info("No IVF index at %s; starting empty.", path)
+            return backend
+        for ns in sorted(os.listdir(path)):
+            folder = os.path.join(path, ns)
+            if ns != "_delta" and os.path.isfile(os.path.join(folder, "centroids.npy")):
+                backend._shards[ns] = IVFShard(folder)
+        backend.delta = LocalBackend.load(os.path.join(path, "_delta"))
+        log.info("Loaded %d vectors from %s (nprobe=%d, rerank=%d)", len(backend), path, nprobe, rerank)
+        return backend
+
+
+def build_ivf(
+    out_dir: str,
+    ids: Sequence[str],
+    vectors: np.ndarray,
+    metadata: Iterable[Dict[str, Any]],
+    *,
+    nlist: Optional[int] = None,
+    dtype: str = "int8",
+    iterations: int = 10,
+    train_size: int = 100_000,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Write one IVF shard to `out_dir`. `vectors` may itself be a memmap; rows
+    are normalized, assigned to `nlist` spherical k-means partitions (default
+    about sqrt(n)) trained on a sample, and written grouped by partition,
+    along with the bitmap index over their metadata.
+    """
+    if dtype not in _CODE_DTYPES:
+        raise ValueError(f"Unsupported IVF code dtype: {dtype!r}")
+    n, dim = vectors.shape
+    if n != len(ids):
+        raise ValueError(f"{len(ids)} ids but {n} vectors")
+    nlist = max(1, min(int(nlist or round(np.sqrt(n))), n))
+    rng = np.random.default_rng(seed)
+    t0 = time.perf_counter()
+
+    sample = np.sort(rng.choice(n, size=min(n, max(train_size, nlist)), replace=False))
+    centroids = kmeans(_unit_rows(vectors[sample]), nlist, iterations, rng)
+    labels = np.concatenate([
+        _assign(_unit_rows(vectors[s:s + _BLOCK]), centroids) for s in range(0, n, _BLOCK)
+    ])
+    order = np.argsort(labels, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=nlist))]).astype(np.int64)
+
+    os.makedirs(out_dir, exist_ok=True)
+    stale_scales = os.path.join(out_dir, "scales.npy")
+    if dtype != "int8" and os.path.exists(stale_scales):
+        os.remove(stale_scales)  # left over from an int8 build; would be applied to float16 codes
+    np.save(os.path.join(out_dir, "centroids.npy"), centroids.astype(np.float32))
+    np.save(os.path.join(out_dir, "offsets.npy"), offsets)
+    full = np.lib.format.open_memmap(os.path.join(out_dir, "vectors.npy"), "w+", np.float32, (n, dim))
+    codes = np.lib.format.open_memmap(os.path.join(out_dir, "codes.npy"), "w+", np.dtype(dtype), (n, dim))
+    scales = (
+        np.lib.format.open_memmap(os.path.join(out_dir, "scales.npy"), "w+", np.float32, (n,))
+        if dtype == "int8" else None
+    )
+    for s in range(0, n, _BLOCK):
+        rows = _unit_rows(vectors[order[s:s + _BLOCK]])
+        full[s:s + len(rows)] = rows
+        if scales is None:
+            codes[s:s + len(rows)] = rows.astype(np.float16)
+        else:
+            row_scale = np.abs(rows).max(axis=1) / 127.0
+            row_scale[row_scale == 0] = 1.0
+            codes[s:s + len(rows)] = np.round(rows / row_scale[:, None]).astype(np.int8)
+            scales[s:s + len(rows)] = row_scale
+    for arr in (full, codes, scales):
+        if arr is not None:
+            arr.flush()
+    del full, codes, scales
+
+    metadata = list(metadata)
+    _write_records(out_dir, ids, metadata, order)
+    # Rows are numbered in partition order, as in records.jsonl.
+    BitmapIndex.build([metadata[pos] for pos in order]).save(os.path.join(out_dir, "bitmap.npz"))
+    stats = {
+        "vectors": n, "dim": dim, "nlist": nlist, "dtype": dtype,
+        "largest_partition": int(np.diff(offsets).max()),
+        "build_seconds": round(time.perf_counter() - t0, 2),
+    }
+    log.info("Built %s: %s", out_dir, stats)
+    return stats
+
+
+def kmeans(x: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Spherical k-means on unit rows; empty partitions are reseeded from random rows."""
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(max(1, iterations)):
+        labels = _assign(x, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, x)
+        counts = np.bincount(labels, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+        centroids = _unit_rows(sums)
+    return centroids
+
+
+def evaluate(
+    backend: IVFBackend,
+    queries: np.ndarray,
+    top_k: int = 10,
+    namespace: Optional[str] = None,
+) -> Dict[str, Any]:
+    """recall@k of the IVF search against exact float32 search, plus latency percentiles."""
+    shard = backend._shards[namespace or NAMESPACE]
+    recalls, ivf_ms, exact_ms = [], [], []
+    for vec in queries:
+        q = _unit_rows(np.asarray(vec, dtype=np.float32)[None, :])[0]
+        t0 = time.perf_counter()
+        approx = backend.query(q, top_k, namespace=namespace)
+        ivf_ms.append((time.perf_counter() - t0) * 1000)
+        t0 = time.perf_counter()
+        exact = shard.exact_search(q, top_k)
+        exact_ms.append((time.perf_counter() - t0) * 1000)
+        truth = {shard.record(pos)[0] for pos, _ in exact}
+        recalls.append(len(truth & {h["id"] for h in approx}) / max(1, len(truth)))
+    return {
+        "queries": len(queries),
+        "top_k": top_k,
+        "nprobe": backend.nprobe,
+        "rerank": backend.rerank,
+        f"recall@{top_k}": round(float(np.mean(recalls)), 4) if recalls else None,
+        "ivf_ms": _percentiles(ivf_ms),
+        "exact_ms": _percentiles(exact_ms),
+    }
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    arr = np.asarray(samples)
+    return {f"p{p}": round(float(np.percentile(arr, p)), 3) for p in (50, 95, 99)}
+
+
+def _assign(rows: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.argmax(rows @ centroids.T, axis=1)
+
+
+def _id_hash(rid: str) -> int:
+    return int.from_bytes(hashlib.blake2b(rid.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _write_records(out_dir: str, ids: Sequence[str], metadata: List[Dict[str, Any]], order: np.ndarray) -> None:
+    """Write records.jsonl with its byte offsets, and the id hash -> row table `IVFShard.find` uses."""
+    offsets = np.empty(len(order) + 1, dtype=np.int64)
+    offsets[0] = 0
+    hashes = np.empty(len(order), dtype=np.uint64)
+    with open(os.path.join(out_dir, "records.jsonl"), "wb") as f:
+        for i, pos in enumerate(order):
+            rid = str(ids[pos])
+            line = orjson.dumps({"id": rid, "metadata": metadata[pos]}) + b"\n"
+            f.write(line)
+            offsets[i + 1] = offsets[i] + len(line)
+            hashes[i] = _id_hash(rid)
+    np.save(os.path.join(out_dir, "record_offsets.npy"), offsets)
+    rows = np.argsort(hashes, kind="stable")
+    np.save(os.path.join(out_dir, "id_hashes.npy"), hashes[rows])
+    np.save(os.path.join(out_dir, "id_rows.npy"), rows.astype(np.int64))
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterator, List
+
+import orjson
+
+log = logging.getLogger(__name__)
+
+
+class EditJournal:
+    """
+    Append-only log of admin edits: one JSON line per entry, fsync'd before
+    `append` returns, so an acknowledged edit survives a crash. Replaying the
+    entries on top of the base JSONL files reproduces the current state.
+
+    Compaction happens in two steps so edits can keep arriving while the base
+    files are rewritten: `rotate` moves the live log aside to `<path>.compacting`
+    and `finish_rotation` deletes it once the new base files are in place. If
+    the process dies in between, both segments are replayed at startup; entries
+    hold absolute values, so replaying them over a newer base is harmless.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pending_path = f"{path}.compacting"
+        self._lock = threading.Lock()
+        self._fh = None
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        line = orjson.dumps(entry) + b"\n"
+        with self._lock:
+            if self._fh is None:
+                self._fh = open(self.path, "ab")
+            self._fh.write(line)
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        """Entries in write order: a pending (interrupted) compaction segment first, then the live log."""
+        for path in (self.pending_path, self.path):
+            yield from _read_entries(path)
+
+    def rotate(self) -> None:
+        """Start a compaction: new appends go to a fresh log, the old one waits in `pending_path`."""
+        with self._lock:
+            self._close()
+            if not os.path.exists(self.path):
+                return
+            if os.path.exists(self.pending_path):
+                # A previous compaction never finished; keep its entries ahead of ours.
+                with open(self.path, "rb") as src, open(self.pending_path, "ab") as dst:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self.pending_path)
+            _fsync_dir(self.path)
+
+    def finish_rotation(self) -> None:
+        """The base files now include everything in `pending_path`; drop it."""
+        with self._lock:
+            if os.path.exists(self.pending_path):
+                os.remove(self.pending_path)
+                _fsync_dir(self.path)
+
+    def size(self) -> int:
+        """Bytes of journal not yet folded into the base files."""
+        return sum(os.path.getsize(p) for p in (self.pending_path, self.path) if os.path.exists(p))
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+def _read_entries(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        lines = f.read().split(b"\n")
+    out: List[Dict[str, Any]] = []
+    for n, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            out.append(orjson.loads(line))
+        except orjson.JSONDecodeError:
+            # Only the last line can be torn (crash mid-append); it was never acknowledged.
+            if any(rest.strip() for rest in lines[n + 1:]):
+                raise
+            log.warning("Ignoring incomplete last entry in %s", path)
+    return out
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Write `data` to a temp file, fsync it and rename it over `path`."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path)
+
+
+def _fsync_dir(path: str) -> None:
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import logging
+import mmap
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import orjson
+
+from .cache import LRUCache
+from .config import DATASTORE_RECORD_CACHE_ITEMS
+from .journal import atomic_write
+
+log = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def record_id(obj: Dict[str, Any]) -> str:
+    return str(obj.get("id") or obj.get("resource_id"))
+
+
+class JsonlIndex:
+    """
+    Read-only, offset-indexed view of a JSONL file keyed by record id.
+
+    Opening scans nothing when the sidecar `<path>.idx` (id -> byte offset and
+    length, stamped with the file's size and mtime) is current; otherwise the
+    file is scanned once and the sidecar rewritten. Records are parsed on
+    demand from an mmap of the file and kept in a bounded LRU, so memory
+    stays flat regardless of corpus size. A later line with the same id wins,
+    as it did when the whole file was loaded into a dict.
+    """
+
+    def __init__(self, path: str, cache_items: int = DATASTORE_RECORD_CACHE_ITEMS):
+        self.path = path
+        self.sidecar = f"{path}.idx"
+        self._cache = LRUCache(cache_items)
+        self._lock = threading.Lock()
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self._spans: Dict[str, Tuple[int, int]] = {}
+        self._open()
+
+    # ---------- mapping-ish ----------
+    def get(self, rid: str, default: Any = None) -> Any:
+        rid = str(rid)
+        obj = self._cache.get(rid, _MISSING)
+        if obj is not _MISSING:
+            return obj
+        raw = self.raw(rid)
+        if raw is None:
+            return default
+        obj = orjson.loads(raw)
+        self._cache.set(rid, obj)
+        return obj
+
+    def raw(self, rid: str) -> Optional[bytes]:
+        """The record's JSON line as stored, without parsing it or touching the cache."""
+        with self._lock:
+            span = self._spans.get(str(rid))
+            if span is None or self._mm is None:
+                return None
+            start, length = span
+            return self._mm[start:start + length]
+
+    def __contains__(self, rid: object) -> bool:
+        return str(rid) in self._spans
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._spans)
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"records": len(self._spans), "cache": self._cache.stats()}
+
+    # ---------- lifecycle ----------
+    def reload(self) -> None:
+        """Re-open after the underlying file was replaced (e.g. by `write_lines`)."""
+        with self._lock:
+            self._close()
+            self._cache.clear()
+            self._open()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _open(self) -> None:
+        if not os.path.exists(self.path):
+            self._spans = {}
+            return
+        self._file = open(self.path, "rb")
+        st = os.fstat(self._file.fileno())
+        if st.st_size:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        spans = _read_sidecar(self.sidecar, st)
+        if spans is None:
+            spans = self._scan()
+            _write_sidecar(self.sidecar, st, spans)
+            log.info("Indexed %d records in %s", len(spans), self.path)
+        self._spans = spans
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        spans: Dict[str, Tuple[int, int]] = {}
+        if self._mm is None:
+            return spans
+        mm, pos, end = self._mm, 0, len(self._mm)
+        while pos < end:
+            nl = mm.find(b"\n", pos)
+            stop = end if nl == -1 else nl
+            line = mm[pos:stop]
+            if line.strip():
+                spans[record_id(orjson.loads(line))] = (pos, stop - pos)
+            pos = stop + 1
+        return spans
+
+    def _close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RecordStore:
+    """
+    A `JsonlIndex` base plus an in-memory overlay of edited records, used by
+    DataStore as its id -> record map. Writes only touch the overlay; the base
+    file changes on compaction.
+    """
+
+    def __init__(self, path: str, cache_items: int = DATASTORE_RECORD_CACHE_ITEMS):
+        self.base = JsonlIndex(path, cache_items)
+        self.overlay: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, rid: str, default: Any = None) -> Any:
+        obj = self.overlay.get(rid, _MISSING)
+        return self.base.get(rid, default) if obj is _MISSING else obj
+
+    def __getitem__(self, rid: str) -> Dict[str, Any]:
+        obj = self.get(rid, _MISSING)
+        if obj is _MISSING:
+            raise KeyError(rid)
+        return obj
+
+    def __setitem__(self, rid: str, obj: Dict[str, Any]) -> None:
+        self.overlay[rid] = obj
+
+    def __contains__(self, rid: object) -> bool:
+        return rid in self.overlay or rid in self.base
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.overlay
+        yield from (rid for rid in self.base if rid not in self.overlay)
+
+    def __len__(self) -> int:
+        return len(self.base) + sum(1 for rid in self.overlay if rid not in self.base)
+
+    def compact(
+        self,
+        ids: Sequence[str],
+        overlay: Dict[str, Dict[str, Any]],
+        default: Callable[[str], Dict[str, Any]],
+    ) -> None:
+        """
+        Rewrite the base file as `ids` in order, taking edited rows from
+        `overlay` (a snapshot of `self.overlay`) and copying the rest as raw
+        bytes, then reopen it. Call `forget(overlay)` afterwards.
+        """
+        def lines() -> Iterator[Tuple[str, bytes]]:
+            for rid in ids:
+                obj = overlay.get(rid)
+                if obj is None:
+                    raw = self.base.raw(rid)
+                    if raw is not None:
+                        yield rid, raw
+                        continue
+                    obj = default(rid)
+                yield rid, orjson.dumps(obj)
+
+        write_lines(self.base.path, lines())
+        self.base.reload()
+
+    def forget(self, overlay: Dict[str, Dict[str, Any]]) -> None:
+        """Drop overlay entries that are now in the base file."""
+        for rid, obj in overlay.items():
+            # Keep entries edited again while the file was being written.
+            if self.overlay.get(rid) is obj:
+                del self.overlay[rid]
+
+    def close(self) -> None:
+        self.base.close()
+
+
+def write_lines(path: str, lines: Iterable[Tuple[str, bytes]]) -> None:
+    """Atomically replace `path` with (id, JSON line) pairs and write its offset sidecar alongside."""
+    chunks: List[bytes] = []
+    spans: Dict[str, Tuple[int, int]] = {}
+    pos = 0
+    for rid, line in lines:
+        spans[rid] = (pos, len(line))
+        chunks.append(line)
+        chunks.append(b"\n")
+        pos += len(line) + 1
+    atomic_write(path, b"".join(chunks))
+    _write_sidecar(f"{path}.idx", os.stat(path), spans)
+
+
+def _read_sidecar(path: str, st: os.stat_result) -> Optional[Dict[str, Tuple[int, int]]]:
+    try:
+        with open(path, "rb") as f:
+            data = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    if data.get("size") != st.st_size or data.get("mtime_ns") != st.st_mtime_ns:
+        return None
+    return {rid: (start, length) for rid, start, length in zip(data["ids"], data["offsets"], data["lengths"])}
+
+
+def _write_sidecar(path: str, st: os.stat_result, spans: Dict[str, Tuple[int, int]]) -> None:
+    ids = list(spans)
+    try:
+        atomic_write(path, orjson.dumps({
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "ids": ids,
+            "offsets": [spans[rid][0] for rid in ids],
+            "lengths": [spans[rid][1] for rid in ids],
+        }))
+    except OSError as e:
+        # Read-only data dir: still works, the file is just rescanned next start.
+        log.warning("Could not write %s: %s", path, e)
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import atexit
+import contextvars
+import logging
+import queue
+import random
+import threading
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+import orjson
+
+from .config import LOG_FORMAT, LOG_LEVEL, LOG_QUEUE_SIZE, LOG_SAMPLE_RATE
+
+# Set per HTTP request by RequestIdMiddleware; asyncio tasks, asyncio.to_thread and
+# run_bounded workers inherit it, so every line a request causes carries its id.
+request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+# Pass as `extra=SAMPLED` on per-call lines (cache hits, query summaries): only
+# LOG_SAMPLE_RATE of them are written. Warnings and errors are never sampled.
+SAMPLED = {"sampled": True}
+
+# Attributes every LogRecord has; anything else came in through `extra` and is written as a field.
+_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "request_id", "sampled",
+}
+
+
+class _RequestContext(logging.Filter):
+    """Runs on the calling thread: stamps the request id and applies sampling."""
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if (
+            getattr(record, "sampled", False)
+            and record.levelno < logging.WARNING
+            and random.random() >= self.sample_rate
+        ):
+            return False
+        record.request_id = request_id.get()
+        return True
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Never blocks the request path: when the writer falls behind, records are dropped and counted."""
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only resolve the message here; formatting (JSON, tracebacks) happens on the writer thread.
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.msg, record.args = record.message, None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, request_id, msg, any `extra` fields and exc."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class TextFormatter(logging.Formatter):
+    """The console look the app had with print(): `>>> [module] message`, `!!!` for warnings and errors."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        marker = "!!!" if record.levelno >= logging.WARNING else ">>>"
+        line = f"{marker} [{record.name.rsplit('.', 1)[-1]}] {record.getMessage()}"
+        rid = getattr(record, "request_id", "-")
+        if rid != "-":
+            line += f" (request {rid})"
+        fields = {k: v for k, v in record.__dict__.items() if k not in _STANDARD and not k.startswith("_")}
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[_DroppingQueueHandler] = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(fmt: Optional[str] = None) -> None:
+    """
+    Route the `app.*` loggers through a bounded queue to one background writer
+    on stderr. Idempotent; called when app.main is imported, and by the CLI
+    scripts with `fmt="text"` (default: LOG_FORMAT).
+    """
+    global _listener, _handler
+    with _setup_lock:
+        if _listener is not None:
+            return
+        q: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        _handler = _DroppingQueueHandler(q)
+        _handler.addFilter(_RequestContext(LOG_SAMPLE_RATE))
+
+        writer = logging.StreamHandler()
+        writer.setFormatter(TextFormatter() if (fmt or LOG_FORMAT) == "text" else JsonFormatter())
+        _listener = QueueListener(q, writer, respect_handler_level=False)
+        _listener.start()
+
+        root = logging.getLogger("app")
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(_handler)
+        root.propagate = False
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush what is queued and stop the writer thread (lifespan shutdown and atexit)."""
+    global _listener, _handler
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        if _handler is not None:
+            logging.getLogger("app").removeHandler(_handler)
+            if _handler.dropped:
+                print(f"!!! [log] Dropped {_handler.dropped} log records; the writer fell behind.")
+        _listener = _handler = None
+
+
+def dropped_records() -> int:
+    return _handler.dropped if _handler is not None else 0
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware: takes the caller's X-Request-ID (or makes one), sets it for
+    the request's logs and echoes it on the response, including streams.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope.get("headers") or []).get(b"x-request-id", b"")
+        rid = incoming.decode("latin-1")[:64] or uuid.uuid4().hex[:16]
+        token = request_id.set(rid)
+
+        async def send_with_id(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers") or []) + [(b"x-request-id", rid.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
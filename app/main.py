@@ -1,24 +1,80 @@
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI, Request, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from .config import print_config, NAMESPACE
-from .retriever import retrieve, build_filter
-from .generator import generate_card_summaries, generate_action_plan
-from .needs import extract_needs, FALLBACK_RESPONSE
-from .candidates import multi_need_retrieve
+from .config import log_config, CLIENT_WARMUP, HYBRID_SEARCH, NAMESPACE
+from .clients import startup_report, startup_timings, warm_up
+from .retriever import (
+    backend, build_filter, embed_queries, embed_queries_async, embed_query, embed_query_async,
+    retrieve_async,
+)
+from .generator import (
+    fallback_card_summaries, generate_card_summaries_async,
+    generate_action_plan_async, stream_action_plan_async,
+)
+from .needs import extract_needs, extract_needs_async, FALLBACK_RESPONSE
+from .candidates import (
+    MAX_NEEDS, group_search_results, multi_need_retrieve, search_needs_async
+)
+from .pipeline import Stage, iter_stages, run_stages
+from .bm25 import lexical_index
+from .embed_cache import embedding_cache
+from .needs_cache import needs_cache
+from .result_cache import retrieval_cache
+from .summary_cache import summary_cache
+from .log import RequestIdMiddleware, dropped_records, setup_logging, shutdown_logging
+from .metrics import FALLBACKS, REGISTRY, REQUEST_SECONDS, register_cache_gauges
 
 # Admin DS import (added in section 3)
 from .datastore import ds, require_admin
 
-print(">>> [main] Starting FastAPI app w/ UI + per-card summaries...")
-print_config()
-
-app = FastAPI(title="Community Resources RAG (Results + Admin)")
-
+register_cache_gauges({
+    "embedding": embedding_cache,
+    "retrieval": retrieval_cache,
+    "summary": summary_cache,
+    "needs": needs_cache,
+})
+_ASK_SECONDS = REQUEST_SECONDS.labels("/ask")
+_ASK_STREAM_SECONDS = REQUEST_SECONDS.labels("/ask/stream")
+_NEEDS_SECONDS = REQUEST_SECONDS.labels("/needs")
+_STORY_EMBEDDING_FALLBACKS = FALLBACKS.labels("story_embedding")
+
+startup_timings["imports"] = round(time.perf_counter() - _import_started, 4)
+setup_logging()
+log = logging.getLogger(__name__)
+log.info("Starting FastAPI app w/ UI + per-card summaries")
+log_config()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if CLIENT_WARMUP:
+        # Connect before taking traffic, off the event loop; the vector backend may load a local index.
+        report = await asyncio.to_thread(warm_up, {"vector_backend": backend.resolve_client})
+        log.info("Startup breakdown", extra={"startup": report})
+    if HYBRID_SEARCH:
+        # Build the BM25 index in the background; searches stay dense-only until it is ready.
+        lexical_index.start()
+    yield
+    # Write-behind state (review progress) must reach disk before the worker exits.
+    log.info("Shutting down; flushing admin progress")
+    ds.close()
+    shutdown_logging()
+
+app = FastAPI(title="Community Resources RAG (Results + Admin)", lifespan=lifespan)
+
+app.add_middleware(RequestIdMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_credentials=True,
@@ -30,7 +86,7 @@ templates = Jinja2Templates(directory="app/templates")
 
 @app.get("/")
 def home(request: Request):
-    print(">>> [main] GET / (index)")
+    log.info("GET / (index)")
     return templates.TemplateResponse("index.html", {"request": request})
 
 class Ask(BaseModel):
@@ -50,12 +106,25 @@ class NeedRequest(BaseModel):
 
 @app.get("/healthz")
 def healthz():
-    print(">>> [main] /healthz called.")
-    return {"ok": True, "namespace": NAMESPACE}
+    return {
+        "ok": True,
+        "namespace": NAMESPACE,
+        "embedding_cache": embedding_cache.stats(),
+        "retrieval_cache": retrieval_cache.stats(),
+        "summary_cache": summary_cache.stats(),
+        "needs_cache": needs_cache.stats(),
+        "startup": startup_report(),
+        "log_records_dropped": dropped_records(),
+    }
+
+@app.get("/metrics")
+def metrics():
+    """Latency histograms, upstream usage counters and cache gauges for this worker, in Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.post("/ask")
-def ask(payload: Ask):
-    print(f">>> [main] /ask called with: {payload.model_dump()}")
+async def ask(payload: Ask):
+    _log_ask("/ask", payload)
     filt = build_filter(
         city=payload.city, county=payload.county, zip_code=payload.zip_code,
         language=payload.language, free_only=payload.free_only
@@ -64,106 +133,314 @@ def ask(payload: Ask):
     story = (payload.query or "").strip()
 
     if not story:
-        print(">>> [main] Empty query provided.")
+        log.info("Empty query provided.")
         return {
             "action_plan": "",
             "grouped_results": {},
             "counts": {"total_results": 0, "needs": 0},
         }
 
-    extracted = extract_needs(story)
-    needs = extracted.get("needs") if isinstance(extracted, dict) else []
+    with _ASK_SECONDS.time():
+        results, timings = await run_stages(_ask_stages(payload, story, filt))
+    log.info("/ask stage timings", extra={"stage_ms": {k: v["duration_ms"] for k, v in timings.items()}})
+
+    grouped_results = results["grouped"]
+    total_results = sum(len(v or []) for v in grouped_results.values())
+    if total_results == 0:
+        log.info("No matches found after fanout search.")
 
+    response = {
+        "action_plan": results["plan"],
+        "grouped_results": grouped_results,
+        "counts": {"total_results": total_results, "needs": len(grouped_results)},
+        "needs": results["needs"],
+        "timings": timings,
+    }
+    return response
+
+
+def _log_ask(endpoint: str, payload: Ask) -> None:
+    # The story itself can be personal; only a debug run writes the full payload.
+    log.info("%s called", endpoint, extra={"query_chars": len(payload.query or ""), "top_k": payload.top_k})
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("%s payload", endpoint, extra={"payload": payload.model_dump()})
+
+
+def _retrieval_stages(payload: Ask, story: str, filt: Dict[str, Any]) -> List[Stage]:
+    """
+    needs ─────────────────┬─> need_hits ─┐
+                           └──────────────┼─> grouped
+    story_vector ─> story_hits ───────────┘
+    Needs extraction (the slowest model call) and the story embedding start at
+    once. The story search reuses the embedding; needs extraction gets it as a
+    future, for a near-duplicate lookup that runs alongside its model call.
+    """
     retrieve_kwargs = {
         "metadata_filters": filt,
         "namespace": payload.namespace,
     }
-
     display_limit = max(1, min(max(payload.top_results, 3), 5))
+    story_vector: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    async def story_vector_stage(_: Dict[str, Any]) -> Optional[List[float]]:
+        vector = None
+        try:
+            vector = await embed_query_async(story)
+        except Exception as exc:
+            log.warning("Story embedding failed: %s", exc)
+            _STORY_EMBEDDING_FALLBACKS.inc()
+        finally:
+            if not story_vector.done():
+                story_vector.set_result(vector)
+        return vector
+
+    async def needs_stage(_: Dict[str, Any]) -> Dict[str, Any]:
+        return await extract_needs_async(story, story_vector=story_vector)
+
+    async def story_hits_stage(inputs: Dict[str, Any]) -> List[dict]:
+        # Searches with the story_vector embedding (None if it failed: retrieve_async embeds again).
+        return await retrieve_async(
+            story, top_k=payload.top_k, query_vector=inputs["story_vector"], **retrieve_kwargs
+        )
 
-    grouped_results = multi_need_retrieve(
-        story,
-        needs,
-        retrieve_fn=retrieve,
-        full_top_k=payload.top_k,
-        per_need_top_k=payload.top_k,
-        max_candidates=max(payload.top_k, payload.top_results),
-        retrieve_kwargs=retrieve_kwargs,
-        grouped_top_k=display_limit,
+    async def need_hits_stage(inputs: Dict[str, Any]) -> List[List[dict]]:
+        return await search_needs_async(
+            story,
+            _needs_list(inputs["needs"]),
+            per_need_top_k=payload.top_k,
+            retrieve_kwargs=retrieve_kwargs,
+            embed_fn=embed_queries_async,
+        )
+
+    async def grouped_stage(inputs: Dict[str, Any]) -> Dict[str, List[dict]]:
+        grouped_results = group_search_results(
+            story,
+            _needs_list(inputs["needs"]),
+            inputs["story_hits"],
+            inputs["need_hits"],
+            max_candidates=max(payload.top_k, payload.top_results),
+            grouped_top_k=display_limit,
+            retrieve_kwargs=retrieve_kwargs,
+        )
+        for resources in grouped_results.values():
+            for resource in resources or []:
+                _resource_identifier(resource)
+        return grouped_results
+
+    return [
+        Stage("story_vector", story_vector_stage),
+        Stage("needs", needs_stage),
+        Stage("story_hits", story_hits_stage, ("story_vector",)),
+        Stage("need_hits", need_hits_stage, ("needs",)),
+        Stage("grouped", grouped_stage, ("story_hits", "need_hits", "needs")),
+    ]
+
+
+def _ask_stages(payload: Ask, story: str, filt: Dict[str, Any]) -> List[Stage]:
+    """Retrieval graph plus summaries (deterministic and model) and the action plan."""
+
+    async def fallback_summaries_stage(inputs: Dict[str, Any]) -> Dict[str, str]:
+        unique_resources = [r for _, batch in _summary_batches(inputs["grouped"]) for r in batch]
+        return fallback_card_summaries(unique_resources)
+
+    async def model_summaries_stage(inputs: Dict[str, Any]) -> Dict[str, str]:
+        return await _summarize_cards(story, inputs["needs"], _summary_batches(inputs["grouped"]))
+
+    async def summaries_stage(inputs: Dict[str, Any]) -> Dict[str, str]:
+        return {**inputs["fallback_summaries"], **inputs["model_summaries"]}
+
+    async def plan_stage(inputs: Dict[str, Any]) -> str:
+        grouped_results = inputs["grouped"]
+        _apply_summaries(grouped_results, inputs["summaries"])
+        if not any(grouped_results.values()):
+            return ""
+        return await generate_action_plan_async(story, grouped_results)
+
+    return _retrieval_stages(payload, story, filt) + [
+        Stage("fallback_summaries", fallback_summaries_stage, ("grouped",)),
+        Stage("model_summaries", model_summaries_stage, ("grouped", "needs")),
+        Stage("summaries", summaries_stage, ("fallback_summaries", "model_summaries")),
+        Stage("plan", plan_stage, ("grouped", "summaries")),
+    ]
+
+
+@app.post("/ask/stream")
+async def ask_stream(payload: Ask):
+    """
+    Server-sent events version of /ask. Emits `needs`, then `cards`, then
+    `summaries` (deterministic ones first, then the model-written ones in one
+    event), then the action plan as `plan_delta` tokens, and finally
+    `done`.
+    """
+    _log_ask("/ask/stream", payload)
+    return StreamingResponse(
+        _timed_events(_ask_events(payload)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
+
+async def _timed_events(events: AsyncIterator[str]) -> AsyncIterator[str]:
+    # Until the last event is sent (or the client disconnects), not just until headers go out.
+    t0 = time.perf_counter()
+    try:
+        async for event in events:
+            yield event
+    finally:
+        _ASK_STREAM_SECONDS.observe(time.perf_counter() - t0)
+
+
+async def _ask_events(payload: Ask) -> AsyncIterator[str]:
+    filt = build_filter(
+        city=payload.city, county=payload.county, zip_code=payload.zip_code,
+        language=payload.language, free_only=payload.free_only
+    )
+    story = (payload.query or "").strip()
+    if not story:
+        yield _sse("done", {"action_plan": "", "counts": {"total_results": 0, "needs": 0}})
+        return
+
+    extracted: Dict[str, Any] = {}
+    grouped_results: Dict[str, List[dict]] = {}
+    timings: Dict[str, Dict[str, float]] = {}
+    async for name, result in iter_stages(_retrieval_stages(payload, story, filt), timings):
+        if name == "needs":
+            extracted = result
+            yield _sse("needs", result)
+        elif name == "grouped":
+            grouped_results = result
+
     total_results = sum(len(v or []) for v in grouped_results.values())
+    counts = {"total_results": total_results, "needs": len(grouped_results)}
+    yield _sse("cards", {"grouped_results": grouped_results, "counts": counts})
     if total_results == 0:
-        print(">>> [main] No matches found after fanout search.")
-        response = {
-            "action_plan": "",
-            "grouped_results": grouped_results,
-            "counts": {"total_results": 0, "needs": len(grouped_results)},
-            "needs": extracted,
-        }
-        return response
-
-    def _resource_identifier(resource: dict) -> str:
-        metadata = resource.get("metadata") or {}
-        rid = (
-            resource.get("id")
-            or metadata.get("resource_id")
-            or resource.get("service_id")
-        )
-        if rid:
-            rid_str = str(rid)
-            if not resource.get("id"):
-                resource["id"] = rid_str
-            return rid_str
-        return ""
-
-    unique_resources = []
+        yield _sse("done", {"action_plan": "", "counts": counts, "timings": timings})
+        return
+
+    # Deterministic summaries go out right away and are replaced when the model's land.
+    batches = _summary_batches(grouped_results)
+    task = asyncio.create_task(_summarize_cards(story, extracted, batches))
+    summaries = fallback_card_summaries([r for _, batch in batches for r in batch])
+    yield _sse("summaries", summaries)
+    try:
+        fresh = await task
+    finally:
+        task.cancel()
+    summaries.update(fresh)
+    yield _sse("summaries", fresh)
+    _apply_summaries(grouped_results, summaries)
+
+    plan_parts = []
+    async for delta in stream_action_plan_async(story, grouped_results):
+        plan_parts.append(delta)
+        yield _sse("plan_delta", {"text": delta})
+    yield _sse("done", {"action_plan": "".join(plan_parts), "counts": counts, "timings": timings})
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _resource_identifier(resource: dict) -> str:
+    metadata = resource.get("metadata") or {}
+    rid = (
+        resource.get("id")
+        or metadata.get("resource_id")
+        or resource.get("service_id")
+    )
+    if rid:
+        rid_str = str(rid)
+        if not resource.get("id"):
+            resource["id"] = rid_str
+        return rid_str
+    return ""
+
+
+def _needs_list(extracted: Any) -> List[dict]:
+    needs = extracted.get("needs") if isinstance(extracted, dict) else []
+    return needs if isinstance(needs, list) else []
+
+
+def _summary_batches(grouped_results: Dict[str, List[dict]]) -> List[Tuple[str, List[dict]]]:
+    """(slug, unique resources) per need group, each resource in the first group that shows it."""
+    batches = []
     seen_ids = set()
-    for resources in grouped_results.values():
+    for slug, resources in grouped_results.items():
+        batch = []
         for resource in resources or []:
             rid = _resource_identifier(resource)
             if rid and rid in seen_ids:
                 continue
             if rid:
                 seen_ids.add(rid)
-            unique_resources.append(resource)
+            batch.append(resource)
+        if batch:
+            batches.append((slug, batch))
+    return batches
+
+
+async def _summarize_cards(
+    story: str, extracted: Any, batches: List[Tuple[str, List[dict]]]
+) -> Dict[str, str]:
+    """
+    Model summaries for every card (cache misses only). Cards in a need group
+    are written for that need's query and cached per (resource, need slug),
+    so no user's story reaches a shared summary; the "general" group's are
+    written for the story and keyed by it. At most two calls, run together.
+    """
+    queries = {n.get("slug"): n.get("query") for n in _needs_list(extracted)}
+    resources: List[dict] = []
+    needs: Dict[str, Tuple[str, str]] = {}
+    for slug, batch in batches:
+        for resource in batch:
+            resources.append(resource)
+            rid = _resource_identifier(resource)
+            if rid and queries.get(slug):
+                needs[rid] = (slug, queries[slug])
+    if not resources:
+        return {}
+    return await generate_card_summaries_async(story, resources, fallback=False, needs=needs)
 
-    summaries = generate_card_summaries(story, unique_resources)
+
+def _apply_summaries(grouped_results: Dict[str, List[dict]], summaries: Dict[str, str]) -> None:
     for resources in grouped_results.values():
         for resource in resources or []:
             rid = _resource_identifier(resource)
             resource["model_summary"] = summaries.get(rid, "") if rid else ""
 
-    action_plan = generate_action_plan(story, grouped_results)
-
-    response = {
-        "action_plan": action_plan,
-        "grouped_results": grouped_results,
-        "counts": {"total_results": total_results, "needs": len(grouped_results)},
-        "needs": extracted,
-    }
-    return response
-
 
 @app.post("/needs")
 def needs(payload: NeedRequest):
     story = (payload.user_story or "").strip()
-    print(f">>> [main] /needs called. Story length: {len(story)}")
+    log.info("/needs called", extra={"story_chars": len(story)})
     if not story:
         empty = dict(FALLBACK_RESPONSE)
         empty["candidates"] = []
         return empty
 
-    extracted = extract_needs(story)
-    candidates = multi_need_retrieve(story, extracted.get("needs"))
+    t0 = time.perf_counter()
+    try:
+        story_vector = embed_query(story)
+    except Exception as exc:
+        log.warning("Story embedding failed: %s", exc)
+        _STORY_EMBEDDING_FALLBACKS.inc()
+        story_vector = None
+    extracted = extract_needs(story, story_vector=story_vector)
+    candidates = multi_need_retrieve(
+        story,
+        extracted.get("needs"),
+        max_workers=MAX_NEEDS + 1,
+        embed_fn=embed_queries,
+    )
     response = dict(extracted)
     response["candidates"] = candidates
+    _NEEDS_SECONDS.observe(time.perf_counter() - t0)
     return response
 
 # ---------- Admin UI (section 3 will add the template and JS) ----------
 @app.get("/admin")
 def admin_ui(request: Request):
-    print(">>> [main] GET /admin")
+    log.info("GET /admin")
     return templates.TemplateResponse("admin.html", {"request": request})
 
 @app.get("/api/admin/summary")
@@ -174,6 +451,20 @@ def admin_summary():
 def admin_record(index: int = 0):
     return ds.get_combined_by_index(index)
 
+@app.get("/api/admin/records")
+def admin_records(start: int = 0, count: int = 20):
+    return ds.get_records(start, count)
+
+@app.get("/api/admin/query")
+def admin_query(
+    city: Optional[str] = None, county: Optional[str] = None, zip_code: Optional[str] = None,
+    category: Optional[str] = None, reviewed: Optional[bool] = None, dirty: Optional[bool] = None,
+    offset: int = 0, limit: int = 50,
+):
+    filters = {"city": city, "county": county, "zip_code": zip_code, "category": category,
+               "reviewed": reviewed, "dirty": dirty}
+    return ds.query(filters, offset, limit)
+
 @app.post("/api/admin/update")
 def admin_update(payload: dict, x_admin_token: str = Header(default="")):
     require_admin(x_admin_token)
@@ -184,6 +475,16 @@ def admin_save(x_admin_token: str = Header(default="")):
     require_admin(x_admin_token)
     return ds.save_all()
 
+@app.post("/api/admin/snapshot/sync")
+def admin_snapshot_sync(full: bool = False, x_admin_token: str = Header(default="")):
+    require_admin(x_admin_token)
+    return ds.sync_snapshot(full=full)
+
+@app.get("/api/admin/drift")
+def admin_drift(x_admin_token: str = Header(default="")):
+    require_admin(x_admin_token)
+    return ds.drift()
+
 @app.post("/api/admin/upsert")
 def admin_upsert(only_dirty: bool = True, x_admin_token: str = Header(default="")):
     require_admin(x_admin_token)
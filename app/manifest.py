@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+import orjson
+
+log = logging.getLogger(__name__)
+
+SKIP = "skip"
+METADATA = "metadata"
+EMBED = "embed"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def metadata_hash(metadata: Optional[Dict[str, Any]]) -> str:
+    """Hash of the metadata as upserted, minus `text` (covered by the text hash)."""
+    md = {k: v for k, v in (metadata or {}).items() if k != "text"}
+    return hashlib.sha256(orjson.dumps(md, option=orjson.OPT_SORT_KEYS, default=str)).hexdigest()
+
+
+class IndexManifest:
+    """
+    What the vector index currently holds for each id: text hash, metadata
+    hash, embedding model and when it was last upserted. Stored as one JSON
+    file next to progress.json and rewritten atomically on `save`.
+    """
+
+    def __init__(self, path: str, model: str):
+        self.path = path
+        self.model = model
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def classify(self, rid: str, text: str, metadata: Optional[Dict[str, Any]]) -> str:
+        """SKIP if the index is current, METADATA if only metadata changed, else EMBED."""
+        entry = self.entries.get(str(rid))
+        if not entry or entry.get("model") != self.model or entry.get("text_hash") != text_hash(text):
+            return EMBED
+        if entry.get("meta_hash") != metadata_hash(metadata):
+            return METADATA
+        return SKIP
+
+    def record(self, rid: str, text: str, metadata: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            self.entries[str(rid)] = {
+                "text_hash": text_hash(text),
+                "meta_hash": metadata_hash(metadata),
+                "model": self.model,
+                "upserted_at": time.time(),
+            }
+
+    def record_many(self, items: Iterable[tuple]) -> None:
+        for rid, text, metadata in items:
+            self.record(rid, text, metadata)
+
+    def save(self) -> None:
+        with self._lock:
+            data = orjson.dumps(self.entries)
+        parent = os.path.dirname(self.path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "rb") as f:
+                return orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError) as exc:
+            log.warning("Could not read %s (%s); every record will be re-embedded.", self.path, exc)
+            return {}
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+log = logging.getLogger(__name__)
+
+# Seconds; spans a cached lookup (~1 ms) to a slow model call (~30 s).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._children: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def labels(self, *values: Any) -> Any:
+        """The child for these label values; hot paths can bind it once at import."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError(f"{self.name} takes labels {self.label_names}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._child())
+        return child
+
+    def _child(self) -> Any:
+        raise NotImplementedError
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, Tuple[str, ...], float]]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield self.name, key, (), child.value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        slot = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labels)
+
+    def _child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", key, (_format(bound),), cumulative
+            cumulative += counts[-1]
+            yield f"{self.name}_bucket", key, ("+Inf",), cumulative
+            yield f"{self.name}_sum", key, (), total
+            yield f"{self.name}_count", key, (), cumulative
+
+
+class Gauge(_Metric):
+    """Read at scrape time from `fn`, which returns {label values: value}; nothing runs on the request path."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], fn: Callable[[], Dict[LabelValues, float]]):
+        self.fn = fn
+        super().__init__(name, help, labels)
+
+    def samples(self):
+        try:
+            values = self.fn()
+        except Exception as e:
+            log.warning("Gauge %s failed: %s", self.name, e)
+            return
+        for key, value in values.items():
+            yield self.name, tuple(str(v) for v in key), (), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, le, value in metric.samples():
+                pairs = list(zip(metric.label_names, key))
+                if le:
+                    pairs.append(("le", le[0]))
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+                lines.append(f"{name}{{{label_text}}} {_format(value)}" if label_text else f"{name} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+# Per process: with several uvicorn workers each serves its own /metrics (scrape them all or set workers=1).
+REGISTRY = Registry()
+
+REQUEST_SECONDS = Histogram("rag_request_seconds", "End-to-end request latency.", ("endpoint",))
+OPERATION_SECONDS = Histogram(
+    "rag_operation_seconds",
+    "Latency of one upstream pipeline operation (needs_extraction, embedding, vector_query, "
+    "card_summaries, action_plan).",
+    ("operation",),
+)
+OPENAI_TOKENS = Counter("openai_tokens_total", "OpenAI tokens from response.usage.", ("api", "model", "kind"))
+PINECONE_READ_UNITS = Counter("pinecone_read_units_total", "Pinecone read units from response usage.", ("operation",))
+FALLBACKS = Counter("rag_fallbacks_total", "Steps answered with a deterministic fallback instead of the model.", ("step",))
+
+
+def record_openai_usage(api: str, model: str, response: Any) -> None:
+    """Count the tokens a Responses or Embeddings API result reports; missing usage is ignored."""
+    usage = _field(response, "usage")
+    if usage is None:
+        return
+    if api == "embeddings":
+        counts = (("input", _field(usage, "prompt_tokens")),)
+    else:
+        counts = (("input", _field(usage, "input_tokens")), ("output", _field(usage, "output_tokens")))
+    for kind, value in counts:
+        if isinstance(value, (int, float)) and value > 0:
+            OPENAI_TOKENS.labels(api, model, kind).inc(float(value))
+
+
+def record_pinecone_usage(operation: str, response: Any) -> None:
+    read_units = _field(_field(response, "usage"), "read_units")
+    if isinstance(read_units, (int, float)) and read_units > 0:
+        PINECONE_READ_UNITS.labels(operation).inc(float(read_units))
+
+
+def register_cache_gauges(caches: Dict[str, Any]) -> None:
+    """Hit, miss and size gauges read from each cache's `stats()` at scrape time."""
+
+    def read(field: str) -> Callable[[], Dict[LabelValues, float]]:
+        return lambda: {(name,): _cache_stat(cache.stats(), field) for name, cache in caches.items()}
+
+    Gauge("rag_cache_hits", "Cache hits since start (memory and disk, exact and near).", ("cache",), read("hits"))
+    Gauge("rag_cache_misses", "Cache misses since start.", ("cache",), read("misses"))
+    Gauge("rag_cache_size", "Entries held in memory.", ("cache",), read("size"))
+
+
+def _cache_stat(stats: Dict[str, Any], field: str) -> float:
+    if field == "hits":
+        if "exact_hits" in stats:
+            return stats["exact_hits"] + stats.get("near_hits", 0)
+        if "memory_hits" in stats:
+            return stats["memory_hits"] + stats.get("disk_hits", 0)
+        return stats.get("hits", 0)
+    if field == "size":
+        return stats.get("size", stats.get("memory_size", 0))
+    return stats.get(field, 0)
+
+
+def _field(obj: Any, name: str) -> Optional[Any]:
+    # Some SDKs return dict; some return object
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
@@ -1,16 +1,27 @@
+import asyncio
+import inspect
 import json
+import logging
 import re
-from typing import Callable, Dict, List, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
-from openai import OpenAI
+from .clients import async_openai_client, openai_client
+from .config import GEN_MODEL
+from .log import SAMPLED
+from .metrics import FALLBACKS, OPERATION_SECONDS, record_openai_usage
+from .needs_cache import needs_cache
 
-from .config import OPENAI_API_KEY, GEN_MODEL
+log = logging.getLogger(__name__)
 
-print(">>> [needs] Initializing OpenAI client for need extraction...")
-_client = OpenAI(api_key=OPENAI_API_KEY)
+# Shared clients, built on first use (see app/clients.py).
+_client = openai_client
+_aclient = async_openai_client
 
 FALLBACK_RESPONSE = {"needs": [], "confidence": 0.0}
 
+_NEEDS_SECONDS = OPERATION_SECONDS.labels("needs_extraction")
+_NEEDS_FALLBACKS = FALLBACKS.labels("needs_extraction")
+
 SYSTEM_PROMPT = (
     "You extract the key information needs from short user stories about community assistance. "
     "Produce compact, factual labels only when the story clearly expresses a need."
@@ -71,18 +82,35 @@ def build_needs_prompt(user_story: str) -> Tuple[List[Dict[str, str]], Dict]:
     return messages, schema
 
 
+def _text_format(schema: Dict) -> Dict:
+    return {
+        "format": {
+            "type": "json_schema",
+            "name": schema["name"],
+            "schema": schema["schema"]
+        }
+    }
+
+
 def _call_model(messages: List[Dict[str, str]], schema: Dict) -> str:
-    response = _client.responses.create(
-        model=GEN_MODEL,
-        input=messages,
-        text={
-            "format": {
-                "type": "json_schema",
-                "name": schema["name"],
-                "schema": schema["schema"] 
-            }
-        },
-    )
+    with _NEEDS_SECONDS.time():
+        response = _client.responses.create(
+            model=GEN_MODEL,
+            input=messages,
+            text=_text_format(schema),
+        )
+    record_openai_usage("responses", GEN_MODEL, response)
+    return response.output_text
+
+
+async def _call_model_async(messages: List[Dict[str, str]], schema: Dict) -> str:
+    with _NEEDS_SECONDS.time():
+        response = await _aclient.responses.create(
+            model=GEN_MODEL,
+            input=messages,
+            text=_text_format(schema),
+        )
+    record_openai_usage("responses", GEN_MODEL, response)
     return response.output_text
 
 
@@ -133,16 +161,97 @@ def parse_needs_response(raw_text: str) -> Dict:
     return result
 
 
-def extract_needs(user_story: str, response_fetcher: Callable[[List[Dict[str, str]], Dict], str] | None = None) -> Dict:
-    """Call the model and return structured needs. Falls back on failure."""
+def extract_needs(
+    user_story: str,
+    response_fetcher: Callable[[List[Dict[str, str]], Dict], str] | None = None,
+    story_vector: Optional[Sequence[float]] = None,
+) -> Dict:
+    """
+    Call the model and return structured needs. Falls back on failure.
+    Repeated stories (exact, or near-duplicates when `story_vector` is given)
+    are answered from `needs_cache` without a model call.
+    """
+    cached = needs_cache.get(user_story, story_vector)
+    if cached is not None:
+        log.info("Cache hit", extra={"needs": len(cached["needs"]), **SAMPLED})
+        return cached
+
     response_fetcher = response_fetcher or _call_model
     messages, schema = build_needs_prompt(user_story)
 
     try:
         raw_text = response_fetcher(messages, schema)
         parsed = parse_needs_response(raw_text)
-        print(f">>> [needs] Parsed {len(parsed['needs'])} needs with confidence {parsed['confidence']:.2f}")
+        log.info(
+            "Parsed needs",
+            extra={"needs": len(parsed["needs"]), "confidence": round(parsed["confidence"], 2), **SAMPLED},
+        )
+        needs_cache.put(user_story, parsed, story_vector)
         return parsed
     except Exception as exc:
-        print(f">>> [needs] Failed to extract needs: {exc}")
+        log.warning("Failed to extract needs: %s", exc)
+        _NEEDS_FALLBACKS.inc()
         return dict(FALLBACK_RESPONSE)
+
+
+async def extract_needs_async(
+    user_story: str,
+    response_fetcher: Callable[[List[Dict[str, str]], Dict], Awaitable[str]] | None = None,
+    story_vector: Union[Sequence[float], Awaitable[Optional[Sequence[float]]], None] = None,
+) -> Dict:
+    """
+    Async twin of `extract_needs` built on AsyncOpenAI. `story_vector` may
+    also be an awaitable (the story embedding still in flight): the model call
+    starts right after the exact-match lookup, and the near-duplicate lookup
+    runs once the vector lands, cancelling the model call on a hit. If the
+    model answers first, the vector is not waited for.
+    """
+    cached = needs_cache.get_exact(user_story)
+    if cached is None and story_vector is not None and not inspect.isawaitable(story_vector):
+        cached = needs_cache.get_near(story_vector)
+    if cached is not None:
+        log.info("Cache hit", extra={"needs": len(cached["needs"]), **SAMPLED})
+        return cached
+
+    pending_vector = asyncio.ensure_future(story_vector) if inspect.isawaitable(story_vector) else None
+    vector = None if pending_vector is not None else story_vector
+    response_fetcher = response_fetcher or _call_model_async
+    messages, schema = build_needs_prompt(user_story)
+    model = asyncio.ensure_future(response_fetcher(messages, schema))
+
+    try:
+        if pending_vector is not None:
+            await asyncio.wait({model, pending_vector}, return_when=asyncio.FIRST_COMPLETED)
+            vector = _ready_vector(pending_vector)
+            if vector is not None and not model.done():
+                cached = needs_cache.get_near(vector)
+                if cached is not None:
+                    log.info("Cache hit", extra={"needs": len(cached["needs"]), **SAMPLED})
+                    return cached
+        needs_cache.record_miss()
+
+        raw_text = await model
+        parsed = parse_needs_response(raw_text)
+        log.info(
+            "Parsed needs",
+            extra={"needs": len(parsed["needs"]), "confidence": round(parsed["confidence"], 2), **SAMPLED},
+        )
+        if pending_vector is not None:
+            vector = _ready_vector(pending_vector)
+        needs_cache.put(user_story, parsed, vector)
+        return parsed
+    except Exception as exc:
+        log.warning("Failed to extract needs: %s", exc)
+        _NEEDS_FALLBACKS.inc()
+        return dict(FALLBACK_RESPONSE)
+    finally:
+        # A near-duplicate hit or a cancelled request leaves no model call running.
+        model.cancel()
+        if pending_vector is not None and pending_vector is not story_vector:
+            pending_vector.cancel()  # our own task around a coroutine; a shared future is left alone
+
+
+def _ready_vector(pending: "asyncio.Future") -> Optional[Sequence[float]]:
+    if not pending.done() or pending.cancelled() or pending.exception() is not None:
+        return None
+    return pending.result()
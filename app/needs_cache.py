@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .cache import LRUCache
+from .config import NEEDS_CACHE_ITEMS, NEEDS_CACHE_SIMILARITY, NEEDS_CACHE_TTL
+from .embed_cache import normalize_text
+from .log import SAMPLED
+
+log = logging.getLogger(__name__)
+
+
+def story_key(user_story: str) -> str:
+    """Exact-match key: case and whitespace differences do not matter."""
+    return normalize_text(user_story).lower()
+
+
+class NeedsCache:
+    """
+    TTL + LRU cache of needs extraction results.
+
+    Lookups try the normalized story first, then the most similar cached story
+    embedding; a cosine similarity of at least `threshold` counts as a hit, so
+    templated intake text with small edits reuses the earlier extraction.
+    Story vectors live in one preallocated matrix, one row per cached story,
+    updated on put and eviction, so a near-duplicate lookup is a single
+    matrix-vector product.
+    """
+
+    def __init__(self, max_items: int, ttl: Optional[float], threshold: float):
+        # key -> (matrix row or None, result)
+        self._lru = LRUCache(max_items, ttl=ttl, on_evict=self._release)
+        self.threshold = float(threshold)
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None  # (rows, dim) unit vectors, allocated on first put
+        self._live = np.zeros(0, dtype=bool)
+        self._row_keys: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def get(self, user_story: str, vector: Optional[Sequence[float]] = None) -> Optional[Dict[str, Any]]:
+        cached = self.get_exact(user_story)
+        if cached is None and vector is not None:
+            cached = self.get_near(vector)
+        if cached is None:
+            self.record_miss()
+        return cached
+
+    def get_exact(self, user_story: str) -> Optional[Dict[str, Any]]:
+        """Exact (normalized) story match; a miss is not counted, so a near lookup can follow."""
+        entry = self._lru.get(story_key(user_story))
+        if entry is None:
+            return None
+        self._count("exact_hits")
+        return _copy_result(entry[1])
+
+    def get_near(self, vector: Sequence[float]) -> Optional[Dict[str, Any]]:
+        """Most similar cached story at or above the threshold; a miss is not counted."""
+        query = _unit(vector)
+        if query is None:
+            return None
+        while True:
+            match = self._nearest(query)
+            if match is None:
+                return None
+            entry = self._lru.get(match[0])
+            if entry is not None:
+                log.info("Near-duplicate story hit", extra={"cosine": round(match[1], 3), **SAMPLED})
+                self._count("near_hits")
+                return _copy_result(entry[1])
+            # Expired: the lookup released its row, so the next best is tried.
+
+    def record_miss(self) -> None:
+        self._count("misses")
+
+    def put(
+        self,
+        user_story: str,
+        result: Dict[str, Any],
+        vector: Optional[Sequence[float]] = None,
+    ) -> None:
+        if not self._lru.max_items:
+            return
+        key = story_key(user_story)
+        row = self._store_vector(key, _unit(vector))
+        self._lru.set(key, (row, _copy_result(result)))
+
+    def clear(self) -> None:
+        self._lru.clear()
+        with self._lock:
+            self._matrix = None
+            self._live = np.zeros(0, dtype=bool)
+            self._row_keys = []
+            self._rows = {}
+            self._free = []
+
+    def stats(self) -> Dict[str, Any]:
+        out = self._lru.stats()
+        with self._lock:
+            # The LRU's own counters see a near-duplicate hit as a miss (story key) plus a hit (matched key).
+            out.update(
+                exact_hits=self.exact_hits,
+                near_hits=self.near_hits,
+                hits=self.exact_hits + self.near_hits,
+                misses=self.misses,
+            )
+        out["ttl"] = self._lru.ttl
+        out["threshold"] = self.threshold
+        return out
+
+    def _store_vector(self, key: str, unit: Optional[np.ndarray]) -> Optional[int]:
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is not None and (unit is None or unit.shape[0] != self._matrix.shape[1]):
+                self._free_row(row)
+                row = None
+            if unit is None:
+                return None
+            if self._matrix is None:
+                # One spare row: a put takes its row before the LRU evicts the oldest entry.
+                rows = self._lru.max_items + 1
+                self._matrix = np.zeros((rows, unit.shape[0]), dtype=np.float32)
+                self._live = np.zeros(rows, dtype=bool)
+                self._row_keys = [None] * rows
+                self._free = list(range(rows - 1, -1, -1))
+            if unit.shape[0] != self._matrix.shape[1]:
+                return None
+            if row is None and not self._free:
+                # Concurrent puts racing ahead of their evictions can briefly need more.
+                grow = max(1, self._matrix.shape[0] // 4)
+                start = self._matrix.shape[0]
+                self._matrix = np.vstack([self._matrix, np.zeros((grow, self._matrix.shape[1]), np.float32)])
+                self._live = np.concatenate([self._live, np.zeros(grow, dtype=bool)])
+                self._row_keys.extend([None] * grow)
+                self._free.extend(range(start + grow - 1, start - 1, -1))
+            if row is None:
+                row = self._free.pop()
+            self._matrix[row] = unit
+            self._live[row] = True
+            self._row_keys[row] = key
+            self._rows[key] = row
+            return row
+
+    def _release(self, key: Any, value: Any) -> None:
+        row = value[0] if value else None
+        if row is None:
+            return
+        with self._lock:
+            if self._rows.get(key) == row:
+                del self._rows[key]
+                self._free_row(row)
+
+    def _free_row(self, row: int) -> None:
+        self._live[row] = False
+        self._row_keys[row] = None
+        self._free.append(row)
+
+    def _nearest(self, query: np.ndarray) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            if self._matrix is None or query.shape[0] != self._matrix.shape[1] or not self._live.any():
+                return None
+            scores = self._matrix @ query
+            scores[~self._live] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            return self._row_keys[best], float(scores[best])
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+def _unit(vector: Optional[Sequence[float]]) -> Optional[np.ndarray]:
+    if vector is None:
+        return None
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(arr))
+    return arr / norm if norm > 0 else None
+
+
+def _copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    needs: List[Dict[str, Any]] = [dict(n) for n in result.get("needs") or []]
+    return {**result, "needs": needs}
+
+
+needs_cache = NeedsCache(NEEDS_CACHE_ITEMS, NEEDS_CACHE_TTL, NEEDS_CACHE_SIMILARITY)
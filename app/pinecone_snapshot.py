@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import orjson
+
+from .config import ADMIN_FETCH_BATCH, INDEX_MAX_RETRIES, SNAPSHOT_FETCH_WORKERS
+from .indexer import is_retryable, retry_after_seconds
+from .journal import atomic_write
+from .jsonl_store import RecordStore
+from .manifest import metadata_hash, text_hash
+
+log = logging.getLogger(__name__)
+
+# Ids listed per list_paginated page; Pinecone's maximum.
+LIST_PAGE = 100
+DRIFT_SAMPLE = 50
+
+
+class PineconeSnapshot:
+    """
+    Local copy of the metadata (including `text`) of every vector in one
+    Pinecone namespace, so the admin UI can hydrate records without a network
+    call per view.
+
+    `sync` enumerates the namespace with list_paginated, fetches metadata in
+    batches of ADMIN_FETCH_BATCH ids over SNAPSHOT_FETCH_WORKERS threads and
+    rewrites the snapshot JSONL (one {"id", "metadata"} line per vector, read
+    back through the same offset index as the prepared files). Incremental
+    syncs only fetch ids the snapshot has not seen, plus any `stale` ids the
+    caller knows changed; ids no longer listed are dropped. Upserts made by
+    this process are folded in with `apply` so the snapshot stays current
+    between syncs.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.state_path = f"{path}.state.json"
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self.store = RecordStore(path)
+        self.state: Dict[str, Any] = self._load_state()
+
+    @property
+    def synced(self) -> bool:
+        return bool(self.state.get("synced_at"))
+
+    def __contains__(self, rid: object) -> bool:
+        return rid in self.store
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def get(self, rid: str) -> Optional[Dict[str, Any]]:
+        row = self.store.get(rid)
+        return None if row is None else row.get("metadata") or {}
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        out = {}
+        for rid in ids:
+            md = self.get(rid)
+            if md is not None:
+                out[rid] = md
+        return out
+
+    # ---------- sync ----------
+    def sync(
+        self,
+        index: Any,
+        namespace: str = "",
+        full: bool = False,
+        stale: Iterable[str] = (),
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        if self.state.get("namespace", namespace) != namespace:
+            full = True
+        remote_ids = list_ids(index, namespace, sleep=sleep)
+        stale = set(stale)
+        to_fetch = remote_ids if full else [rid for rid in remote_ids if rid not in self.store or rid in stale]
+        log.info("%d ids in namespace '%s'; fetching %d (full=%s)", len(remote_ids), namespace, len(to_fetch), full)
+
+        fetched = fetch_metadata(index, to_fetch, namespace, sleep=sleep)
+        listed = set(remote_ids)
+        removed = sum(1 for rid in self.store if rid not in listed)
+        # Keep `apply`'d upserts that were not refetched; fetched metadata wins over them.
+        overlay = {} if full else dict(self.store.overlay)
+        overlay.update({rid: {"id": rid, "metadata": md} for rid, md in fetched.items()})
+        ids = sorted(listed, key=lambda x: str(x))
+        self.store.compact(ids, overlay, lambda rid: {"id": rid, "metadata": {}})
+        self.store.overlay.clear()
+
+        self.state = {
+            "synced_at": time.time(),
+            "namespace": namespace,
+            "count": len(ids),
+            "fetched": len(fetched),
+            "removed": removed,
+        }
+        atomic_write(self.state_path, orjson.dumps(self.state))
+        report = {
+            "ok": True,
+            "listed": len(remote_ids),
+            "fetched": len(fetched),
+            "missing": len(to_fetch) - len(fetched),
+            "removed": removed,
+            "seconds": round(time.perf_counter() - t0, 2),
+        }
+        log.info("Synced: %s", report)
+        return report
+
+    def apply(self, items: Iterable[Tuple[str, Dict[str, Any]]], merge: bool = False) -> None:
+        """Record vectors this process just upserted (`merge` for set_metadata-style partial updates)."""
+        for rid, md in items:
+            if merge:
+                md = {**(self.get(rid) or {}), **md}
+            self.store[rid] = {"id": rid, "metadata": md}
+
+    def save(self) -> None:
+        """Fold `apply`'d changes into the snapshot file."""
+        if not self.store.overlay:
+            return
+        overlay = dict(self.store.overlay)
+        ids = sorted(set(self.store), key=lambda x: str(x))
+        self.store.compact(ids, overlay, lambda rid: {"id": rid, "metadata": {}})
+        self.store.forget(overlay)
+
+    def close(self) -> None:
+        self.store.close()
+
+    # ---------- drift ----------
+    def drift(self, ids: Sequence[str], local: Callable[[str], Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Compare local records (`local(rid)` -> (text, metadata)) with the snapshot.
+        Null metadata values are ignored on both sides, since Pinecone drops them.
+        """
+        local_ids = set(ids)
+        buckets: Dict[str, List[str]] = {
+            "missing_remote": [], "extra_remote": [], "text_changed": [], "metadata_changed": [],
+        }
+        for rid in ids:
+            remote = self.get(rid)
+            if remote is None:
+                buckets["missing_remote"].append(rid)
+                continue
+            text, md = local(rid)
+            if text_hash(text) != text_hash(remote.get("text") or ""):
+                buckets["text_changed"].append(rid)
+            elif metadata_hash(_comparable(md)) != metadata_hash(_comparable(remote)):
+                buckets["metadata_changed"].append(rid)
+        buckets["extra_remote"] = [rid for rid in self.store if rid not in local_ids]
+
+        report: Dict[str, Any] = {
+            "synced_at": self.state.get("synced_at"),
+            "local": len(local_ids),
+            "remote": len(self.store),
+        }
+        for name, found in buckets.items():
+            report[name] = len(found)
+            report[f"{name}_ids"] = found[:DRIFT_SAMPLE]
+        report["needs_upsert"] = report["missing_remote"] + report["text_changed"] + report["metadata_changed"]
+        return report
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.state_path, "rb") as f:
+                return orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return {}
+
+
+def list_ids(index: Any, namespace: str = "", sleep: Callable[[float], None] = time.sleep) -> List[str]:
+    """Every vector id in the namespace, one list_paginated page at a time."""
+    ids: List[str] = []
+    token = None
+    while True:
+        page = _retrying(
+            lambda: index.list_paginated(namespace=namespace, limit=LIST_PAGE, pagination_token=token),
+            sleep,
+        )
+        ids.extend(str(_field(v, "id")) for v in (_field(page, "vectors") or []))
+        token = _field(_field(page, "pagination"), "next")
+        if not token:
+            return ids
+
+
+def fetch_metadata(
+    index: Any,
+    ids: Sequence[str],
+    namespace: str = "",
+    batch: int = ADMIN_FETCH_BATCH,
+    workers: int = SNAPSHOT_FETCH_WORKERS,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Dict[str, Dict[str, Any]]:
+    chunks = [list(ids[i:i + batch]) for i in range(0, len(ids), batch)]
+
+    def fetch(chunk: List[str]) -> Dict[str, Dict[str, Any]]:
+        resp = _retrying(lambda: index.fetch(ids=chunk, namespace=namespace), sleep)
+        return {str(rid): _field(vec, "metadata") or {} for rid, vec in (_field(resp, "vectors") or {}).items()}
+
+    out: Dict[str, Dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="snapshot") as pool:
+        for part in pool.map(fetch, chunks):
+            out.update(part)
+    return out
+
+
+def _retrying(fn: Callable[[], Any], sleep: Callable[[float], None]) -> Any:
+    for attempt in range(INDEX_MAX_RETRIES + 1):
+        try:
+            return fn()
+        except Exception as exc:
+            if not is_retryable(exc) or attempt == INDEX_MAX_RETRIES:
+                raise
+            delay = retry_after_seconds(exc)
+            sleep(min(60.0, delay if delay is not None else 2 ** attempt))
+
+
+def _field(obj: Any, name: str) -> Any:
+    # Some SDKs return dict; some return object
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def _comparable(md: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # Pinecone stores numbers as floats and drops nulls.
+    return {
+        k: float(v) if isinstance(v, int) and not isinstance(v, bool) else v
+        for k, v in (md or {}).items()
+        if v is not None and k != "text"
+    }
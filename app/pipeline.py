@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+StageFn = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One node of a pipeline: `fn` receives {dep_name: dep_result} for its `deps`."""
+
+    name: str
+    fn: StageFn
+    deps: Tuple[str, ...] = ()
+
+
+async def run_stages(
+    stages: Sequence[Stage],
+    *,
+    on_complete: Optional[Callable[[str, Any], None]] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Dict[str, float]]]:
+    """
+    Run a dependency graph of async stages, starting each one as soon as all of
+    its dependencies have finished. Returns (results, timings), where timings
+    maps each stage to its start offset and duration in milliseconds.
+
+    `on_complete(name, result)` is called as each stage finishes, which lets
+    callers stream intermediate results. An exception in a stage propagates
+    to its dependents and out of `run_stages`; unfinished stages are cancelled.
+    """
+    _check_graph(stages)
+    t0 = time.perf_counter()
+    tasks: Dict[str, asyncio.Task] = {}
+    timings: Dict[str, Dict[str, float]] = {}
+
+    async def run(stage: Stage) -> Any:
+        inputs = {dep: await tasks[dep] for dep in stage.deps}
+        started = time.perf_counter()
+        result = await stage.fn(inputs)
+        finished = time.perf_counter()
+        timings[stage.name] = {
+            "start_ms": round((started - t0) * 1000, 1),
+            "duration_ms": round((finished - started) * 1000, 1),
+        }
+        if on_complete is not None:
+            on_complete(stage.name, result)
+        return result
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.ensure_future(run(stage))
+    try:
+        values = await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    timings["total"] = {"start_ms": 0.0, "duration_ms": round((time.perf_counter() - t0) * 1000, 1)}
+    return dict(zip(tasks.keys(), values)), timings
+
+
+async def iter_stages(
+    stages: Sequence[Stage],
+    timings: Optional[Dict[str, Dict[str, float]]] = None,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Run the graph like `run_stages`, yielding (name, result) as each stage
+    finishes. When the graph completes, `timings` (if given) is filled in.
+    """
+    queue: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue()
+    runner = asyncio.ensure_future(
+        run_stages(stages, on_complete=lambda name, result: queue.put_nowait((name, result)))
+    )
+    try:
+        while not (runner.done() and queue.empty()):
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, runner}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+            else:
+                getter.cancel()
+        _, run_timings = runner.result()
+        if timings is not None:
+            timings.update(run_timings)
+    finally:
+        runner.cancel()
+
+
+def _check_graph(stages: Sequence[Stage]) -> None:
+    """Stages must be listed in dependency order with unique names (so no cycles)."""
+    seen = set()
+    for stage in stages:
+        if stage.name in seen:
+            raise ValueError(f"Duplicate stage name: {stage.name}")
+        missing = [dep for dep in stage.deps if dep not in seen]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown or later stages: {missing}")
+        seen.add(stage.name)
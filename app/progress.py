@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Iterable, Optional, Set
+
+import orjson
+
+from .config import PROGRESS_FLUSH_CHANGES, PROGRESS_FLUSH_DELAY
+from .journal import atomic_write
+
+log = logging.getLogger(__name__)
+
+
+class ProgressStore:
+    """
+    Review progress (reviewed / dirty id sets) with write-behind persistence.
+
+    Changes apply to the in-memory sets immediately. A background thread
+    writes progress.json (temp file + rename) once `delay` seconds have passed
+    since the first unsaved change, or as soon as `max_pending` changes have
+    piled up, so a burst of admin clicks costs one file write. `flush()` writes
+    synchronously and is called on shutdown.
+
+    A crash can lose the last `delay` seconds of changes. DataStore recomputes
+    the dirty flags of journaled edits at startup, so only "reviewed" marks
+    from that window can be lost.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        delay: float = PROGRESS_FLUSH_DELAY,
+        max_pending: int = PROGRESS_FLUSH_CHANGES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.path = path
+        self.delay = max(0.0, float(delay))
+        self.max_pending = max(1, int(max_pending))
+        self._clock = clock
+        self.reviewed: Set[str] = set()
+        self.dirty: Set[str] = set()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._pending = 0
+        self._first_change: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.writes = 0
+        self._load()
+
+    # ---------- changes ----------
+    def mark_reviewed(self, rid: str) -> None:
+        with self._cond:
+            if rid not in self.reviewed:
+                self.reviewed.add(rid)
+                self._changed()
+
+    def set_dirty(self, rid: str, dirty: bool = True) -> None:
+        with self._cond:
+            if dirty and rid not in self.dirty:
+                self.dirty.add(rid)
+                self._changed()
+            elif not dirty and rid in self.dirty:
+                self.dirty.discard(rid)
+                self._changed()
+
+    def clear_dirty(self, ids: Iterable[str]) -> None:
+        with self._cond:
+            before = len(self.dirty)
+            self.dirty.difference_update(ids)
+            if len(self.dirty) != before:
+                self._changed(before - len(self.dirty))
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    # ---------- persistence ----------
+    def flush(self) -> bool:
+        """Write any unsaved changes now. Returns True if a write happened."""
+        with self._write_lock:
+            with self._cond:
+                if not self._pending:
+                    return False
+                reviewed, dirty = list(self.reviewed), list(self.dirty)
+                taken, self._pending = self._pending, 0
+                self._first_change = None
+            # Sorting and writing happen outside the lock so edits never wait on disk.
+            try:
+                atomic_write(self.path, orjson.dumps({"reviewed": sorted(reviewed), "dirty": sorted(dirty)}))
+            except OSError:
+                with self._cond:
+                    self._pending += taken
+                    if self._first_change is None:
+                        self._first_change = self._clock()
+                raise
+            self.writes += 1
+            return True
+
+    def close(self) -> None:
+        """Stop the writer thread and persist whatever is outstanding."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def _changed(self, n: int = 1) -> None:
+        # Caller holds self._cond.
+        self._pending += n
+        if self._first_change is None:
+            self._first_change = self._clock()
+        if self._thread is None and not self._closed:
+            self._thread = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+            self._thread.start()
+        self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._pending:
+                        wait = self.delay - (self._clock() - self._first_change)
+                        if wait <= 0 or self._pending >= self.max_pending:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning("Could not write %s: %s", self.path, e)
+                time.sleep(1.0)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = orjson.loads(f.read())
+        self.reviewed = set(data.get("reviewed", []))
+        self.dirty = set(data.get("dirty", []))
@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import orjson
+
+# Columns a query can filter on, besides `category` (its own table) and the flags.
+QUERY_FIELDS = ("city", "county", "zip_code")
+FLAGS = ("reviewed", "dirty")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id TEXT PRIMARY KEY,
+    text TEXT NOT NULL DEFAULT '',
+    metadata BLOB NOT NULL,
+    city TEXT COLLATE NOCASE,
+    county TEXT COLLATE NOCASE,
+    zip_code TEXT,
+    reviewed INTEGER NOT NULL DEFAULT 0,
+    dirty INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS records_city ON records(city);
+CREATE INDEX IF NOT EXISTS records_county ON records(county);
+CREATE INDEX IF NOT EXISTS records_zip_code ON records(zip_code);
+CREATE INDEX IF NOT EXISTS records_reviewed ON records(reviewed, id);
+CREATE INDEX IF NOT EXISTS records_dirty ON records(dirty, id);
+CREATE TABLE IF NOT EXISTS record_categories (
+    category TEXT NOT NULL COLLATE NOCASE,
+    id TEXT NOT NULL,
+    PRIMARY KEY (category, id)
+);
+CREATE INDEX IF NOT EXISTS record_categories_id ON record_categories(id);
+"""
+
+# (id, text, metadata, indexed fields, reviewed, dirty)
+Row = Tuple[str, str, Dict[str, Any], Dict[str, Any], bool, bool]
+
+
+class RecordDB:
+    """
+    Admin records in SQLite (WAL): text, metadata and review flags per id,
+    with indexes on the fields the admin filters by. Every write is its own
+    transaction, so several workers can share the file. `fields` passed to
+    the writers are the flattened city/county/zip_code/categories values the
+    caller derives from the metadata; the metadata itself is stored as is.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.docs = _DocsView(self)
+        self.meta = _MetaView(self)
+        self.progress = DBProgress(self)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            parent = os.path.dirname(self.path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Admin edits are the source of truth here, not a cache: fsync every commit.
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _read(self, sql: str, args: Sequence[Any] = ()) -> List[tuple]:
+        with self._lock:
+            return self._connection().execute(sql, args).fetchall()
+
+    def _write(self, fn) -> Any:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn(conn)
+                conn.execute("COMMIT")
+                return out
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    # ---------- reads ----------
+    def count(self) -> int:
+        return self._read("SELECT COUNT(*) FROM records")[0][0]
+
+    def ids(self) -> List[str]:
+        return [r[0] for r in self._read("SELECT id FROM records ORDER BY id")]
+
+    def __contains__(self, rid: object) -> bool:
+        return bool(self._read("SELECT 1 FROM records WHERE id = ?", (str(rid),)))
+
+    def iter_records(self, batch: int = 1000) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """Every (id, text, metadata) in id order, `batch` rows per query so the lock is never held long."""
+        last = ""
+        while True:
+            rows = self._read(
+                "SELECT id, text, metadata FROM records WHERE id > ? ORDER BY id LIMIT ?", (last, int(batch))
+            )
+            for rid, text, md in rows:
+                yield rid, text, orjson.loads(md)
+            if len(rows) < batch:
+                return
+            last = rows[-1][0]
+
+    def get(self, rid: str) -> Optional[Tuple[str, Dict[str, Any], bool, bool]]:
+        rows = self._read("SELECT text, metadata, reviewed, dirty FROM records WHERE id = ?", (str(rid),))
+        if not rows:
+            return None
+        text, md, reviewed, dirty = rows[0]
+        return text, orjson.loads(md), bool(reviewed), bool(dirty)
+
+    def flagged(self, flag: str) -> List[str]:
+        return [r[0] for r in self._read(f"SELECT id FROM records WHERE {_flag(flag)} = 1 ORDER BY id")]
+
+    def count_flag(self, flag: str) -> int:
+        return self._read(f"SELECT COUNT(*) FROM records WHERE {_flag(flag)} = 1")[0][0]
+
+    def has_flag(self, rid: str, flag: str) -> bool:
+        return bool(self._read(f"SELECT 1 FROM records WHERE id = ? AND {_flag(flag)} = 1", (str(rid),)))
+
+    def query(
+        self,
+        filters: Dict[str, Any],
+        offset: int = 0,
+        limit: int = 50,
+    ) -> Tuple[int, List[Tuple[str, Dict[str, Any], bool, bool]]]:
+        """Records matching every given filter, ordered by id: (total matches, one page of rows)."""
+        where, args = [], []
+        for field in QUERY_FIELDS:
+            if filters.get(field) not in (None, ""):
+                where.append(f"{field} = ?")
+                args.append(str(filters[field]))
+        if filters.get("category") not in (None, ""):
+            where.append("id IN (SELECT id FROM record_categories WHERE category = ?)")
+            args.append(str(filters["category"]))
+        for flag in FLAGS:
+            if filters.get(flag) is not None:
+                where.append(f"{flag} = ?")
+                args.append(1 if filters[flag] else 0)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        total = self._read(f"SELECT COUNT(*) FROM records{clause}", args)[0][0]
+        rows = self._read(
+            f"SELECT id, metadata, reviewed, dirty FROM records{clause} ORDER BY id LIMIT ? OFFSET ?",
+            [*args, int(limit), int(offset)],
+        )
+        return total, [(rid, orjson.loads(md), bool(rv), bool(dt)) for rid, md, rv, dt in rows]
+
+    # ---------- writes ----------
+    def put(
+        self,
+        rid: str,
+        text: str,
+        metadata: Dict[str, Any],
+        fields: Dict[str, Any],
+        reviewed: Optional[bool] = None,
+        dirty: Optional[bool] = None,
+    ) -> None:
+        """Insert or replace one record in a single transaction; None flags keep their stored value."""
+        def write(conn):
+            current = conn.execute("SELECT reviewed, dirty FROM records WHERE id = ?", (rid,)).fetchone()
+            rv = int(reviewed) if reviewed is not None else (current[0] if current else 0)
+            dt = int(dirty) if dirty is not None else (current[1] if current else 0)
+            _put(conn, (rid, text, metadata, fields, bool(rv), bool(dt)))
+        self._write(write)
+
+    def put_many(self, rows: Iterable[Row]) -> int:
+        """Bulk load (e.g. importing the JSONL files) in one transaction."""
+        def write(conn):
+            n = 0
+            for row in rows:
+                _put(conn, row)
+                n += 1
+            return n
+        return self._write(write)
+
+    def set_flag(self, ids: Iterable[str], flag: str, value: bool) -> int:
+        ids = [str(i) for i in ids]
+        if not ids:
+            return 0
+        def write(conn):
+            changed = 0
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                cur = conn.execute(
+                    f"UPDATE records SET {_flag(flag)} = ? WHERE id IN ({marks}) AND {_flag(flag)} != ?",
+                    [int(value), *chunk, int(value)],
+                )
+                changed += cur.rowcount or 0
+            return changed
+        return self._write(write)
+
+    def checkpoint(self) -> None:
+        with self._lock:
+            self._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _put(conn: sqlite3.Connection, row: Row) -> None:
+    rid, text, metadata, fields, reviewed, dirty = row
+    conn.execute(
+        "INSERT OR REPLACE INTO records (id, text, metadata, city, county, zip_code, reviewed, dirty, updated_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            rid, text or "", orjson.dumps(metadata, default=str),
+            *(_scalar(fields.get(f)) for f in QUERY_FIELDS),
+            int(reviewed), int(dirty), time.time(),
+        ),
+    )
+    conn.execute("DELETE FROM record_categories WHERE id = ?", (rid,))
+    categories = {str(c) for c in (fields.get("categories") or []) if c not in (None, "")}
+    conn.executemany("INSERT OR IGNORE INTO record_categories (category, id) VALUES (?, ?)",
+                     [(c, rid) for c in categories])
+
+
+def _scalar(value: Any) -> Optional[str]:
+    return None if value in (None, "") else str(value)
+
+
+def _flag(flag: str) -> str:
+    if flag not in FLAGS:
+        raise ValueError(f"Unknown flag: {flag!r}")
+    return flag
+
+
+# ---------- views DataStore uses in place of its dicts/sets ----------
+class _DocsView:
+    def __init__(self, db: RecordDB):
+        self.db = db
+
+    def get(self, rid: str, default: Any = None) -> Any:
+        row = self.db.get(rid)
+        return default if row is None else {"id": rid, "text": row[0]}
+
+    def __contains__(self, rid: object) -> bool:
+        return rid in self.db
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.db.ids())
+
+    def __len__(self) -> int:
+        return self.db.count()
+
+    def close(self) -> None:
+        pass
+
+
+class _MetaView(_DocsView):
+    def get(self, rid: str, default: Any = None) -> Any:
+        row = self.db.get(rid)
+        return default if row is None else row[1]
+
+
+class _FlagView:
+    def __init__(self, db: RecordDB, flag: str):
+        self.db = db
+        self.flag = flag
+
+    def __contains__(self, rid: object) -> bool:
+        return self.db.has_flag(str(rid), self.flag)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.db.flagged(self.flag))
+
+    def __len__(self) -> int:
+        return self.db.count_flag(self.flag)
+
+
+class DBProgress:
+    """ProgressStore's interface over the reviewed/dirty columns; every change commits immediately."""
+
+    pending = 0
+
+    def __init__(self, db: RecordDB):
+        self.db = db
+        self.reviewed = _FlagView(db, "reviewed")
+        self.dirty = _FlagView(db, "dirty")
+
+    def mark_reviewed(self, rid: str) -> None:
+        self.db.set_flag([rid], "reviewed", True)
+
+    def set_dirty(self, rid: str, dirty: bool = True) -> None:
+        self.db.set_flag([rid], "dirty", dirty)
+
+    def clear_dirty(self, ids: Iterable[str]) -> None:
+        self.db.set_flag(ids, "dirty", False)
+
+    def flush(self) -> bool:
+        return False
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import LRUCache, SQLiteStore
+from .config import (
+    CACHE_DB_PATH, NAMESPACE, RETRIEVAL_CACHE_ITEMS, RETRIEVAL_CACHE_SYNC, RETRIEVAL_CACHE_TTL
+)
+from .embed_cache import normalize_text
+
+log = logging.getLogger(__name__)
+
+Hit = Dict[str, Any]
+CacheKey = Tuple[int, str, str, str, int]
+
+# Row of the shared store holding the token of the latest invalidation.
+_GENERATION_KEY = "retrieval"
+
+
+def canonical_filter(metadata_filters: Optional[Dict[str, Any]]) -> str:
+    """Stable string form of a `build_filter` dict, independent of key order."""
+    return json.dumps(metadata_filters or {}, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class RetrievalCache:
+    """
+    TTL + LRU cache of search results keyed by (query, filter, namespace, top_k).
+
+    Every key also carries the current index generation. `invalidate()` bumps
+    the generation and drops all entries, so results computed by searches
+    that were already in flight when the index changed are never served.
+
+    Workers share invalidations through `shared`, a SQLite table holding a
+    token that `invalidate()` replaces. A background thread, started by the
+    first lookup, reads it every `sync_interval` seconds and bumps this
+    worker's generation when it changed, so an edit made through one worker
+    clears the others within that interval and lookups never touch SQLite.
+    A disabled cache (max_items <= 0) never checks.
+    """
+
+    def __init__(
+        self,
+        max_items: int,
+        ttl: Optional[float],
+        shared: Optional[SQLiteStore] = None,
+        sync_interval: float = 1.0,
+    ):
+        self._lru = LRUCache(max_items, ttl=ttl)
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.shared = shared
+        self.sync_interval = sync_interval
+        self._token: Optional[bytes] = None
+        self._sync_started = False
+        self._stop = threading.Event()
+
+    def key(
+        self,
+        query: str,
+        top_k: int,
+        metadata_filters: Optional[Dict[str, Any]],
+        namespace: Optional[str],
+    ) -> CacheKey:
+        if not self._sync_started:
+            self._start_syncer()
+        return (
+            self.generation,
+            normalize_text(query),
+            canonical_filter(metadata_filters),
+            namespace or NAMESPACE,
+            int(top_k),
+        )
+
+    def get(self, key: CacheKey) -> Optional[List[Hit]]:
+        hits = self._lru.get(key)
+        return _copy_hits(hits) if hits is not None else None
+
+    def put(self, key: CacheKey, hits: List[Hit]) -> None:
+        if key[0] != self.generation:
+            return
+        self._lru.set(key, _copy_hits(hits))
+
+    def invalidate(self) -> int:
+        token = uuid.uuid4().hex.encode()
+        if self.shared is not None:
+            self.shared.put_many([(_GENERATION_KEY, token, None)])
+        with self._lock:
+            self._token = token
+            return self._bump()
+
+    def sync(self) -> None:
+        """Adopt an invalidation made by another worker, if there was one."""
+        if self.shared is None:
+            return
+        token = self.shared.get_many([_GENERATION_KEY]).get(_GENERATION_KEY)
+        with self._lock:
+            if token != self._token:
+                self._token = token
+                self._bump()
+
+    def close(self) -> None:
+        self._stop.set()
+
+    def _start_syncer(self) -> None:
+        with self._lock:
+            if self._sync_started:
+                return
+            self._sync_started = True
+        if self.shared is None or self._lru.max_items <= 0 or self.sync_interval <= 0:
+            return
+        threading.Thread(target=self._sync_loop, name="retrieval-cache-sync", daemon=True).start()
+
+    def _sync_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sync()
+            except Exception as exc:
+                log.warning("Retrieval cache sync failed: %s", exc)
+            self._stop.wait(self.sync_interval)
+
+    def _bump(self) -> int:
+        self.generation += 1
+        self._lru.clear()
+        return self.generation
+
+    def stats(self) -> Dict[str, Any]:
+        out = self._lru.stats()
+        out["generation"] = self.generation
+        out["ttl"] = self._lru.ttl
+        return out
+
+
+def _copy_hits(hits: List[Hit]) -> List[Hit]:
+    out = []
+    for hit in hits:
+        copied = dict(hit)
+        if isinstance(copied.get("metadata"), dict):
+            copied["metadata"] = dict(copied["metadata"])
+        out.append(copied)
+    return out
+
+
+retrieval_cache = RetrievalCache(
+    RETRIEVAL_CACHE_ITEMS,
+    RETRIEVAL_CACHE_TTL,
+    SQLiteStore(CACHE_DB_PATH, "cache_generations", 16),
+    RETRIEVAL_CACHE_SYNC,
+)
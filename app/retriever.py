@@ -1,32 +1,70 @@
-import json
-import traceback
-from typing import Any, Dict, List, Optional
-
-from openai import OpenAI
-from pinecone import Pinecone
+import asyncio
+import logging
+from functools import partial
+from typing import Any, Dict, List, Optional, Sequence, Union
 
 from .config import (
-    OPENAI_API_KEY, PINECONE_API_KEY,
-    PINECONE_INDEX_NAME, NAMESPACE, EMBED_MODEL
+    NAMESPACE, EMBED_MODEL,
+    VECTOR_BACKEND, LOCAL_INDEX_DIR, LOCAL_INDEX_DTYPE,
+    IVF_INDEX_DIR, IVF_NPROBE, IVF_RERANK
 )
+from .clients import LazyClient, async_openai_client, openai_client, pinecone_async_index, pinecone_index
+from .embed_cache import embed_cached, embed_cached_async
+from .result_cache import retrieval_cache
+from .fanout import DEFAULT_CALL_TIMEOUT, DEFAULT_MAX_WORKERS, run_bounded
+from .metrics import OPERATION_SECONDS, record_openai_usage
+from .ivf_index import IVFBackend
+from .log import SAMPLED
+from .vector_backend import LocalBackend, PineconeBackend, VectorBackend
+
+log = logging.getLogger(__name__)
+
+# Shared clients (app/clients.py), built on first use; the OpenAI SDK serves the Responses/Embeddings APIs.
+oai = openai_client
+aoai = async_openai_client
+# Index handle by name; only the Pinecone backend ever resolves it.
+index = pinecone_index if VECTOR_BACKEND == "pinecone" else None
+
+def _get_async_index():
+    return pinecone_async_index
 
-# Initialize clients
-print(">>> [retriever] Initializing OpenAI and Pinecone clients...")
-oai = OpenAI(api_key=OPENAI_API_KEY)  # OpenAI Python SDK, Responses/Embeddings APIs
-pc = Pinecone(api_key=PINECONE_API_KEY)  # Pinecone Python SDK (modern)  :contentReference[oaicite:6]{index=6}
+def _make_backend() -> VectorBackend:
+    if VECTOR_BACKEND == "local":
+        backend = LocalBackend.load(LOCAL_INDEX_DIR, LOCAL_INDEX_DTYPE)
+    elif VECTOR_BACKEND == "ivf":
+        backend = IVFBackend.load(IVF_INDEX_DIR, IVF_NPROBE, IVF_RERANK)
+    elif VECTOR_BACKEND == "pinecone":
+        backend = PineconeBackend(lambda: index, _get_async_index)
+    else:
+        raise ValueError(f"Unknown VECTOR_BACKEND: {VECTOR_BACKEND!r} (expected 'pinecone', 'local' or 'ivf')")
+    log.info("Vector backend: %s", backend.name)
+    return backend
 
-# Get index handle (by name)
-index = pc.Index(name=PINECONE_INDEX_NAME)
-print(f">>> [retriever] Using Pinecone index: {PINECONE_INDEX_NAME}")
+_EMBED_SECONDS = OPERATION_SECONDS.labels("embedding")
+_QUERY_SECONDS = OPERATION_SECONDS.labels("vector_query")
+
+# Local and IVF backends load their matrices here, so that waits for the first search (or warm-up).
+backend = LazyClient("vector_backend", _make_backend)
 
 def embed_query(text: str) -> List[float]:
     """Embed the user query with the same model used to build the index."""
-    print(f">>> [retriever] Embedding query: {text[:120]}...")
+    log.debug("Embedding query: %s", text[:120])
+    return embed_cached([text], _embed_uncached)[0]
+
+def embed_queries(texts: Sequence[str]) -> List[List[float]]:
+    """Embed several queries with a single Embeddings API request, preserving input order."""
+    texts = list(texts)
+    if not texts:
+        return []
+    return embed_cached(texts, _embed_uncached)
+
+def _embed_uncached(texts: List[str]) -> List[List[float]]:
+    log.info("Embedding texts in one request", extra={"texts": len(texts), **SAMPLED})
     # OpenAI Embeddings API call  :contentReference[oaicite:7]{index=7}
-    e = oai.embeddings.create(model=EMBED_MODEL, input=text)
-    vec = e.data[0].embedding
-    print(f">>> [retriever] Embedding length: {len(vec)} (should match index dimension)")
-    return vec
+    with _EMBED_SECONDS.time():
+        e = oai.embeddings.create(model=EMBED_MODEL, input=texts)
+    record_openai_usage("embeddings", EMBED_MODEL, e)
+    return [d.embedding for d in sorted(e.data, key=lambda d: d.index)]
 
 def build_filter(
     city: Optional[str] = None,
@@ -57,7 +95,7 @@ def build_filter(
     if free_only is True:
         f["free_or_low_cost"] = {"$eq": True}
 
-    print(f">>> [retriever] Built metadata filter: {json.dumps(f)}")
+    log.debug("Built metadata filter", extra={"filter": f})
     return f
 
 def retrieve(
@@ -67,37 +105,229 @@ def retrieve(
     namespace: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
-    Vector search in Pinecone with optional metadata filter.
+    Vector search (Pinecone or the local backend) with optional metadata filter.
     Uses the Query API to return matches with metadata.  :contentReference[oaicite:9]{index=9}
+    Identical searches are answered from the result cache until it expires or the index changes.
     """
+    key = retrieval_cache.key(user_query, top_k, metadata_filters, namespace)
+    cached = retrieval_cache.get(key)
+    if cached is not None:
+        log.info("Result cache hit", extra={"matches": len(cached), **SAMPLED})
+        return cached
+
     try:
         qvec = embed_query(user_query)
-        ns = namespace or NAMESPACE
-        print(f">>> [retriever] Querying Pinecone (namespace='{ns}', top_k={top_k}) ...")
-
-        res = index.query(
-            namespace=ns,
-            vector=qvec,
-            top_k=top_k,
-            filter=metadata_filters or {},
-            include_values=False,
-            include_metadata=True
-        )
+        results = _query_index(qvec, top_k, metadata_filters, namespace)
+        retrieval_cache.put(key, results)
+        return results
+
+    except Exception as e:
+        log.exception("retrieve() failed: %s", e)
+        return []
+
+def retrieve_many(
+    vectors: Sequence[List[float]],
+    top_k: Union[int, Sequence[int]] = 8,
+    metadata_filters: Optional[Dict[str, Any]] = None,
+    namespace: Optional[str] = None,
+    *,
+    queries: Optional[Sequence[str]] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    timeout: Optional[float] = DEFAULT_CALL_TIMEOUT,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Run one vector-index query per precomputed query vector (see embed_queries).
+    `top_k` may be a single value or one per vector. Queries are sent
+    concurrently; a failed or timed-out query yields an empty hit list.
+    Passing the source `queries` texts lets repeated searches use the result cache.
+    """
+    vectors = list(vectors)
+    if isinstance(top_k, int):
+        top_ks = [top_k] * len(vectors)
+    else:
+        top_ks = list(top_k)
+    if len(top_ks) != len(vectors):
+        raise ValueError("top_k must be an int or have one entry per vector")
+
+    if queries is not None and len(queries) != len(vectors):
+        raise ValueError("queries must have one entry per vector")
+
+    results: List[Optional[List[Dict[str, Any]]]] = [None] * len(vectors)
+    keys: List[Any] = [None] * len(vectors)
+    if queries is not None:
+        for pos, (query, k) in enumerate(zip(queries, top_ks)):
+            keys[pos] = retrieval_cache.key(query, k, metadata_filters, namespace)
+            results[pos] = retrieval_cache.get(keys[pos])
+
+    pending = [pos for pos, hits in enumerate(results) if hits is None]
+    if len(pending) < len(vectors):
+        log.info("Result cache hits", extra={"hits": len(vectors) - len(pending), "queries": len(vectors), **SAMPLED})
+    calls = [
+        partial(_query_and_cache, vectors[pos], top_ks[pos], metadata_filters, namespace, keys[pos])
+        for pos in pending
+    ]
+    fresh = run_bounded(
+        calls, max_workers=max_workers, timeout=timeout, default=[], label="retriever"
+    )
+    for pos, hits in zip(pending, fresh):
+        results[pos] = hits
+    return [hits or [] for hits in results]
+
+def _query_and_cache(
+    qvec: List[float],
+    top_k: int,
+    metadata_filters: Optional[Dict[str, Any]],
+    namespace: Optional[str],
+    cache_key: Optional[Any],
+) -> List[Dict[str, Any]]:
+    results = _query_index(qvec, top_k, metadata_filters, namespace)
+    if cache_key is not None:
+        retrieval_cache.put(cache_key, results)
+    return results
+
+def _query_index(
+    qvec: List[float],
+    top_k: int,
+    metadata_filters: Optional[Dict[str, Any]],
+    namespace: Optional[str],
+) -> List[Dict[str, Any]]:
+    ns = namespace or NAMESPACE
+    with _QUERY_SECONDS.time():
+        results = backend.query(qvec, top_k, metadata_filters, ns)
+    _log_query(ns, top_k, results)
+    return results
+
+def _log_query(ns: str, top_k: int, results: List[Dict[str, Any]]) -> None:
+    log.info(
+        "Queried %s", backend.name,
+        extra={"namespace": ns, "top_k": top_k, "matches": len(results), **SAMPLED},
+    )
+    if results and log.isEnabledFor(logging.DEBUG):
+        md = results[0]["metadata"] or {}
+        log.debug("Top match", extra={
+            "id": results[0]["id"],
+            "score": results[0]["score"],
+            "resource_name": md.get("resource_name"),
+            "organization_name": md.get("organization_name"),
+            "city": md.get("city"),
+            "zip_code": md.get("zip_code"),
+        })
+
 
-        matches = getattr(res, "matches", []) or []
-        print(f">>> [retriever] Retrieved {len(matches)} matches.")
-        if matches:
-            print(">>> [retriever] Top match (debug):")
-            md = matches[0].metadata or {}
-            print("    id:", matches[0].id, "score:", matches[0].score)
-            print("    name/org:", md.get("resource_name"), "/", md.get("organization_name"))
-            print("    city/zip:", md.get("city"), "/", md.get("zip_code"))
-
-        # Normalize
-        results = [{"id": m.id, "score": m.score, "metadata": m.metadata} for m in matches]
+# ---------- asyncio variants (used by /ask) ----------
+
+async def embed_query_async(text: str) -> List[float]:
+    """Async twin of `embed_query`."""
+    return (await embed_cached_async([text], _embed_uncached_async))[0]
+
+async def embed_queries_async(texts: Sequence[str]) -> List[List[float]]:
+    """Async twin of `embed_queries`: one Embeddings request for all cache misses."""
+    texts = list(texts)
+    if not texts:
+        return []
+    return await embed_cached_async(texts, _embed_uncached_async)
+
+async def _embed_uncached_async(texts: List[str]) -> List[List[float]]:
+    log.info("Embedding texts in one async request", extra={"texts": len(texts), **SAMPLED})
+    with _EMBED_SECONDS.time():
+        e = await aoai.embeddings.create(model=EMBED_MODEL, input=texts)
+    record_openai_usage("embeddings", EMBED_MODEL, e)
+    return [d.embedding for d in sorted(e.data, key=lambda d: d.index)]
+
+async def retrieve_async(
+    user_query: str,
+    top_k: int = 8,
+    metadata_filters: Optional[Dict[str, Any]] = None,
+    namespace: Optional[str] = None,
+    *,
+    query_vector: Optional[List[float]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Async twin of `retrieve` using AsyncOpenAI and the backend's async query.
+    Pass `query_vector` when the embedding of `user_query` is already at hand;
+    results are still cached under the query text.
+    """
+    key = retrieval_cache.key(user_query, top_k, metadata_filters, namespace)
+    cached = retrieval_cache.get(key)
+    if cached is not None:
+        log.info("Result cache hit", extra={"matches": len(cached), **SAMPLED})
+        return cached
+
+    try:
+        qvec = query_vector if query_vector is not None else await embed_query_async(user_query)
+        results = await _query_index_async(qvec, top_k, metadata_filters, namespace)
+        retrieval_cache.put(key, results)
         return results
 
     except Exception as e:
-        print(">>> [retriever] ERROR during retrieve():", e)
-        print(traceback.format_exc())
+        log.exception("retrieve_async() failed: %s", e)
         return []
+
+async def retrieve_many_async(
+    vectors: Sequence[List[float]],
+    top_k: Union[int, Sequence[int]] = 8,
+    metadata_filters: Optional[Dict[str, Any]] = None,
+    namespace: Optional[str] = None,
+    *,
+    queries: Optional[Sequence[str]] = None,
+    timeout: Optional[float] = DEFAULT_CALL_TIMEOUT,
+) -> List[List[Dict[str, Any]]]:
+    """Async twin of `retrieve_many`: all queries are awaited together, each under its own `timeout`."""
+    vectors = list(vectors)
+    top_ks = [top_k] * len(vectors) if isinstance(top_k, int) else list(top_k)
+    if len(top_ks) != len(vectors):
+        raise ValueError("top_k must be an int or have one entry per vector")
+    if queries is not None and len(queries) != len(vectors):
+        raise ValueError("queries must have one entry per vector")
+
+    results: List[Optional[List[Dict[str, Any]]]] = [None] * len(vectors)
+    keys: List[Any] = [None] * len(vectors)
+    if queries is not None:
+        for pos, (query, k) in enumerate(zip(queries, top_ks)):
+            keys[pos] = retrieval_cache.key(query, k, metadata_filters, namespace)
+            results[pos] = retrieval_cache.get(keys[pos])
+
+    pending = [pos for pos, hits in enumerate(results) if hits is None]
+    if len(pending) < len(vectors):
+        log.info("Result cache hits", extra={"hits": len(vectors) - len(pending), "queries": len(vectors), **SAMPLED})
+    fresh = await asyncio.gather(*[
+        _query_and_cache_async(vectors[pos], top_ks[pos], metadata_filters, namespace, keys[pos], timeout)
+        for pos in pending
+    ])
+    for pos, hits in zip(pending, fresh):
+        results[pos] = hits
+    return [hits or [] for hits in results]
+
+async def _query_and_cache_async(
+    qvec: List[float],
+    top_k: int,
+    metadata_filters: Optional[Dict[str, Any]],
+    namespace: Optional[str],
+    cache_key: Optional[Any],
+    timeout: Optional[float],
+) -> List[Dict[str, Any]]:
+    try:
+        results = await asyncio.wait_for(
+            _query_index_async(qvec, top_k, metadata_filters, namespace), timeout
+        )
+    except asyncio.TimeoutError:
+        log.warning("Async query timed out after %ss; skipping.", timeout)
+        return []
+    except Exception as e:
+        log.error("Async query failed: %s", e)
+        return []
+    if cache_key is not None:
+        retrieval_cache.put(cache_key, results)
+    return results
+
+async def _query_index_async(
+    qvec: List[float],
+    top_k: int,
+    metadata_filters: Optional[Dict[str, Any]],
+    namespace: Optional[str],
+) -> List[Dict[str, Any]]:
+    ns = namespace or NAMESPACE
+    with _QUERY_SECONDS.time():
+        results = await backend.query_async(qvec, top_k, metadata_filters, ns)
+    _log_query(ns, top_k, results)
+    return results
@@ -16,6 +16,15 @@ function norm(s){ // "Unknown" -> ""
 }
 
 let CUR_INDEX = 0, TOTAL = 0;
+const PAGE = 20;            // records per /api/admin/records window
+const RECORDS = new Map();  // index -> record, filled a window at a time
+
+async function fetchWindow(start){
+  const r = await fetch(`/api/admin/records?start=${start}&count=${PAGE}`);
+  const d = await r.json();
+  TOTAL = d.total;
+  for (const rec of d.records) RECORDS.set(rec.index, rec);
+}
 
 async function loadSummary(){
   const r = await fetch("/api/admin/summary"); const d = await r.json();
@@ -30,8 +39,11 @@ function F(x){ // force a visible value in the textbox
 }
 
 async function loadRecord(index){
-  const r = await fetch(`/api/admin/record?index=${index}`);
-  const d = await r.json();
+  if (!RECORDS.has(index)) await fetchWindow(Math.floor(index / PAGE) * PAGE);
+  const d = RECORDS.get(index);
+  // Close to the end of this window: pull the next one in while the user reviews.
+  const next = (Math.floor(index / PAGE) + 1) * PAGE;
+  if (next - index <= 3 && next < TOTAL && !RECORDS.has(next)) fetchWindow(next);
 
   CUR_INDEX = d.index; TOTAL = d.total;
   q("rec-idx").textContent = CUR_INDEX + 1;
@@ -113,6 +125,7 @@ async function saveCurrent(){
     body:JSON.stringify(payload)
   });
   const d = await r.json();
+  RECORDS.delete(CUR_INDEX);  // refetched with the edit on next visit
   q("reviewed-count").textContent = d.reviewed_count;
   q("dirty-count").textContent = d.dirty_count;
   q("admin-status").textContent = "Saved.";
@@ -131,13 +144,34 @@ async function upsert(only_dirty){
   q("admin-status").textContent = `Upserting (${only_dirty?"dirty":"all"})… this may take a while.`;
   const r = await fetch(`/api/admin/upsert?only_dirty=${only_dirty?"true":"false"}`, {method:"POST", headers:{"X-Admin-Token":ADMIN_TOKEN}});
   const d = await r.json();
-  q("admin-status").textContent = `Upserted ${d.upserted} (errors ${d.errors}).`;
+  q("admin-status").textContent = `Re-embedded ${d.upserted}, metadata-only ${d.metadata_updated}, unchanged ${d.unchanged} (errors ${d.errors}) in ${d.seconds}s.`;
   await loadSummary();
 }
 
+async function findRecords(){
+  const params = new URLSearchParams({limit: "100"});
+  for (const [key, id] of [["city","f-city"],["county","f-county"],["zip_code","f-zip"],["category","f-category"],["reviewed","f-reviewed"],["dirty","f-dirty"]]) {
+    const v = q(id).value.trim();
+    if (v) params.set(key, v);
+  }
+  const r = await fetch(`/api/admin/query?${params}`);
+  const d = await r.json();
+  q("filter-status").textContent = `${d.total} match${d.total === 1 ? "" : "es"}${d.total > d.records.length ? ` (first ${d.records.length})` : ""}`;
+  const list = q("filter-results");
+  list.innerHTML = "";
+  for (const rec of d.records) {
+    const li = document.createElement("li");
+    li.style.cursor = "pointer";
+    li.textContent = `#${rec.index + 1} ${rec.resource_name || rec.id} — ${[rec.city, rec.county].filter(Boolean).join(", ")}${rec.reviewed ? " ✓" : ""}${rec.dirty ? " •" : ""}`;
+    li.addEventListener("click", ()=> loadRecord(rec.index));
+    list.appendChild(li);
+  }
+}
+
 document.getElementById("prev-btn").addEventListener("click", ()=> loadRecord(Math.max(0, CUR_INDEX-1)));
 document.getElementById("next-btn").addEventListener("click", ()=> loadRecord(Math.min(TOTAL-1, CUR_INDEX+1)));
 document.getElementById("jump-btn").addEventListener("click", ()=> loadRecord(Math.max(0, Math.min(TOTAL-1, Number(q("jump").value||0)-1))));
+document.getElementById("filter-btn").addEventListener("click", findRecords);
 document.getElementById("gen-text").addEventListener("click", ()=> { q("text").value = buildTextFromFields(); });
 document.getElementById("save").addEventListener("click", saveCurrent);
 document.getElementById("save-all").addEventListener("click", saveAll);
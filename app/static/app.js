@@ -129,10 +129,11 @@ function renderResourceCard(h){
   const mapHref=mapsHref(addr);
   const webHref=website&&website!=="Not provided"?website:null;
   const detailText=val(md.text,"—");
-  const summary = val(h.model_summary, "—");
+  const summary = h.model_summary===undefined ? "Summarizing…" : val(h.model_summary, "—");
+  const rid = h.id||md.resource_id||h.service_id||"";
 
   return `
-    <article class="result-card" data-id="${md.resource_id||''}">
+    <article class="result-card" data-id="${md.resource_id||''}" data-rid="${rid}">
       <div class="card-inner">
         <div class="card-head">
           <div>
@@ -213,6 +214,40 @@ function renderGroupedResults(grouped){
   updateResourceIndex();
 }
 
+function applySummaries(summaries){
+  document.querySelectorAll(".result-card[data-rid]").forEach(card=>{
+    const rid = card.getAttribute("data-rid");
+    if(!rid || !(rid in (summaries||{}))) return;
+    const el = card.querySelector(".card-summary");
+    if(el) el.textContent = val(summaries[rid], "—");
+  });
+}
+
+/* ==========================
+   Streaming (server-sent events over fetch)
+   ========================== */
+async function readEventStream(res, onEvent){
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while(true){
+    const {value, done} = await reader.read();
+    if(done) break;
+    buffer += decoder.decode(value, {stream:true});
+    let sep;
+    while((sep = buffer.indexOf("\n\n")) >= 0){
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = "message", data = "";
+      raw.split("\n").forEach(line=>{
+        if(line.startsWith("event:")) event = line.slice(6).trim();
+        else if(line.startsWith("data:")) data += line.slice(5).trim();
+      });
+      if(data) onEvent(event, JSON.parse(data));
+    }
+  }
+}
+
 /* ==========================
    App logic
    ========================== */
@@ -236,22 +271,45 @@ async function onSubmit(e){
   if(overlay) overlay.hidden=false;
   renderSkeleton(3);
 
+  let total = 0;
+  let planText = "";
+  let planFrame = null;
+  const hideOverlay = ()=>{ if(overlay) overlay.hidden=true; };
+
   try{
-    const res=await fetch("/ask",{method:"POST",headers:{"content-type":"application/json"},body:JSON.stringify(payload)});
-    if(!res.ok){ status.textContent=`Error ${res.status}`; renderEmpty(); showToast("Request failed."); return; }
-    const data=await res.json();
-    const grouped=data.grouped_results||{};
-    const total=Object.values(grouped).reduce((acc,arr)=>acc + (Array.isArray(arr)?arr.length:0),0);
-    if(!total){
-      renderEmpty();
-    }else{
-      renderGroupedResults(grouped);
-      const needCount = Object.keys(grouped).length;
-      q("results-count").textContent = `${total} resources across ${needCount} need${needCount===1?"":"s"}`;
-      q("empty-state").hidden=true;
-    }
-    renderActionPlan(data.action_plan||"");
-    status.textContent=`Done. ${total} resource(s).`;
+    const res=await fetch("/ask/stream",{method:"POST",headers:{"content-type":"application/json"},body:JSON.stringify(payload)});
+    if(!res.ok || !res.body){ status.textContent=`Error ${res.status}`; renderEmpty(); showToast("Request failed."); return; }
+    await readEventStream(res, (event, data)=>{
+      if(event==="needs"){
+        const count = Array.isArray(data.needs) ? data.needs.length : 0;
+        status.textContent = count ? `Found ${count} need${count===1?"":"s"}; searching…` : "Searching…";
+      }else if(event==="cards"){
+        hideOverlay();
+        const grouped=data.grouped_results||{};
+        total=Object.values(grouped).reduce((acc,arr)=>acc + (Array.isArray(arr)?arr.length:0),0);
+        if(!total){
+          renderEmpty();
+        }else{
+          renderGroupedResults(grouped);
+          const needCount = Object.keys(grouped).length;
+          q("results-count").textContent = `${total} resources across ${needCount} need${needCount===1?"":"s"}`;
+          q("empty-state").hidden=true;
+          status.textContent="Summarizing…";
+        }
+      }else if(event==="summaries"){
+        applySummaries(data);
+      }else if(event==="plan_delta"){
+        planText += data.text || "";
+        status.textContent="Writing action plan…";
+        if(planFrame===null){
+          planFrame = requestAnimationFrame(()=>{ planFrame=null; renderActionPlan(planText); });
+        }
+      }else if(event==="done"){
+        if(planFrame!==null){ cancelAnimationFrame(planFrame); planFrame=null; }
+        renderActionPlan(data.action_plan||planText);
+        status.textContent=`Done. ${total} resource(s).`;
+      }
+    });
   }catch(err){
     console.error(err);
     status.textContent="Error";
@@ -259,7 +317,7 @@ async function onSubmit(e){
   }finally{
     q("mini-indicator").hidden=true;
     btn.disabled=false;
-    if(overlay) overlay.hidden=true;
+    hideOverlay();
   }
 }
 
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .cache import LRUCache, SQLiteStore
+from .config import (
+    CACHE_DB_PATH, GEN_MODEL, SUMMARY_CACHE_DISK_ITEMS, SUMMARY_CACHE_MEMORY_ITEMS
+)
+from .embed_cache import normalize_text
+
+# (resource_id, content_hash, need)
+SummaryKey = Tuple[str, str, str]
+# (need slug, need query) a card is summarized for
+NeedRef = Tuple[str, str]
+
+
+def content_hash(item: Dict) -> str:
+    """Hash of exactly what the summary prompt sees for one resource."""
+    raw = json.dumps(item, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def need_key(need: Optional[str], user_query: str) -> str:
+    """A need slug when the summary is written for one need, else the normalized query."""
+    return (need or "").strip() or normalize_text(user_query).lower()
+
+
+class SummaryCache:
+    """
+    Card summaries keyed by (resource_id, content hash, need, GEN_MODEL), in an
+    in-process LRU backed by a SQLite table. Rows are tagged with the resource
+    id so an admin edit can drop every summary of that resource at once.
+    """
+
+    def __init__(self, model: str, memory: LRUCache, store: Optional[SQLiteStore] = None):
+        self.model = model
+        self.memory = memory
+        self.store = store
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, entry: SummaryKey) -> str:
+        rid, chash, need = entry
+        raw = f"{self.model}\x00{rid}\x00{chash}\x00{need}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def get_many(self, entries: Sequence[SummaryKey]) -> List[Optional[str]]:
+        keys = [self.key(e) for e in entries]
+        out: List[Optional[str]] = [self.memory.get(k) for k in keys]
+        missing = [k for k, v in zip(keys, out) if v is None]
+        found = self.store.get_many(missing) if (self.store and missing) else {}
+        for pos, (entry, k) in enumerate(zip(entries, keys)):
+            if out[pos] is None and k in found:
+                out[pos] = found[k].decode("utf-8")
+                self.memory.set(k, out[pos])
+        with self._lock:
+            hits = sum(1 for v in out if v is not None)
+            self.hits += hits
+            self.misses += len(out) - hits
+        return out
+
+    def put_many(self, entries: Sequence[SummaryKey], summaries: Sequence[str]) -> None:
+        rows = []
+        for entry, summary in zip(entries, summaries):
+            k = self.key(entry)
+            self.memory.set(k, summary)
+            rows.append((k, summary.encode("utf-8"), entry[0]))
+        if self.store and rows:
+            self.store.put_many(rows)
+
+    def invalidate_resource(self, resource_id: str) -> None:
+        # Memory keys are hashed, so drop the whole (small) LRU; admin edits are rare.
+        self.memory.clear()
+        if self.store:
+            self.store.delete_tag(str(resource_id))
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_size": len(self.memory),
+                "memory_max_items": self.memory.max_items,
+                "disk_max_items": self.store.max_entries if self.store else 0,
+            }
+
+
+summary_cache = SummaryCache(
+    GEN_MODEL,
+    LRUCache(SUMMARY_CACHE_MEMORY_ITEMS),
+    SQLiteStore(CACHE_DB_PATH, "card_summaries", SUMMARY_CACHE_DISK_ITEMS),
+)
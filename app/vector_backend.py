@@ -0,0 +1,426 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Any, Callable, Collection, Dict, List, Optional, Sequence
+
+import numpy as np
+import orjson
+
+from .bitmap_index import BitmapIndex, bitset_rows
+from .cache import LRUCache
+from .config import NAMESPACE
+from .metrics import record_pinecone_usage
+from .result_cache import canonical_filter
+
+log = logging.getLogger(__name__)
+
+Hit = Dict[str, Any]
+
+_MISSING = object()
+_DTYPES = {"float32": np.float32, "float16": np.float16}
+# float16 rows are upcast this many at a time, so scoring never holds a full float32 copy.
+_SCORE_BLOCK = 8192
+
+
+class VectorBackend:
+    """
+    What the retriever needs from a vector index. `query` returns hits shaped
+    like {"id", "score", "metadata"}, best first; `metadata_filter` uses the
+    Pinecone filter syntax that `build_filter` emits.
+    """
+
+    name = "base"
+
+    def query(
+        self,
+        vector: Sequence[float],
+        top_k: int,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None,
+    ) -> List[Hit]:
+        raise NotImplementedError
+
+    async def query_async(
+        self,
+        vector: Sequence[float],
+        top_k: int,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None,
+    ) -> List[Hit]:
+        return self.query(vector, top_k, metadata_filter, namespace)
+
+    def upsert(self, vectors: Sequence[Dict[str, Any]], namespace: Optional[str] = None) -> None:
+        """`vectors` are {"id", "values", "metadata"} dicts, as for Pinecone's upsert."""
+        raise NotImplementedError
+
+    def update_metadata(self, rid: str, metadata: Dict[str, Any], namespace: Optional[str] = None) -> bool:
+        """
+        Apply a metadata edit without re-embedding and return True if search
+        results may have changed. Backends that hold metadata remotely ignore it.
+        """
+        return False
+
+    def set_metadata(self, rid: str, metadata: Dict[str, Any], namespace: Optional[str] = None) -> None:
+        """Write a record's metadata as part of an upsert run, keeping its vector."""
+        self.update_metadata(rid, metadata, namespace)
+
+    def flush(self) -> None:
+        """Persist pending upserts, for backends that keep their own files."""
+
+
+class PineconeBackend(VectorBackend):
+    """
+    The hosted Pinecone index. Index handles are resolved through callables on
+    every call so the retriever can open them lazily (and tests can swap them).
+    """
+
+    name = "pinecone"
+
+    def __init__(self, index_fn: Callable[[], Any], async_index_fn: Callable[[], Any]):
+        self._index_fn = index_fn
+        self._async_index_fn = async_index_fn
+
+    def query(self, vector, top_k, metadata_filter=None, namespace=None) -> List[Hit]:
+        res = self._index_fn().query(
+            namespace=namespace or NAMESPACE,
+            vector=list(vector),
+            top_k=top_k,
+            filter=metadata_filter or {},
+            include_values=False,
+            include_metadata=True,
+        )
+        record_pinecone_usage("query", res)
+        return _pinecone_hits(res)
+
+    async def query_async(self, vector, top_k, metadata_filter=None, namespace=None) -> List[Hit]:
+        res = await self._async_index_fn().query(
+            namespace=namespace or NAMESPACE,
+            vector=list(vector),
+            top_k=top_k,
+            filter=metadata_filter or {},
+            include_values=False,
+            include_metadata=True,
+        )
+        record_pinecone_usage("query", res)
+        return _pinecone_hits(res)
+
+    def upsert(self, vectors, namespace=None) -> None:
+        self._index_fn().upsert(vectors=list(vectors), namespace=namespace or NAMESPACE)
+
+    def set_metadata(self, rid, metadata, namespace=None) -> None:
+        # Pinecone merges set_metadata into the stored fields; keys dropped locally stay until re-embedded.
+        self._index_fn().update(id=str(rid), set_metadata=dict(metadata), namespace=namespace or NAMESPACE)
+
+
+def _pinecone_hits(res: Any) -> List[Hit]:
+    matches = getattr(res, "matches", []) or []
+    return [{"id": m.id, "score": m.score, "metadata": m.metadata} for m in matches]
+
+
+class _Shard:
+    """
+    One namespace: a contiguous matrix of unit-length rows plus ids, metadata
+    and a bitmap index over the filterable metadata fields.
+
+    The first `count` rows are live. The row buffer, id list, metadata list
+    and positions are shared with the shard that replaces this one on upsert,
+    which appends past `count`, so a snapshot held by a running query never
+    sees rows added after it was taken.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        buffer: np.ndarray,
+        metadata: List[Dict[str, Any]],
+        bitmap: Optional[BitmapIndex] = None,
+        positions: Optional[Dict[str, int]] = None,
+        count: Optional[int] = None,
+    ):
+        self.ids = ids
+        self.count = len(ids) if count is None else count
+        self.buffer = buffer
+        self.matrix = buffer[:self.count]
+        self.metadata = metadata
+        self.positions = positions if positions is not None else {rid: pos for pos, rid in enumerate(ids)}
+        self.bitmap = bitmap if bitmap is not None else BitmapIndex.build(metadata)
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        if self.matrix.dtype == np.float32:
+            return self.matrix @ query
+        out = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, _SCORE_BLOCK):
+            block = self.matrix[start:start + _SCORE_BLOCK].astype(np.float32)
+            out[start:start + len(block)] = block @ query
+        return out
+
+    def scores_at(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return self.matrix[rows].astype(np.float32, copy=False) @ query
+
+
+class LocalBackend(VectorBackend):
+    """
+    In-process exact cosine search: one matrix-vector product per query and
+    `argpartition` for the top_k. Rows are stored normalized as float32 or
+    float16. Filters on the `build_filter` fields are resolved through the
+    shard's bitmap index so only matching rows are scored; other filters
+    fall back to a metadata scan whose mask is cached until the next upsert.
+    """
+
+    name = "local"
+
+    def __init__(self, dtype: str = "float32", path: Optional[str] = None):
+        if dtype not in _DTYPES:
+            raise ValueError(f"Unsupported local index dtype: {dtype!r}")
+        self.dtype = dtype
+        self.path = path
+        self._shards: Dict[str, _Shard] = {}
+        self._masks = LRUCache(256)
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return sum(shard.count for shard in self._shards.values())
+
+    def ids(self, namespace: Optional[str] = None) -> Collection[str]:
+        shard = self._shards.get(namespace or NAMESPACE)
+        return shard.positions.keys() if shard else ()
+
+    def query(self, vector, top_k, metadata_filter=None, namespace=None) -> List[Hit]:
+        ns = namespace or NAMESPACE
+        shard = self._shards.get(ns)
+        if shard is None or not shard.count or top_k <= 0:
+            return []
+        q = _unit_rows(np.asarray(vector, dtype=np.float32)[None, :])[0]
+        if q.shape[0] != shard.matrix.shape[1]:
+            raise ValueError(
+                f"Query dimension {q.shape[0]} does not match index dimension {shard.matrix.shape[1]}"
+            )
+
+        bits = shard.bitmap.evaluate(metadata_filter) if metadata_filter else None
+        if bits is not None:
+            # Only the rows that pass the filter are scored.
+            rows = bitset_rows(bits)
+            if not len(rows):
+                return []
+            scores = shard.scores_at(rows, q)
+        else:
+            rows = None
+            scores = shard.scores(q)
+            if metadata_filter:
+                mask = self._mask(ns, shard, metadata_filter)
+                if not mask.any():
+                    return []
+                rows = np.flatnonzero(mask)
+                scores = scores[rows]
+
+        k = min(int(top_k), len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        positions = top if rows is None else rows[top]
+        return [
+            {"id": shard.ids[pos], "score": float(score), "metadata": dict(shard.metadata[pos])}
+            for pos, score in zip(positions, scores[top])
+        ]
+
+    def upsert(self, vectors, namespace=None) -> None:
+        ns = namespace or NAMESPACE
+        vectors = list(vectors)
+        if not vectors:
+            return
+        rows = _unit_rows(np.asarray([vec["values"] for vec in vectors], dtype=np.float32))
+        with self._lock:
+            shard = self._shards.get(ns)
+            if shard is not None and rows.shape[1] != shard.buffer.shape[1]:
+                raise ValueError(
+                    f"Vector dimension {rows.shape[1]} does not match index dimension {shard.buffer.shape[1]}"
+                )
+            ids = shard.ids if shard else []
+            metadata = shard.metadata if shard else []
+            positions = shard.positions if shard else {}
+            count = shard.count if shard else 0
+            bitmap = shard.bitmap.copy() if shard else BitmapIndex()
+            # Rows past `count` are invisible to the current shard, so new ids append in place;
+            # the buffer is reallocated (doubling) only when it runs out of spare rows.
+            added = len({str(vec["id"]) for vec in vectors} - positions.keys())
+            buffer = _reserve(shard.buffer if shard else None, count + added, rows.shape[1], _DTYPES[self.dtype])
+            for vec, row in zip(vectors, rows):
+                rid = str(vec["id"])
+                md = dict(vec.get("metadata") or {})
+                pos = positions.get(rid)
+                if pos is None:
+                    pos = positions[rid] = count
+                    ids.append(rid)
+                    metadata.append(md)
+                    count += 1
+                    bitmap.set_row(pos, md)
+                else:
+                    # An in-place replacement may be seen by a query already scoring this shard.
+                    bitmap.set_row(pos, md, previous=metadata[pos])
+                    metadata[pos] = md
+                buffer[pos] = row
+            self._shards[ns] = _Shard(ids, buffer, metadata, bitmap, positions, count)
+            self._masks.clear()
+            self._dirty = True
+
+    def update_metadata(self, rid, metadata, namespace=None) -> bool:
+        ns = namespace or NAMESPACE
+        with self._lock:
+            shard = self._shards.get(ns)
+            pos = shard.positions.get(str(rid)) if shard else None
+            if pos is None:
+                return False
+            md = dict(metadata or {})
+            bitmap = shard.bitmap.copy()
+            bitmap.set_row(pos, md, previous=shard.metadata[pos])
+            shard.metadata[pos] = md
+            self._shards[ns] = _Shard(shard.ids, shard.buffer, shard.metadata, bitmap, shard.positions, shard.count)
+            self._masks.clear()
+            self._dirty = True
+        return True
+
+    def flush(self) -> None:
+        if self._dirty and self.path:
+            self.save(self.path)
+
+    def save(self, path: str) -> None:
+        """Write one `<namespace>/vectors.npy` + `records.jsonl` pair per namespace."""
+        with self._lock:
+            for ns, shard in self._shards.items():
+                folder = os.path.join(path, ns)
+                os.makedirs(folder, exist_ok=True)
+                _atomic_write(os.path.join(folder, "vectors.npy"), lambda f: np.save(f, shard.matrix))
+                _atomic_write(
+                    os.path.join(folder, "records.jsonl"),
+                    lambda f: f.writelines(
+                        orjson.dumps({"id": rid, "metadata": md}) + b"\n"
+                        for rid, md in zip(shard.ids[:shard.count], shard.metadata)
+                    ),
+                )
+            self._dirty = False
+        log.info("Saved %d vectors to %s", len(self), path)
+
+    @classmethod
+    def load(cls, path: str, dtype: str = "float32") -> "LocalBackend":
+        backend = cls(dtype=dtype, path=path)
+        if not os.path.isdir(path):
+            log.info("No local index at %s; starting empty.", path)
+            return backend
+        for ns in sorted(os.listdir(path)):
+            folder = os.path.join(path, ns)
+            vectors_path = os.path.join(folder, "vectors.npy")
+            records_path = os.path.join(folder, "records.jsonl")
+            if not (os.path.isfile(vectors_path) and os.path.isfile(records_path)):
+                continue
+            matrix = np.load(vectors_path).astype(_DTYPES[dtype], copy=False)
+            with open(records_path, "rb") as f:
+                records = [orjson.loads(line) for line in f if line.strip()]
+            if len(records) != len(matrix):
+                raise ValueError(f"{folder}: {len(records)} records but {len(matrix)} vectors")
+            backend._shards[ns] = _Shard(
+                [str(r["id"]) for r in records],
+                np.ascontiguousarray(matrix),
+                [r.get("metadata") or {} for r in records],
+            )
+        log.info("Loaded %d vectors (%s) from %s", len(backend), dtype, path)
+        return backend
+
+    def _mask(self, ns: str, shard: _Shard, metadata_filter: Dict[str, Any]) -> np.ndarray:
+        key = (ns, canonical_filter(metadata_filter))
+        mask = self._masks.get(key)
+        if mask is None or len(mask) != shard.count:
+            mask = np.fromiter(
+                (match_filter(md, metadata_filter) for md in shard.metadata[:shard.count]),
+                dtype=bool,
+                count=shard.count,
+            )
+            self._masks.set(key, mask)
+        return mask
+
+
+def match_filter(metadata: Dict[str, Any], metadata_filter: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate a Pinecone-style metadata filter against one record. Top-level
+    fields are ANDed; a bare value means $eq; for list-valued fields $eq/$in
+    match when any element matches.
+    """
+    for key, cond in (metadata_filter or {}).items():
+        if key == "$and":
+            if not all(match_filter(metadata, sub) for sub in cond):
+                return False
+        elif key == "$or":
+            if not any(match_filter(metadata, sub) for sub in cond):
+                return False
+        elif not _match_field(metadata.get(key, _MISSING), cond):
+            return False
+    return True
+
+
+def _match_field(value: Any, cond: Any) -> bool:
+    if not isinstance(cond, dict):
+        cond = {"$eq": cond}
+    for op, arg in cond.items():
+        if op == "$eq":
+            ok = _has(value, arg)
+        elif op == "$ne":
+            ok = value is not _MISSING and not _has(value, arg)
+        elif op == "$in":
+            ok = any(_has(value, a) for a in arg)
+        elif op == "$nin":
+            ok = value is not _MISSING and not any(_has(value, a) for a in arg)
+        elif op == "$exists":
+            ok = (value is not _MISSING) == bool(arg)
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            ok = _compare(value, op, arg)
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if not ok:
+            return False
+    return True
+
+
+def _has(value: Any, arg: Any) -> bool:
+    if value is _MISSING:
+        return False
+    if isinstance(value, list):
+        return arg in value
+    return value == arg
+
+
+def _compare(value: Any, op: str, arg: Any) -> bool:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    if op == "$gt":
+        return value > arg
+    if op == "$gte":
+        return value >= arg
+    if op == "$lt":
+        return value < arg
+    return value <= arg
+
+
+def _unit_rows(rows: np.ndarray) -> np.ndarray:
+    rows = np.asarray(rows, dtype=np.float32)
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return rows / norms
+
+
+def _reserve(buffer: Optional[np.ndarray], rows: int, dim: int, dtype: Any) -> np.ndarray:
+    """`buffer` if it has room for `rows` rows, else a copy with at least double the capacity."""
+    if buffer is not None and buffer.shape[0] >= rows:
+        return buffer
+    capacity = rows if buffer is None else max(rows, 2 * buffer.shape[0])
+    grown = np.empty((capacity, dim), dtype=dtype)
+    if buffer is not None:
+        grown[:buffer.shape[0]] = buffer
+    return grown
+
+
+def _atomic_write(path: str, write: Callable[[Any], None]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
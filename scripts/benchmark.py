@@ -0,0 +1,489 @@
+"""
+Offline /ask benchmark.
+
+Runs the FastAPI app in process against local stand-ins for OpenAI
+(embeddings and responses, including streaming) and Pinecone. Latency,
+jitter and error rates are configurable per upstream. Requests are sent
+through httpx's ASGI transport at a fixed concurrency. The script reports
+p50/p95/p99 latency, requests/s, the per-stage breakdown from the response
+`timings`, fallbacks and upstream calls, and writes everything to JSON so
+a pipeline change can be compared with a saved baseline:
+
+    python -m scripts.benchmark --requests 200 --concurrency 16 --out baseline.json
+    python -m scripts.benchmark --requests 200 --concurrency 16 --baseline baseline.json
+
+Caches are off unless --warm-cache is given, so every request goes through
+the whole pipeline. The SQLite cache file lives in a temp dir either way.
+The stand-ins ignore metadata filters. Needs httpx (as FastAPI's TestClient does).
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence
+
+STORIES = [
+    "I lost my job last month and we are running out of food for the kids.",
+    "My landlord says I will be evicted if I cannot pay rent by Friday.",
+    "I need a doctor who speaks Spanish and does not charge much.",
+    "Looking for childcare so I can go back to work.",
+    "Our power is about to be shut off and I need help with the utility bill.",
+    "I am a veteran looking for housing and a job.",
+    "My mother needs rides to her medical appointments.",
+    "We just moved here and need help finding food and a clinic.",
+]
+
+# keyword in the story -> (slug, query) the fake needs model returns
+NEED_KEYWORDS = {
+    "food": ("food-assistance", "food pantry or meal program"),
+    "rent": ("rent-assistance", "emergency rent assistance"),
+    "evicted": ("eviction-help", "eviction prevention legal aid"),
+    "doctor": ("medical-care", "low cost medical clinic"),
+    "clinic": ("medical-care", "low cost medical clinic"),
+    "medical": ("medical-transport", "rides to medical appointments"),
+    "childcare": ("childcare", "affordable childcare"),
+    "job": ("employment", "job search help"),
+    "utility": ("utility-bill-help", "utility bill assistance"),
+    "housing": ("housing", "veteran housing assistance"),
+}
+
+CATEGORIES = ["Food", "Housing", "Health", "Employment", "Childcare", "Utilities", "Legal", "Transportation"]
+CITIES = [("Waterloo", "50701"), ("Cedar Falls", "50613"), ("Evansdale", "50707")]
+
+
+class FakeUpstreamError(RuntimeError):
+    pass
+
+
+class Upstream:
+    """Latency, jitter and error injection for one stand-in upstream, with call counts."""
+
+    def __init__(self, name: str, latency_ms: float, jitter_ms: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+    def _draw(self) -> float:
+        self.calls += 1
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            raise FakeUpstreamError(f"injected {self.name} error")
+        return max(0.0, self.rng.gauss(self.latency_ms, self.jitter_ms)) / 1000
+
+    def wait(self) -> None:
+        time.sleep(self._draw())
+
+    async def wait_async(self) -> None:
+        await asyncio.sleep(self._draw())
+
+    def stats(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "errors": self.errors}
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _fake_vector(text: str, dim: int = 16) -> List[float]:
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [(b - 127.5) / 127.5 for b in digest[:dim]]
+
+
+def _input_text(messages: Any) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(m.get("content", "")) for m in messages or [])
+
+
+def _fake_output(kwargs: Dict[str, Any]) -> str:
+    """What the model would answer for a needs, card summary or action plan request."""
+    text = _input_text(kwargs.get("input"))
+    schema_name = ((kwargs.get("text") or {}).get("format") or {}).get("name")
+    if schema_name == "needs_response":
+        story = text.split("User story:", 1)[-1].lower()
+        needs = []
+        for word, (slug, query) in NEED_KEYWORDS.items():
+            if word in story and all(n["slug"] != slug for n in needs):
+                needs.append({"slug": slug, "query": query})
+        return json.dumps({"needs": needs[:3], "confidence": 0.8 if needs else 0.0})
+    if schema_name == "card_summaries":
+        line = text.split("Items JSON:\n", 1)[-1].split("\n", 1)[0]
+        items = json.loads(line)
+        return json.dumps({"cards": [
+            {"id": it["id"], "summary": f"{it.get('name') or 'This resource'} can help with this request."}
+            for it in items
+        ]})
+    return (
+        "Start by calling the first resource listed for your most urgent need; "
+        "bring an ID and proof of address. Then contact the others in order."
+    )
+
+
+def _response(kwargs: Dict[str, Any]) -> SimpleNamespace:
+    output = _fake_output(kwargs)
+    usage = SimpleNamespace(input_tokens=_tokens(_input_text(kwargs.get("input"))), output_tokens=_tokens(output))
+    return SimpleNamespace(output_text=output, usage=usage)
+
+
+def _stream_events(response: SimpleNamespace) -> List[SimpleNamespace]:
+    words = response.output_text.split(" ")
+    events = [
+        SimpleNamespace(type="response.output_text.delta", delta=w if i == 0 else " " + w)
+        for i, w in enumerate(words)
+    ]
+    events.append(SimpleNamespace(type="response.completed", response=response))
+    return events
+
+
+def _embedding_response(inputs: Any) -> SimpleNamespace:
+    texts = [inputs] if isinstance(inputs, str) else list(inputs)
+    data = [SimpleNamespace(index=i, embedding=_fake_vector(t)) for i, t in enumerate(texts)]
+    return SimpleNamespace(data=data, usage=SimpleNamespace(prompt_tokens=sum(_tokens(t) for t in texts)))
+
+
+class FakeOpenAI:
+    """Sync stand-in for the OpenAI client: `embeddings.create` and `responses.create`."""
+
+    def __init__(self, embeddings: Upstream, responses: Upstream):
+        self._embed_upstream = embeddings
+        self._responses_upstream = responses
+        self.embeddings = SimpleNamespace(create=self._embed)
+        self.responses = SimpleNamespace(create=self._respond)
+
+    def _embed(self, model: str, input: Any, **_: Any) -> SimpleNamespace:
+        self._embed_upstream.wait()
+        return _embedding_response(input)
+
+    def _respond(self, stream: bool = False, **kwargs: Any) -> Any:
+        self._responses_upstream.wait()
+        response = _response(kwargs)
+        return iter(_stream_events(response)) if stream else response
+
+
+class FakeAsyncOpenAI(FakeOpenAI):
+    """Async stand-in; a stream yields one delta per word after the response latency."""
+
+    async def _embed(self, model: str, input: Any, **_: Any) -> SimpleNamespace:
+        await self._embed_upstream.wait_async()
+        return _embedding_response(input)
+
+    async def _respond(self, stream: bool = False, **kwargs: Any) -> Any:
+        await self._responses_upstream.wait_async()
+        response = _response(kwargs)
+        if not stream:
+            return response
+        return self._stream(_stream_events(response))
+
+    async def _stream(self, events: List[SimpleNamespace]):
+        for event in events:
+            # Token pacing: a small fraction of a full response's latency per delta.
+            await asyncio.sleep(self._responses_upstream.latency_ms / 1000 / 50)
+            yield event
+
+
+class FakeIndex:
+    """Stand-in Pinecone index over a synthetic corpus. Results depend only on the query vector."""
+
+    def __init__(self, upstream: Upstream, corpus: int = 500, seed: int = 0):
+        self.upstream = upstream
+        rng = random.Random(seed)
+        self.records = []
+        for i in range(corpus):
+            city, zip_code = rng.choice(CITIES)
+            cats = rng.sample(CATEGORIES, 2)
+            rid = f"svc-{i:05d}"
+            self.records.append((rid, {
+                "service_id": rid,
+                "resource_name": f"{cats[0]} Program {i}",
+                "organization_name": f"Community Org {i % 97}",
+                "city": city,
+                "zip_code": zip_code,
+                "categories": cats,
+                "languages": ["English"] + (["Spanish"] if i % 3 == 0 else []),
+                "fees": "Free" if i % 2 == 0 else "Sliding scale",
+                "text": f"{cats[0]} and {cats[1].lower()} services for residents of {city}.",
+            }))
+
+    def _result(self, vector: Sequence[float], top_k: int) -> SimpleNamespace:
+        rng = random.Random(hashlib.sha256(repr(list(vector)[:8]).encode()).digest())
+        picks = rng.sample(self.records, min(top_k, len(self.records)))
+        scores = sorted((rng.uniform(0.3, 0.9) for _ in picks), reverse=True)
+        matches = [SimpleNamespace(id=rid, score=s, metadata=dict(md)) for (rid, md), s in zip(picks, scores)]
+        return SimpleNamespace(matches=matches, usage=SimpleNamespace(read_units=max(1, top_k // 10)))
+
+    def query(self, vector: Sequence[float], top_k: int, **_: Any) -> SimpleNamespace:
+        self.upstream.wait()
+        return self._result(vector, top_k)
+
+
+class FakeAsyncIndex(FakeIndex):
+    async def query(self, vector: Sequence[float], top_k: int, **_: Any) -> SimpleNamespace:
+        await self.upstream.wait_async()
+        return self._result(vector, top_k)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile, q in [0, 100]."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+def distribution(values: Sequence[float]) -> Dict[str, float]:
+    return {
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+        "max": round(max(values), 2) if values else 0.0,
+    }
+
+
+def _done_timings(body: str) -> Dict[str, Any]:
+    """Stage timings from the `done` event of an /ask/stream body."""
+    for chunk in body.split("\n\n"):
+        lines = chunk.strip().split("\n")
+        if len(lines) == 2 and lines[0] == "event: done":
+            return json.loads(lines[1][len("data: "):]).get("timings") or {}
+    return {}
+
+
+async def _send(client, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        if endpoint == "/ask/stream":
+            async with client.stream("POST", endpoint, json=payload) as resp:
+                body = "".join([chunk async for chunk in resp.aiter_text()])
+            timings = _done_timings(body) if resp.status_code == 200 else {}
+        else:
+            resp = await client.post(endpoint, json=payload)
+            timings = (resp.json().get("timings") or {}) if resp.status_code == 200 else {}
+        status = resp.status_code
+    except Exception as exc:
+        status, timings = f"error: {type(exc).__name__}", {}
+    return {"ms": (time.perf_counter() - started) * 1000, "status": status, "timings": timings}
+
+
+async def drive(app, endpoint: str, payloads: Sequence[Dict[str, Any]], concurrency: int) -> List[Dict[str, Any]]:
+    """Send `payloads` to `endpoint` with at most `concurrency` requests in flight."""
+    import httpx
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+    samples: List[Dict[str, Any]] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120) as client:
+
+        async def worker():
+            while not queue.empty():
+                samples.append(await _send(client, endpoint, queue.get_nowait()))
+
+        await asyncio.gather(*[worker() for _ in range(max(1, concurrency))])
+    return samples
+
+
+def _fallback_counts() -> Dict[str, float]:
+    from app.metrics import FALLBACKS
+    return {key[0]: value for _, key, _, value in FALLBACKS.samples()}
+
+
+async def run(
+    *,
+    requests: int = 50,
+    concurrency: int = 8,
+    endpoint: str = "/ask",
+    warmup: int = 0,
+    openai: Upstream,
+    llm: Upstream,
+    pinecone: Upstream,
+    corpus: int = 500,
+    use_lifespan: bool = True,
+) -> Dict[str, Any]:
+    """Swap the stand-ins into the shared clients, drive the app, restore the clients and report."""
+    from app import main, retriever
+    from app.clients import async_openai_client, openai_client, pinecone_async_index, pinecone_index
+    from app.vector_backend import PineconeBackend
+
+    sync_index, async_index = FakeIndex(pinecone, corpus), FakeAsyncIndex(pinecone, corpus)
+    swaps = [
+        (openai_client, FakeOpenAI(openai, llm)),
+        (async_openai_client, FakeAsyncOpenAI(openai, llm)),
+        (pinecone_index, sync_index),
+        (pinecone_async_index, async_index),
+        # Whatever VECTOR_BACKEND says, /ask searches the stand-in index.
+        (retriever.backend, PineconeBackend(lambda: sync_index, lambda: async_index)),
+    ]
+    previous = [(lazy, lazy.replace_client(fake)) for lazy, fake in swaps]
+    payloads = [{"query": STORIES[i % len(STORIES)]} for i in range(warmup + requests)]
+    try:
+        if use_lifespan:
+            async with main.app.router.lifespan_context(main.app):
+                return await _measure(main.app, endpoint, payloads, warmup, concurrency, (openai, llm, pinecone))
+        return await _measure(main.app, endpoint, payloads, warmup, concurrency, (openai, llm, pinecone))
+    finally:
+        for lazy, client in previous:
+            lazy.replace_client(client)
+
+
+async def _measure(app, endpoint, payloads, warmup, concurrency, upstreams) -> Dict[str, Any]:
+    if warmup:
+        await drive(app, endpoint, payloads[:warmup], concurrency)
+    fallbacks_before = _fallback_counts()
+    calls_before = {u.name: u.stats() for u in upstreams}
+
+    started = time.perf_counter()
+    samples = await drive(app, endpoint, payloads[warmup:], concurrency)
+    elapsed = time.perf_counter() - started
+
+    ok = [s for s in samples if s["status"] == 200]
+    stages: Dict[str, List[float]] = {}
+    for s in ok:
+        for name, t in s["timings"].items():
+            stages.setdefault(name, []).append(t["duration_ms"])
+    fallbacks = {
+        step: int(count - fallbacks_before.get(step, 0.0))
+        for step, count in _fallback_counts().items()
+        if count - fallbacks_before.get(step, 0.0)
+    }
+    return {
+        "requests": len(samples),
+        "ok": len(ok),
+        "failed": len(samples) - len(ok),
+        "duration_s": round(elapsed, 3),
+        "requests_per_s": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": distribution([s["ms"] for s in ok]),
+        "stages_ms": {name: distribution(values) for name, values in sorted(stages.items())},
+        "fallbacks": fallbacks,
+        "upstream_calls": {
+            u.name: {k: v - calls_before[u.name][k] for k, v in u.stats().items()} for u in upstreams
+        },
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Percent change against a baseline result: negative latency and positive throughput are better."""
+
+    def change(new, old):
+        return round((new - old) / old * 100, 1) if old else None
+
+    out = {
+        "requests_per_s": change(result["requests_per_s"], baseline["result"]["requests_per_s"]),
+        "latency_ms": {
+            k: change(result["latency_ms"][k], baseline["result"]["latency_ms"][k]) for k in ("p50", "p95", "p99")
+        },
+        "stages_p50_ms": {},
+    }
+    for name, dist in result["stages_ms"].items():
+        old = baseline["result"]["stages_ms"].get(name)
+        if old:
+            out["stages_p50_ms"][name] = change(dist["p50"], old["p50"])
+    return out
+
+
+def configure_env(warm_cache: bool) -> None:
+    """Settings the app reads at import: stand-ins need no keys, caches go to a temp dir."""
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("PINECONE_API_KEY", "benchmark")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["CACHE_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="rag-bench-"), "cache.sqlite3")
+    if not warm_cache:
+        for name in (
+            "EMBED_CACHE_MEMORY_ITEMS", "EMBED_CACHE_DISK_ITEMS",
+            "SUMMARY_CACHE_MEMORY_ITEMS", "SUMMARY_CACHE_DISK_ITEMS",
+            "RETRIEVAL_CACHE_ITEMS", "NEEDS_CACHE_ITEMS",
+        ):
+            os.environ[name] = "0"
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /ask offline against stand-in OpenAI and Pinecone.")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--endpoint", default="/ask", choices=["/ask", "/ask/stream"])
+    parser.add_argument("--warmup", type=int, default=5, help="requests sent first and left out of the results")
+    parser.add_argument("--embed-ms", type=float, default=60, help="mean embeddings latency")
+    parser.add_argument("--llm-ms", type=float, default=800, help="mean responses latency (needs, summaries, plan)")
+    parser.add_argument("--pinecone-ms", type=float, default=40, help="mean query latency")
+    parser.add_argument("--jitter", type=float, default=0.25, help="latency std dev as a fraction of the mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls that fail")
+    parser.add_argument("--corpus", type=int, default=500, help="records in the stand-in index")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warm-cache", action="store_true", help="keep the app's caches on")
+    parser.add_argument("--out", default="benchmark.json")
+    parser.add_argument("--baseline", default=None, help="earlier --out file to compare against")
+    args = parser.parse_args()
+
+    configure_env(args.warm_cache)
+    upstreams = {
+        "openai_embeddings": Upstream("openai_embeddings", args.embed_ms, args.embed_ms * args.jitter, args.error_rate, args.seed),
+        "openai_responses": Upstream("openai_responses", args.llm_ms, args.llm_ms * args.jitter, args.error_rate, args.seed + 1),
+        "pinecone": Upstream("pinecone", args.pinecone_ms, args.pinecone_ms * args.jitter, args.error_rate, args.seed + 2),
+    }
+    print(f">>> [benchmark] {args.requests} x {args.endpoint} at concurrency {args.concurrency}...")
+    result = asyncio.run(run(
+        requests=args.requests,
+        concurrency=args.concurrency,
+        endpoint=args.endpoint,
+        warmup=args.warmup,
+        openai=upstreams["openai_embeddings"],
+        llm=upstreams["openai_responses"],
+        pinecone=upstreams["pinecone"],
+        corpus=args.corpus,
+    ))
+
+    report = {
+        "revision": _git_revision(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        "result": result,
+    }
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config", {}).get("endpoint") != args.endpoint:
+            print(f"!!! [benchmark] Baseline measured {baseline.get('config', {}).get('endpoint')}, not {args.endpoint}.")
+        report["vs_baseline"] = compare(result, baseline)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    lat = result["latency_ms"]
+    print(f">>> [benchmark] {result['ok']}/{result['requests']} ok in {result['duration_s']}s "
+          f"({result['requests_per_s']} req/s); p50 {lat['p50']} ms, p95 {lat['p95']} ms, p99 {lat['p99']} ms")
+    for name, dist in result["stages_ms"].items():
+        print(f"    {name:<16} p50 {dist['p50']:>8} ms   p95 {dist['p95']:>8} ms")
+    if result["fallbacks"]:
+        print(f">>> [benchmark] Fallbacks: {result['fallbacks']}")
+    if "vs_baseline" in report:
+        print(f">>> [benchmark] vs baseline (% change): {json.dumps(report['vs_baseline'])}")
+    print(f">>> [benchmark] Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+
+import orjson
+from dotenv import load_dotenv
+
+load_dotenv()
+# Building the local index must not need the hosted one.
+os.environ.setdefault("VECTOR_BACKEND", "local")
+
+import numpy as np
+
+from app.config import (
+    DATA_DIR, IVF_INDEX_DIR, IVF_NPROBE, IVF_RERANK, LOCAL_INDEX_DIR, LOCAL_INDEX_DTYPE, NAMESPACE
+)
+from app.ivf_index import IVFBackend, build_ivf, evaluate
+from app.log import setup_logging
+from app.retriever import embed_queries
+from app.vector_backend import LocalBackend
+
+DOCS_PATH = os.getenv("DOCS_PATH", os.path.join(DATA_DIR, "prepared_documents.jsonl"))
+META_PATH = os.getenv("META_PATH", os.path.join(DATA_DIR, "prepared_metadata.jsonl"))
+
+
+def _read_jsonl(path):
+    out = {}
+    if not os.path.exists(path):
+        return out
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            obj = orjson.loads(line)
+            rid = str(obj.get("id") or obj.get("resource_id"))
+            if rid:
+                out[rid] = obj
+    return out
+
+
+def main():
+    setup_logging("text")
+    parser = argparse.ArgumentParser(description="Embed prepared documents into a local vector index.")
+    parser.add_argument("--format", default="flat", choices=["flat", "ivf"])
+    parser.add_argument("--out", default=None, help="defaults to LOCAL_INDEX_DIR / IVF_INDEX_DIR")
+    parser.add_argument("--dtype", default=None, help="flat: float32|float16, ivf: int8|float16")
+    parser.add_argument("--namespace", default=NAMESPACE)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--nlist", type=int, default=None, help="ivf partitions (default ~sqrt(n))")
+    parser.add_argument("--eval", type=int, default=0, help="ivf: report recall/latency on N sampled queries")
+    args = parser.parse_args()
+
+    print(f">>> [build_local_index] Reading {DOCS_PATH} and {META_PATH}...")
+    docs = _read_jsonl(DOCS_PATH)
+    meta = _read_jsonl(META_PATH)
+    rows = [(rid, doc.get("text") or "") for rid, doc in sorted(docs.items())]
+    rows = [(rid, text) for rid, text in rows if text.strip()]
+    print(f">>> [build_local_index] {len(rows)} documents with text.")
+    if not rows:
+        return
+
+    vectors = []
+    for start in range(0, len(rows), args.batch_size):
+        batch = rows[start:start + args.batch_size]
+        vectors.extend(embed_queries([text for _, text in batch]))
+        print(f">>> [build_local_index] Embedded {min(start + args.batch_size, len(rows))}/{len(rows)}")
+    ids = [rid for rid, _ in rows]
+    # Same metadata shape as DataStore.reembed_and_upsert sends to Pinecone.
+    metadata = [meta.get(rid, {}) | {"text": text} for rid, text in rows]
+
+    if args.format == "flat":
+        backend = LocalBackend(dtype=args.dtype or LOCAL_INDEX_DTYPE)
+        backend.upsert(
+            [{"id": rid, "values": vec, "metadata": md} for rid, vec, md in zip(ids, vectors, metadata)],
+            namespace=args.namespace,
+        )
+        backend.save(args.out or LOCAL_INDEX_DIR)
+        return
+
+    out = args.out or IVF_INDEX_DIR
+    matrix = np.asarray(vectors, dtype=np.float32)
+    build_ivf(
+        os.path.join(out, args.namespace), ids, matrix, metadata,
+        nlist=args.nlist, dtype=args.dtype or "int8",
+    )
+    if args.eval:
+        backend = IVFBackend.load(out, IVF_NPROBE, IVF_RERANK)
+        sample = np.random.default_rng(0).choice(len(matrix), size=min(args.eval, len(matrix)), replace=False)
+        report = evaluate(backend, matrix[sample], top_k=10, namespace=args.namespace)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
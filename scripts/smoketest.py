@@ -6,8 +6,10 @@ load_dotenv()
 # Quick smoke test without spinning up FastAPI
 from app.retriever import retrieve, build_filter
 from app.generator import generate_answer
+from app.log import setup_logging
 
 def main():
+    setup_logging("text")
     print(">>> [smoketest] Starting smoke test...")
 
     q = "Where can I get free food in the area?"
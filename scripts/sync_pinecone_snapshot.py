@@ -0,0 +1,33 @@
+import argparse
+import json
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.datastore import ds
+from app.log import setup_logging
+
+
+def main():
+    setup_logging("text")
+    parser = argparse.ArgumentParser(
+        description="Copy the namespace's Pinecone metadata into the local snapshot and report drift."
+    )
+    parser.add_argument("--full", action="store_true", help="refetch every vector, not just new/changed ids")
+    parser.add_argument("--drift-only", action="store_true", help="skip the sync; report drift against the last one")
+    args = parser.parse_args()
+
+    try:
+        if not args.drift_only:
+            report = ds.sync_snapshot(full=args.full)
+            print(json.dumps(report, indent=2))
+            if not report.get("ok"):
+                return
+        print(json.dumps(ds.drift(), indent=2))
+    finally:
+        ds.close()
+
+
+if __name__ == "__main__":
+    main()
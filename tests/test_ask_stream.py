@@ -0,0 +1,91 @@
+import asyncio
+import json
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("PINECONE_API_KEY", "test-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-openai")
+
+with mock.patch("pinecone.Pinecone") as MockPinecone:
+    MockPinecone.return_value.Index.return_value = mock.MagicMock()
+    from app import main
+
+
+def _parse(chunks):
+    events = []
+    for chunk in chunks:
+        lines = chunk.strip().split("\n")
+        event = lines[0].split(":", 1)[1].strip()
+        data = json.loads(lines[1].split(":", 1)[1])
+        events.append((event, data))
+    return events
+
+
+class AskStreamTests(unittest.TestCase):
+    def _collect(self, payload):
+        async def run():
+            return [chunk async for chunk in main._ask_events(payload)]
+        return _parse(asyncio.run(run()))
+
+    def test_events_arrive_in_pipeline_order(self):
+        grouped = {
+            "food": [{"id": "svc-1", "metadata": {"resource_name": "Pantry"}}],
+            "rent": [
+                {"id": "svc-1", "metadata": {"resource_name": "Pantry"}},
+                {"id": "svc-2", "metadata": {"resource_name": "Rent Aid"}},
+            ],
+        }
+        summary_batches = []
+
+        async def fake_needs(story, story_vector=None):
+            return {"needs": [{"slug": "food", "query": "food"}, {"slug": "rent", "query": "rent"}], "confidence": 0.8}
+
+        def fake_group(*args, **kwargs):
+            return grouped
+
+        async def fake_search(*args, **kwargs):
+            return []
+
+        async def fake_embed(text):
+            return [1.0, 0.0]
+
+        async def fake_summaries(story, resources, fallback=True, need=None, needs=None):
+            summary_batches.append(([r["id"] for r in resources], needs))
+            return {r["id"]: f"about {r['id']}" for r in resources}
+
+        async def fake_plan(story, grouped_results):
+            for token in ("Visit ", "[cite: svc-1]"):
+                yield token
+
+        with mock.patch.object(main, "extract_needs_async", fake_needs), \
+             mock.patch.object(main, "embed_query_async", fake_embed), \
+             mock.patch.object(main, "retrieve_async", fake_search), \
+             mock.patch.object(main, "search_needs_async", fake_search), \
+             mock.patch.object(main, "group_search_results", fake_group), \
+             mock.patch.object(main, "generate_card_summaries_async", fake_summaries), \
+             mock.patch.object(main, "stream_action_plan_async", fake_plan):
+            events = self._collect(main.Ask(query="food and rent"))
+
+        names = [name for name, _ in events]
+        self.assertEqual(
+            names,
+            ["needs", "cards", "summaries", "summaries", "plan_delta", "plan_delta", "done"],
+        )
+        self.assertIn("svc-2", events[2][1])
+        self.assertEqual(events[3][1], {"svc-1": "about svc-1", "svc-2": "about svc-2"})
+        # Every card, each tagged with the need group it is shown in.
+        self.assertEqual(
+            summary_batches, [(["svc-1", "svc-2"], {"svc-1": ("food", "food"), "svc-2": ("rent", "rent")})]
+        )
+        self.assertEqual(events[1][1]["counts"], {"total_results": 3, "needs": 2})
+        self.assertEqual(events[-1][1]["action_plan"], "Visit [cite: svc-1]")
+        self.assertIn("grouped", events[-1][1]["timings"])
+
+    def test_empty_query_only_sends_done(self):
+        events = self._collect(main.Ask(query="   "))
+        self.assertEqual(events, [("done", {"action_plan": "", "counts": {"total_results": 0, "needs": 0}})])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("PINECONE_API_KEY", "test-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-openai")
+
+from app import retriever
+from app.clients import openai_client
+from app.embed_cache import embedding_cache
+from app.result_cache import retrieval_cache
+from app.summary_cache import summary_cache
+from scripts import benchmark
+from scripts.benchmark import Upstream
+
+
+class BenchmarkTests(unittest.TestCase):
+    def setUp(self):
+        # Memory-only caches: the stand-in results must not reach the SQLite cache file.
+        for cache, attr in ((embedding_cache, "store"), (summary_cache, "store"), (retrieval_cache, "shared")):
+            patcher = mock.patch.object(cache, attr, None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_percentile_interpolates(self):
+        values = [10, 20, 30, 40, 50]
+        self.assertEqual(benchmark.percentile(values, 50), 30)
+        self.assertEqual(benchmark.percentile(values, 95), 48)
+        self.assertEqual(benchmark.percentile(values, 100), 50)
+        self.assertEqual(benchmark.percentile([], 99), 0.0)
+
+    def test_runs_ask_against_stand_ins_and_restores_clients(self):
+        before = (openai_client._client, retriever.backend._client)
+        upstreams = dict(
+            openai=Upstream("openai_embeddings", 1),
+            llm=Upstream("openai_responses", 2),
+            pinecone=Upstream("pinecone", 1),
+        )
+        with mock.patch("app.retriever.retrieval_cache.get", return_value=None):
+            result = asyncio.run(benchmark.run(requests=6, concurrency=3, use_lifespan=False, **upstreams))
+
+        self.assertEqual((result["requests"], result["ok"]), (6, 6))
+        self.assertGreater(result["requests_per_s"], 0)
+        self.assertLessEqual(result["latency_ms"]["p50"], result["latency_ms"]["p99"])
+        for stage in ("needs", "story_vector", "model_summaries", "plan"):
+            self.assertIn(stage, result["stages_ms"])
+        self.assertGreater(result["upstream_calls"]["pinecone"]["calls"], 0)
+        self.assertEqual((openai_client._client, retriever.backend._client), before)
+
+    def test_injected_errors_become_fallbacks_not_failures(self):
+        upstreams = dict(
+            openai=Upstream("openai_embeddings", 0),
+            llm=Upstream("openai_responses", 0, error_rate=1.0),
+            pinecone=Upstream("pinecone", 0),
+        )
+        result = asyncio.run(benchmark.run(requests=4, concurrency=2, use_lifespan=False, **upstreams))
+
+        self.assertEqual(result["failed"], 0)
+        self.assertEqual(result["fallbacks"].get("action_plan"), 4)
+        self.assertEqual(result["upstream_calls"]["openai_responses"]["errors"],
+                         result["upstream_calls"]["openai_responses"]["calls"])
+
+
+if __name__ == "__main__":
+    unittest.main()
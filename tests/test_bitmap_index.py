@@ -0,0 +1,141 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+os.environ.setdefault("PINECONE_API_KEY", "test-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-openai")
+
+from app.bitmap_index import BitmapIndex, bitset_rows
+from app.ivf_index import IVFBackend, build_ivf
+from app.vector_backend import LocalBackend, match_filter
+
+CITIES = ["Waterloo", "Cedar Falls", "Evansdale"]
+LANGUAGES = ["English", "Spanish", "Bosnian", "Swahili"]
+
+
+def _metadata(n=300, seed=5):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        md = {
+            "city": rng.choice(CITIES),
+            "languages": rng.sample(LANGUAGES, rng.randint(0, 2)),
+            "free_or_low_cost": rng.random() < 0.5,
+        }
+        if i % 4:
+            md["zip_code"] = rng.choice(["50701", "50702", "50613"])
+        rows.append(md)
+    return rows
+
+
+FILTERS = [
+    {"city": {"$eq": "Waterloo"}},
+    {"city": {"$eq": "Waterloo"}, "languages": "Spanish", "free_or_low_cost": {"$eq": True}},
+    {"languages": {"$in": ["Bosnian", "Swahili"]}},
+    {"$and": [{"city": "Cedar Falls"}, {"zip_code": {"$exists": True}}]},
+    {"$or": [{"city": "Evansdale"}, {"languages": "English"}]},
+    {"zip_code": {"$ne": "50701"}},
+    {"city": {"$nin": ["Waterloo", "Evansdale"]}},
+    {"county": {"$eq": "Black Hawk"}},
+]
+
+
+class BitmapIndexTests(unittest.TestCase):
+    def test_evaluate_matches_metadata_scan(self):
+        rows = _metadata()
+        index = BitmapIndex.build(rows)
+        for f in FILTERS:
+            with self.subTest(filter=f):
+                expected = [i for i, md in enumerate(rows) if match_filter(md, f)]
+                self.assertEqual(bitset_rows(index.evaluate(f)).tolist(), expected)
+
+    def test_unindexed_fields_and_operators_return_none(self):
+        index = BitmapIndex.build(_metadata(10))
+        self.assertIsNone(index.evaluate({"resource_name": "Pantry"}))
+        self.assertIsNone(index.evaluate({"city": {"$gt": "A"}}))
+        self.assertIsNone(index.evaluate({"$or": [{"city": "Waterloo"}, {"text": "x"}]}))
+
+    def test_incremental_updates_match_rebuild(self):
+        rows = _metadata(50)
+        index = BitmapIndex.build(rows)
+        previous, rows[3] = rows[3], {"city": "Evansdale", "languages": ["Swahili"], "free_or_low_cost": True}
+        index.set_row(3, rows[3], previous=previous)
+        rows.append({"city": "Waterloo", "languages": ["Bosnian"]})
+        index.set_row(50, rows[50])
+        # Without the old metadata the stale bits are still found.
+        previous, rows[7] = rows[7], {"city": "Waterloo"}
+        index.set_row(7, rows[7])
+
+        rebuilt = BitmapIndex.build(rows)
+        for f in FILTERS:
+            self.assertEqual(index.evaluate(f), rebuilt.evaluate(f))
+
+        index.clear_row(3, previous=rows[3])
+        self.assertNotIn(3, bitset_rows(index.evaluate({"city": "Evansdale"})).tolist())
+
+    def test_save_load_round_trip(self):
+        rows = _metadata(120)
+        index = BitmapIndex.build(rows)
+        with tempfile.TemporaryDirectory() as tmp:
+            index.save(os.path.join(tmp, "bitmap.npz"))
+            loaded = BitmapIndex.load(os.path.join(tmp, "bitmap.npz"))
+
+        self.assertEqual(loaded.fields, index.fields)
+        for f in FILTERS:
+            self.assertEqual(loaded.evaluate(f), index.evaluate(f))
+
+
+class PrefilteredSearchTests(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.rows = _metadata(200)
+        self.vectors = rng.normal(size=(200, 8)).astype(np.float32)
+        self.ids = [f"svc-{i}" for i in range(200)]
+
+    def _exact(self, q, f, k):
+        q = q / np.linalg.norm(q)
+        units = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        keep = [i for i, md in enumerate(self.rows) if match_filter(md, f)]
+        keep.sort(key=lambda i: -float(units[i] @ q))
+        return [self.ids[i] for i in keep[:k]]
+
+    def test_local_backend_filters_through_bitmap(self):
+        backend = LocalBackend()
+        backend.upsert(
+            [{"id": rid, "values": vec, "metadata": md} for rid, vec, md in zip(self.ids, self.vectors, self.rows)],
+            namespace="ns",
+        )
+        q = self.vectors[0]
+        for f in FILTERS:
+            with self.subTest(filter=f):
+                hits = backend.query(q, 5, f, "ns")
+                self.assertEqual([h["id"] for h in hits], self._exact(q, f, 5))
+
+        self.assertTrue(backend.update_metadata("svc-0", {"city": "Ames"}, "ns"))
+        self.assertEqual(backend.query(q, 1, {"city": "Ames"}, "ns")[0]["id"], "svc-0")
+        self.assertFalse(backend.update_metadata("missing", {"city": "Ames"}, "ns"))
+
+    def test_ivf_backend_filters_through_bitmap(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            build_ivf(os.path.join(tmp, "ns"), self.ids, self.vectors, self.rows, nlist=4)
+            self.assertTrue(os.path.exists(os.path.join(tmp, "ns", "bitmap.npz")))
+            backend = IVFBackend.load(tmp, nprobe=4, rerank=4)
+            shard = backend._shards["ns"]
+            try:
+                q = self.vectors[1]
+                for f in FILTERS[:3]:
+                    hits = backend.query(q, 5, f, "ns")
+                    self.assertEqual([h["id"] for h in hits], self._exact(q, f, 5))
+
+                self.assertEqual(shard.record(shard.find("svc-17"))[0], "svc-17")
+                self.assertTrue(backend.update_metadata("svc-1", {"city": "Ames"}, "ns"))
+                self.assertEqual(backend.query(q, 1, {"city": "Ames"}, "ns")[0]["id"], "svc-1")
+            finally:
+                shard.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import random
+import tempfile
+import time
+import unittest
+
+import orjson
+
+from app.bm25 import BM25Index, LexicalIndex, _JsonlRecords, document_text, tokenize
+from app.journal import EditJournal
+
+DOCS = {
+    "wic": "Nutrition program for women, infants and children. Apply at the county office.",
+    "snap": "SNAP food assistance enrollment help for families in 50703.",
+    "pantry": "Food pantry with free groceries every Tuesday.",
+    "rent": "Emergency rent and utility assistance for families.",
+}
+
+
+class BM25IndexTests(unittest.TestCase):
+    def test_tokenize_keeps_acronyms_and_zip_codes(self):
+        self.assertEqual(tokenize("WIC & SNAP near 50703, Meals for seniors"),
+                         ["wic", "snap", "near", "50703", "meal", "senior"])
+
+    def test_exact_terms_and_metadata_fields_rank_first(self):
+        md = {"wic": {"resource_name": "WIC Clinic", "categories": ["Health"]}}
+        index = BM25Index.build((rid, document_text(text, md.get(rid))) for rid, text in DOCS.items())
+
+        self.assertEqual(index.search("WIC appointment", 3)[0][0], "wic")
+        self.assertEqual(index.search("health", 3)[0][0], "wic")
+        self.assertEqual([rid for rid, _ in index.search("zip 50703", 3)], ["snap"])
+        self.assertEqual([rid for rid, _ in index.search("food for families", 2)][0], "snap")
+        self.assertEqual(index.search("nothing matches", 3), [])
+
+    def test_accept_skips_to_lower_ranked_ids(self):
+        index = BM25Index.build(DOCS.items())
+        ranked = [rid for rid, _ in index.search("food families", 4)]
+        filtered = [rid for rid, _ in index.search("food families", 2, accept=lambda rid: rid != ranked[0])]
+        self.assertEqual(filtered, ranked[1:3])
+
+    def test_updates_and_removals_survive_compaction(self):
+        index = BM25Index.build(DOCS.items())
+        index.add("rent", "Bus passes and transportation vouchers.")
+        self.assertNotIn("rent", [rid for rid, _ in index.search("rent utility", 4)])
+        self.assertEqual(index.search("bus pass", 1)[0][0], "rent")
+
+        for i in range(20):
+            index.add(f"tmp-{i}", f"temporary shelter bed {i}")
+        for i in range(20):
+            index.remove(f"tmp-{i}")
+        self.assertLess(len(index._ids), 25)  # tombstones were compacted away
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.search("shelter", 3), [])
+        self.assertEqual(index.search("bus pass", 1)[0][0], "rent")
+        self.assertEqual(index.search("WIC infants", 1)[0][0], "wic")
+
+    def test_long_stories_score_a_bounded_number_of_postings(self):
+        rng = random.Random(7)
+        words = [f"w{i}" for i in range(2000)]
+        index = BM25Index.build(
+            ((f"svc-{i}", " ".join(rng.choices(words, k=40)) + (" wic" if i % 500 == 0 else ""))
+             for i in range(20_000)),
+            max_query_terms=32,
+            max_postings=2_000,
+        )
+        for _ in range(10):
+            story = " ".join(rng.choices(words[:200], k=60)) + " wic"
+            terms = {index.vocab[t] for t in tokenize(story)}
+            available = sum(len(index._postings(tid)[0]) for tid in terms)
+            before = index.postings_scored
+
+            hits = index.search(story, 10)
+
+            scored = index.postings_scored - before
+            self.assertLessEqual(scored, 2_000)
+            self.assertLess(scored, available / 5)
+            self.assertEqual(len(hits), 10)
+
+
+class LexicalIndexTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        paths = [os.path.join(tmp.name, name) for name in ("docs.jsonl", "meta.jsonl", "edits.journal")]
+        with open(paths[0], "wb") as f:
+            f.write(b"".join(orjson.dumps({"id": rid, "text": text}) + b"\n" for rid, text in DOCS.items()))
+        with open(paths[1], "wb") as f:
+            f.write(b"".join(
+                orjson.dumps({"id": rid, "city": "Waterloo" if rid != "pantry" else "Ames"}) + b"\n" for rid in DOCS
+            ))
+        EditJournal(paths[2]).append({"op": "record", "id": "pantry", "text": "Diaper bank and baby supplies.",
+                                      "metadata": {"id": "pantry", "city": "Waterloo"}})
+        self.lexical = LexicalIndex(lambda: _JsonlRecords(*paths))
+        self.addCleanup(self.lexical.close)
+
+    def _wait_ready(self):
+        self.assertIsNone(self.lexical.search("food", 3))
+        deadline = time.monotonic() + 5
+        while self.lexical.state == "building" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(self.lexical.ready)
+
+    def test_hits_carry_metadata_and_honor_filters(self):
+        self._wait_ready()
+        hits = self.lexical.search("diaper", 3, {"city": {"$eq": "Waterloo"}})
+        self.assertEqual([h["id"] for h in hits], ["pantry"])  # journal edit replayed
+        self.assertEqual(hits[0]["metadata"]["text"], "Diaper bank and baby supplies.")
+        self.assertGreater(hits[0]["score"], 0)
+        self.assertEqual(self.lexical.search("diaper", 3, {"city": "Ames"}), [])
+
+    def test_edits_are_searchable_immediately(self):
+        self.lexical.update_record("rent", "Tax preparation help (VITA).", {"id": "rent"})  # not started: ignored
+        self._wait_ready()
+        self.lexical.update_record("svc-new", "VITA free tax filing", {"id": "svc-new", "city": "Ames"})
+        self.assertEqual([h["id"] for h in self.lexical.search("vita", 3)], ["svc-new"])
+
+
+if __name__ == "__main__":
+    unittest.main()
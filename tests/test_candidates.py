@@ -1,4 +1,6 @@
+import asyncio
 import os
+import time
 import unittest
 from unittest import mock
 
@@ -27,7 +29,8 @@ class MultiNeedRetrieveTests(unittest.TestCase):
                 {"id": "svc-1", "score": 0.4, "metadata": {"service_id": "svc-1", "resource_name": "Alpha"}}
             ]
 
-        candidates = multi_need_retrieve("help with food", [], retrieve_fn=fake_retrieve)
+        grouped = multi_need_retrieve("help with food", [], retrieve_fn=fake_retrieve)
+        candidates = grouped["general"]
 
         self.assertEqual(len(calls), 1)
         self.assertEqual(calls[0][0], "help with food")
@@ -55,11 +58,7 @@ class MultiNeedRetrieveTests(unittest.TestCase):
         }
 
         def fake_retrieve(query, top_k=0, **kwargs):
-<<<<<<< HEAD
-            calls.append(query, top_k, kwargs)
-=======
             calls.append((query, top_k, kwargs))
->>>>>>> b01f04a1cb8e0c484734ef6cdb5ac7af8df0b201
             return responses.get(query, [])
 
         needs = [
@@ -104,7 +103,8 @@ class MultiNeedRetrieveTests(unittest.TestCase):
 
         needs = [{"slug": "housing", "query": "housing assistance"}]
 
-        candidates = multi_need_retrieve("story", needs, retrieve_fn=fake_retrieve)
+        grouped = multi_need_retrieve("story", needs, retrieve_fn=fake_retrieve)
+        candidates = grouped["housing"]
 
         self.assertEqual(len(calls), 2)
         self.assertEqual(len(candidates), 1)
@@ -136,6 +136,169 @@ class MultiNeedRetrieveTests(unittest.TestCase):
         self.assertEqual(calls[0]["metadata_filters"], {"city": "Test"})
         self.assertEqual(calls[0]["namespace"], "ns")
 
+    def test_concurrent_fanout_matches_serial_grouping(self):
+        multi_need_retrieve = self._import()
+
+        responses = {
+            "story": [
+                {"id": "svc-1", "score": 0.3, "metadata": {"service_id": "svc-1", "resource_name": "Alpha"}},
+                {"id": "svc-2", "score": 0.2, "metadata": {"service_id": "svc-2", "resource_name": "Beta"}},
+            ],
+            "food Context: story": [
+                {"id": "svc-2", "score": 0.9, "metadata": {"service_id": "svc-2", "resource_name": "Beta"}},
+                {"id": "svc-3", "score": 0.4, "metadata": {"service_id": "svc-3", "resource_name": "Gamma"}},
+            ],
+            "rent Context: story": [
+                {"id": "svc-3", "score": 0.7, "metadata": {"service_id": "svc-3", "resource_name": "Gamma"}},
+            ],
+        }
+
+        def fake_retrieve(query, top_k=0, **kwargs):
+            # Answer the story query last so completion order differs from submit order.
+            if query == "story":
+                time.sleep(0.05)
+            return responses.get(query, [])
+
+        needs = [{"slug": "food", "query": "food"}, {"slug": "rent", "query": "rent"}]
+
+        serial = multi_need_retrieve("story", needs, retrieve_fn=fake_retrieve)
+        concurrent = multi_need_retrieve(
+            "story", needs, retrieve_fn=fake_retrieve, max_workers=4
+        )
+
+        self.assertEqual(serial, concurrent)
+
+    def test_concurrent_fanout_drops_timed_out_calls(self):
+        multi_need_retrieve = self._import()
+
+        def fake_retrieve(query, top_k=0, **kwargs):
+            if query.startswith("slow"):
+                time.sleep(0.5)
+                return [
+                    {"id": "svc-9", "score": 0.9, "metadata": {"service_id": "svc-9", "resource_name": "Late"}}
+                ]
+            return [
+                {"id": "svc-1", "score": 0.4, "metadata": {"service_id": "svc-1", "resource_name": "Alpha"}}
+            ]
+
+        needs = [{"slug": "slow-need", "query": "slow"}]
+
+        started = time.monotonic()
+        grouped = multi_need_retrieve(
+            "story",
+            needs,
+            retrieve_fn=fake_retrieve,
+            max_workers=2,
+            call_timeout=0.1,
+        )
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.4)
+        ids = [c["service_id"] for c in grouped["slow-need"]]
+        self.assertEqual(ids, ["svc-1"])
+
+    def test_async_fanout_matches_sync_grouping(self):
+        from app.candidates import multi_need_retrieve_async
+        multi_need_retrieve = self._import()
+
+        responses = {
+            "story": [
+                {"id": "svc-1", "score": 0.3, "metadata": {"service_id": "svc-1", "resource_name": "Alpha"}},
+            ],
+            "food Context: story": [
+                {"id": "svc-1", "score": 0.6, "metadata": {"service_id": "svc-1", "resource_name": "Alpha"}},
+                {"id": "svc-2", "score": 0.9, "metadata": {"service_id": "svc-2", "resource_name": "Beta"}},
+            ],
+        }
+
+        def fake_retrieve(query, top_k=0, **kwargs):
+            return responses.get(query, [])
+
+        async def fake_retrieve_async(query, top_k=0, **kwargs):
+            await asyncio.sleep(0.05 if query == "story" else 0)
+            return responses.get(query, [])
+
+        needs = [{"slug": "food", "query": "food"}]
+        expected = multi_need_retrieve("story", needs, retrieve_fn=fake_retrieve)
+        actual = asyncio.run(
+            multi_need_retrieve_async("story", needs, retrieve_fn=fake_retrieve_async)
+        )
+
+        self.assertEqual(actual, expected)
+
+    def test_batched_embedding_uses_one_embed_call(self):
+        multi_need_retrieve = self._import()
+        embed_calls = []
+        search_calls = []
+
+        def fake_embed(texts):
+            embed_calls.append(list(texts))
+            return [[float(i)] for i, _ in enumerate(texts)]
+
+        def fake_retrieve_many(vectors, top_k=0, **kwargs):
+            search_calls.append((list(vectors), list(top_k), kwargs))
+            hits = {
+                0.0: [{"id": "svc-1", "score": 0.5, "metadata": {"service_id": "svc-1", "resource_name": "Alpha"}}],
+                1.0: [{"id": "svc-2", "score": 0.8, "metadata": {"service_id": "svc-2", "resource_name": "Beta"}}],
+            }
+            return [hits.get(vec[0], []) for vec in vectors]
+
+        def unused_retrieve(*args, **kwargs):
+            raise AssertionError("retrieve_fn should not be called in batched mode")
+
+        grouped = multi_need_retrieve(
+            "story",
+            [{"slug": "food", "query": "food"}],
+            retrieve_fn=unused_retrieve,
+            embed_fn=fake_embed,
+            retrieve_many_fn=fake_retrieve_many,
+            retrieve_kwargs={"metadata_filters": {"city": "Test"}},
+            full_top_k=4,
+            per_need_top_k=6,
+        )
+
+        self.assertEqual(embed_calls, [["story", "food Context: story"]])
+        self.assertEqual(len(search_calls), 1)
+        vectors, top_ks, kwargs = search_calls[0]
+        self.assertEqual(vectors, [[0.0], [1.0]])
+        self.assertEqual(top_ks, [4, 6])
+        self.assertEqual(kwargs["metadata_filters"], {"city": "Test"})
+        ids = [c["service_id"] for c in grouped["food"]]
+        self.assertEqual(ids, ["svc-2", "svc-1"])
+
+    def test_hybrid_fuses_lexical_hits_with_rrf(self):
+        multi_need_retrieve = self._import()
+        lexical_calls = []
+
+        def hit(rid, score):
+            return {"id": rid, "score": score, "metadata": {"service_id": rid, "resource_name": rid.upper()}}
+
+        def fake_retrieve(query, top_k=0, **kwargs):
+            return [hit("svc-1", 0.9), hit("svc-2", 0.8), hit("svc-3", 0.7)]
+
+        class FakeLexical:
+            def search(self, query, top_k, metadata_filter=None):
+                lexical_calls.append((query, top_k, metadata_filter))
+                return [hit("wic", 12.0), hit("svc-3", 4.0)]
+
+        with mock.patch("app.candidates.lexical_index", FakeLexical()):
+            grouped = multi_need_retrieve(
+                "WIC office",
+                [],
+                retrieve_fn=fake_retrieve,
+                retrieve_kwargs={"metadata_filters": {"city": "Test"}},
+                grouped_top_k=4,
+                hybrid=True,
+            )
+            dense_only = multi_need_retrieve("WIC office", [], retrieve_fn=fake_retrieve, hybrid=False)
+
+        self.assertEqual(lexical_calls, [("WIC office", 10, {"city": "Test"})])
+        ids = [c["service_id"] for c in grouped["general"]]
+        # svc-3 is in both rankings; "wic" only lexically, but ranked first there.
+        self.assertEqual(ids, ["svc-3", "svc-1", "wic", "svc-2"])
+        self.assertAlmostEqual(grouped["general"][0]["score"], 1 / 63 + 1 / 62)
+        self.assertEqual([c["service_id"] for c in dense_only["general"]], ["svc-1", "svc-2", "svc-3"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from app import clients
+from app.clients import LazyClient, startup_timings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LazyClientTests(unittest.TestCase):
+    def test_builds_once_across_threads_and_delegates(self):
+        builds = []
+        barrier = threading.Barrier(8)
+
+        def factory():
+            builds.append(1)
+            return SimpleNamespace(ping=lambda: "pong")
+
+        lazy = LazyClient("test_client", factory)
+        self.addCleanup(clients._registry.remove, lazy)
+        self.assertIn("not built", repr(lazy))
+
+        def use():
+            barrier.wait()
+            results.append(lazy.ping())
+
+        results = []
+        threads = [threading.Thread(target=use) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(builds, [1])
+        self.assertEqual(results, ["pong"] * 8)
+        self.assertIn("test_client", startup_timings)
+        self.assertIn("test_client", clients.startup_report()["built"])
+
+    def test_warm_up_survives_a_failing_step(self):
+        def broken():
+            raise ConnectionError("no route to host")
+
+        ok = LazyClient("test_ok", lambda: object())
+        failing = LazyClient("test_broken", broken)
+        for lazy in (ok, failing):
+            self.addCleanup(clients._registry.remove, lazy)
+        with mock.patch.multiple(clients, openai_client=ok, async_openai_client=failing, VECTOR_BACKEND="local"):
+            report = clients.warm_up({"extra": lambda: None})
+        self.assertIn("test_ok", report["built"])
+        self.assertNotIn("test_broken", report["built"])
+        self.assertIn("warm_up", report["timings"])
+
+    def test_importing_the_app_builds_no_clients(self):
+        code = (
+            "import sys, app.main\n"
+            "from app.clients import startup_report\n"
+            "assert startup_report()['built'] == [], startup_report()\n"
+            "assert 'openai' not in sys.modules\n"
+        )
+        env = dict(os.environ, OPENAI_API_KEY="x", PINECONE_API_KEY="x", PYTHONPATH=ROOT)
+        proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+        self.assertEqual(proc.returncode, 0, proc.stderr[-2000:])
+
+
+if __name__ == "__main__":
+    unittest.main()
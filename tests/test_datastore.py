@@ -0,0 +1,174 @@
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import orjson
+
+os.environ.setdefault("PINECONE_API_KEY", "test-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-openai")
+
+with mock.patch("pinecone.Pinecone") as MockPinecone:
+    MockPinecone.return_value.Index.return_value = mock.MagicMock()
+    from app import datastore
+
+
+class FakeIndex:
+    def __init__(self):
+        self.calls = []
+
+    def fetch(self, ids, namespace=""):
+        self.calls.append(list(ids))
+        return SimpleNamespace(vectors={
+            rid: {"metadata": {"text": f"remote {rid}", "organization_name": "Remote Org"}} for rid in ids
+        })
+
+
+CITIES = ["Waterloo", "Cedar Falls", "Evansdale"]
+
+
+class DataStoreTests(unittest.TestCase):
+    backend = "jsonl"
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        paths = {
+            name: os.path.join(tmp.name, filename)
+            for name, filename in [
+                ("DOCS_PATH", "prepared_documents.jsonl"), ("META_PATH", "prepared_metadata.jsonl"),
+                ("PROG_PATH", "progress.json"), ("MANIFEST_PATH", "index_manifest.json"),
+                ("JOURNAL_PATH", "edits.journal"), ("SNAPSHOT_PATH", "pinecone_snapshot.jsonl"),
+                ("DATASTORE_DB_PATH", "datastore.sqlite3"),
+            ]
+        }
+        with open(paths["DOCS_PATH"], "wb") as f:
+            f.write(b"".join(orjson.dumps({"id": f"svc-{i:02d}", "text": f"text {i}"}) + b"\n" for i in range(30)))
+        with open(paths["META_PATH"], "wb") as f:
+            f.write(b"".join(
+                orjson.dumps({
+                    "id": f"svc-{i:02d}",
+                    "location": {"city": CITIES[i % 3], "county": "Black Hawk"},
+                    "categories": ["Food"] if i % 2 else ["Housing", "Utilities"],
+                }) + b"\n"
+                for i in range(30)
+            ))
+        with open(paths["PROG_PATH"], "wb") as f:
+            f.write(orjson.dumps({"reviewed": ["svc-00", "svc-03"], "dirty": []}))
+        patches = dict(paths, summary_cache=mock.MagicMock(), DATASTORE_BACKEND=self.backend)
+        for name, value in patches.items():
+            patcher = mock.patch.object(datastore, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.ds = datastore.DataStore(lazy=True)
+        self.assertFalse(self.ds._loaded)
+        self.ds._ensure_loaded()
+        self.addCleanup(self.ds.close)
+        self.fake = FakeIndex()
+        self.ds.index = self.fake
+
+    def test_window_is_hydrated_with_one_fetch_and_cached(self):
+        page = self.ds.get_records(5, 10, prefetch=False)
+
+        self.assertEqual(self.fake.calls, [[f"svc-{i:02d}" for i in range(5, 15)]])
+        self.assertEqual([r["index"] for r in page["records"]], list(range(5, 15)))
+        first = page["records"][0]
+        self.assertEqual(first["document"]["text"], "text 5")  # local text wins
+        self.assertEqual(first["metadata"]["organization_name"], "Remote Org")
+        self.assertEqual(page["total"], 30)
+
+        self.ds.get_records(5, 10, prefetch=False)
+        self.assertEqual(len(self.fake.calls), 1)
+
+    def test_next_window_is_prefetched(self):
+        self.ds.get_records(0, 10)
+        deadline = time.monotonic() + 5
+        while (len(self.fake.calls) < 2 or self.ds._prefetching) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.fake.calls[1], [f"svc-{i:02d}" for i in range(10, 20)])
+
+        self.ds.get_records(10, 10, prefetch=False)
+        self.assertEqual(len(self.fake.calls), 2)
+
+    def test_update_invalidates_cached_record(self):
+        self.ds.get_records(0, 3, prefetch=False)
+        self.ds.update_record({"id": "svc-01", "text": "edited", "metadata": {"city": "Waterloo"}})
+
+        page = self.ds.get_records(0, 3, prefetch=False)
+        self.assertEqual(self.fake.calls[-1], ["svc-01"])
+        self.assertEqual(page["records"][1]["document"]["text"], "edited")
+        self.assertEqual(page["records"][1]["metadata"]["city"], "Waterloo")
+        self.assertTrue(page["records"][1]["dirty"])
+
+    def test_synced_snapshot_replaces_live_fetches(self):
+        self.fake.list_paginated = lambda **kw: SimpleNamespace(
+            vectors=[SimpleNamespace(id=f"svc-{i:02d}") for i in range(30)], pagination=None
+        )
+        report = self.ds.sync_snapshot()
+        self.assertEqual(report["fetched"], 30)
+        calls = len(self.fake.calls)
+
+        page = self.ds.get_records(0, 10, prefetch=False)
+        self.assertEqual(len(self.fake.calls), calls)
+        self.assertEqual(page["records"][0]["metadata"]["organization_name"], "Remote Org")
+
+        drift = self.ds.drift()
+        self.assertEqual(drift["text_changed"], 30)  # local "text i" vs remote "remote svc-i"
+
+    def test_query_filters_and_paginates(self):
+        everyone = self.ds.query({"county": "black hawk"}, limit=100)
+        self.assertEqual(everyone["total"], 30)
+
+        food_waterloo = self.ds.query({"city": "Waterloo", "category": "food"})
+        self.assertEqual([r["id"] for r in food_waterloo["records"]], ["svc-03", "svc-09", "svc-15", "svc-21", "svc-27"])
+        self.assertEqual(food_waterloo["records"][0]["index"], 3)
+
+        unreviewed = self.ds.query({"city": "Waterloo", "category": "Food", "reviewed": False}, offset=1, limit=2)
+        self.assertEqual(unreviewed["total"], 4)
+        self.assertEqual([r["id"] for r in unreviewed["records"]], ["svc-15", "svc-21"])
+
+        self.ds.update_record({"id": "svc-09", "text": "moved", "reviewed": True,
+                               "metadata": {"city": "Evansdale", "categories": ["Food"]}})
+        self.assertEqual(self.ds.query({"dirty": True})["records"][0]["id"], "svc-09")
+        self.assertEqual(self.ds.query({"city": "Waterloo", "category": "Food"})["total"], 4)
+        self.assertEqual(self.ds.summary()["reviewed_count"], 3)
+
+    def test_compaction_persists_progress_before_dropping_the_journal(self):
+        if self.ds.db is not None:
+            self.skipTest("SQLite storage has no journal")
+        self.ds.update_record({"id": "svc-05", "text": "edited", "reviewed": True})
+        on_disk = []
+
+        def finish_rotation():
+            with open(datastore.PROG_PATH, "rb") as f:
+                on_disk.append(orjson.loads(f.read()))
+
+        with mock.patch.object(self.ds.journal, "finish_rotation", finish_rotation):
+            self.assertTrue(self.ds.compact()["ok"])
+
+        self.assertIn("svc-05", on_disk[0]["dirty"])
+        self.assertIn("svc-05", on_disk[0]["reviewed"])
+
+
+class SQLiteDataStoreTests(DataStoreTests):
+    backend = "sqlite"
+
+    def test_imports_jsonl_once_and_persists_edits(self):
+        self.assertIsNotNone(self.ds.db)
+        self.assertEqual(self.ds.db.count(), 30)
+        self.ds.update_record({"id": "svc-new", "text": "brand new", "metadata": {"city": "Ames"}})
+        self.ds.close()
+
+        again = datastore.DataStore(lazy=False)
+        self.addCleanup(again.close)
+        self.assertEqual(again.ids[-1], "svc-new")
+        self.assertEqual(again.docs.get("svc-new")["text"], "brand new")
+        self.assertIn("svc-new", again.progress.dirty)
+        self.assertIn("svc-03", again.progress.reviewed)
+
+
+if __name__ == "__main__":
+    unittest.main()
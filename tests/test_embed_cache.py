@@ -0,0 +1,118 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+
+os.environ.setdefault("PINECONE_API_KEY", "test-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-openai")
+
+from app.cache import LRUCache, SQLiteStore
+from app.embed_cache import EmbeddingCache, embed_cached, embed_cached_async
+
+
+class LRUCacheTests(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_entries_expire_after_ttl(self):
+        now = [100.0]
+        cache = LRUCache(4, ttl=10, clock=lambda: now[0])
+        cache.set("a", 1)
+        now[0] += 5
+        self.assertEqual(cache.get("a"), 1)
+        now[0] += 6
+        self.assertIsNone(cache.get("a"))
+
+
+class EmbeddingCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "cache.sqlite3")
+
+    def _cache(self, memory_items=8, disk_items=8):
+        store = SQLiteStore(self.path, "embeddings", disk_items)
+        self.addCleanup(store.close)
+        return EmbeddingCache("test-model", LRUCache(memory_items), store)
+
+    def test_misses_are_embedded_once_and_deduplicated(self):
+        cache = self._cache()
+        calls = []
+
+        def fake_embed(texts):
+            calls.append(list(texts))
+            return [[float(len(t)), 0.5] for t in texts]
+
+        first = embed_cached(["food  pantry", "rent help", "food pantry"], fake_embed, cache)
+        second = embed_cached(["rent help", " food pantry "], fake_embed, cache)
+
+        self.assertEqual(calls, [["food  pantry", "rent help"]])
+        self.assertEqual(first[0], first[2])
+        self.assertEqual(second, [first[1], first[0]])
+        self.assertEqual(cache.stats()["memory_hits"], 2)
+
+    def test_disk_tier_survives_new_instance(self):
+        embed_cached(["story"], lambda texts: [[0.25, -1.0]], self._cache())
+
+        fresh = self._cache()
+        vec = embed_cached(["story"], lambda texts: self.fail("should hit disk"), fresh)
+
+        self.assertEqual(vec, [[0.25, -1.0]])
+        self.assertEqual(fresh.stats()["disk_hits"], 1)
+
+    def test_disk_tier_is_trimmed_to_max_entries(self):
+        cache = self._cache(memory_items=0, disk_items=2)
+        for text in ("a", "b", "c"):
+            embed_cached([text], lambda texts: [[1.0]], cache)
+
+        self.assertEqual(cache.store.count(), 2)
+
+    def test_async_path_reads_and_writes_sqlite_off_the_event_loop(self):
+        embed_cached(["story"], lambda texts: [[0.25, -1.0]], self._cache())
+        cache = self._cache()
+        threads = []
+        for name in ("get_many", "put_many"):
+            original = getattr(cache.store, name)
+
+            def traced(*args, _original=original):
+                threads.append(threading.get_ident())
+                return _original(*args)
+
+            setattr(cache.store, name, traced)
+
+        async def embed(texts):
+            return [[1.0, 0.0] for _ in texts]
+
+        vecs = asyncio.run(embed_cached_async(["story", "new story"], embed, cache))
+
+        self.assertEqual(vecs, [[0.25, -1.0], [1.0, 0.0]])
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    def test_reads_refresh_last_used_only_once_it_is_stale(self):
+        store = self._cache().store
+        store.put_many([("k", b"v", None)])
+
+        def last_used():
+            return store._connection().execute("SELECT last_used FROM embeddings").fetchone()[0]
+
+        written = last_used()
+        self.assertEqual(store.get_many(["k"]), {"k": b"v"})
+        self.assertEqual(last_used(), written)
+
+        store.touch_after = 0.0
+        store.get_many(["k"])
+        self.assertGreater(last_used(), written)
+
+
+if __name__ == "__main__":
+    unittest.main()
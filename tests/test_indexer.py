@@ -0,0 +1,133 @@
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from app.indexer import BulkIndexer, plan_embed_batches, retry_after_seconds
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("429 Too Many Requests")
+        self.status_code = 429
+        self.response = SimpleNamespace(headers={"retry-after": retry_after} if retry_after else {})
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+def _records(n, text="some resource text"):
+    return [(f"svc-{i}", f"{text} {i}", {"n": i}) for i in range(n)]
+
+
+class PlanTests(unittest.TestCase):
+    def test_batches_respect_token_and_item_limits(self):
+        records = _records(10, text="x" * 40)  # ~11 tokens each
+        batches = plan_embed_batches(records, max_tokens=30, max_items=100)
+        self.assertEqual([len(b) for b in batches], [2, 2, 2, 2, 2])
+
+        batches = plan_embed_batches(records, max_tokens=10_000, max_items=4)
+        self.assertEqual([len(b) for b in batches], [4, 4, 2])
+        self.assertEqual([r for b in batches for r in b], records)
+
+    def test_retry_after_formats(self):
+        self.assertEqual(retry_after_seconds(RateLimited("3")), 3.0)
+        self.assertIsNone(retry_after_seconds(RateLimited()))
+        http_date = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 30))
+        self.assertAlmostEqual(retry_after_seconds(RateLimited(http_date)), 30, delta=2)
+
+
+class BulkIndexerTests(unittest.TestCase):
+    def setUp(self):
+        self.embed_calls = []
+        self.upserts = []
+        self.sleeps = []
+        self.lock = threading.Lock()
+
+    def _embed(self, texts):
+        with self.lock:
+            self.embed_calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    def _upsert(self, vectors):
+        with self.lock:
+            self.upserts.append([v["id"] for v in vectors])
+
+    def _indexer(self, **kwargs):
+        kwargs.setdefault("embed_fn", self._embed)
+        kwargs.setdefault("upsert_fn", self._upsert)
+        kwargs.setdefault("sleep", self.sleeps.append)
+        kwargs.setdefault("on_progress", lambda report: None)
+        return BulkIndexer(**kwargs)
+
+    def test_batches_embeddings_and_upserts(self):
+        report = self._indexer(embed_batch_items=250, upsert_batch=100, max_workers=3).run(_records(600))
+
+        self.assertEqual(sorted(len(c) for c in self.embed_calls), [100, 250, 250])
+        self.assertTrue(all(len(u) <= 100 for u in self.upserts))
+        self.assertEqual(report["upserted"], 600)
+        self.assertEqual(sorted(report["upserted_ids"]), sorted(r[0] for r in _records(600)))
+        self.assertEqual(report["failed_ids"], [])
+        self.assertGreater(report["records_per_s"], 0)
+
+    def test_rate_limits_are_retried_with_retry_after(self):
+        failures = [RateLimited("2"), RateLimited()]
+
+        def flaky_upsert(vectors):
+            if failures:
+                raise failures.pop(0)
+            self._upsert(vectors)
+
+        report = self._indexer(upsert_fn=flaky_upsert, base_delay=0.5).run(_records(5))
+
+        self.assertEqual(report["upserted"], 5)
+        self.assertEqual(report["retries"], 2)
+        self.assertEqual(self.sleeps[0], 2.0)
+        self.assertLessEqual(self.sleeps[1], 1.0)
+
+    def test_bad_records_are_isolated_and_reported(self):
+        def picky_embed(texts):
+            if any(t.startswith("bad") for t in texts):
+                raise BadRequest("input too long")
+            return self._embed(texts)
+
+        records = _records(7)
+        records[4] = ("svc-4", "bad text", {})
+        report = self._indexer(embed_fn=picky_embed, max_workers=1).run(records)
+
+        self.assertEqual(report["failed_ids"], ["svc-4"])
+        self.assertEqual(report["upserted"], 6)
+        self.assertEqual(self.sleeps, [])
+
+    def test_exhausted_retries_fail_only_that_batch(self):
+        def upsert(vectors):
+            if "svc-0" in [v["id"] for v in vectors]:
+                raise RateLimited("1")
+            self._upsert(vectors)
+
+        report = self._indexer(upsert_fn=upsert, upsert_batch=2, max_retries=2).run(_records(4))
+
+        self.assertEqual(sorted(report["failed_ids"]), ["svc-0", "svc-1"])
+        self.assertEqual(sorted(report["upserted_ids"]), ["svc-2", "svc-3"])
+        self.assertEqual(len(self.sleeps), 2)
+
+    def test_metadata_only_records_skip_embedding(self):
+        updates = []
+        report = self._indexer(update_fn=lambda rid, md: updates.append((rid, md))).run(
+            _records(2), metadata_only=[("svc-9", "unchanged text", {"city": "Waterloo"})]
+        )
+
+        self.assertEqual(updates, [("svc-9", {"city": "Waterloo"})])
+        self.assertNotIn("unchanged text", [t for call in self.embed_calls for t in call])
+        self.assertEqual(report["updated_ids"], ["svc-9"])
+        self.assertEqual(report["upserted"], 2)
+
+    def test_progress_is_reported_per_batch(self):
+        seen = []
+        self._indexer(upsert_batch=2, on_progress=lambda r: seen.append(r["done"])).run(_records(5))
+        self.assertEqual(seen, [2, 4, 5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+os.environ.setdefault("PINECONE_API_KEY", "test-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-openai")
+
+from app.ivf_index import IVFBackend, build_ivf, evaluate
+
+
+def _corpus(n=600, dim=16, clusters=12, seed=3):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    vectors = (centers[labels] + 0.2 * rng.normal(size=(n, dim))).astype(np.float32)
+    ids = [f"svc-{i}" for i in range(n)]
+    metadata = [{"city": "Waterloo" if i % 3 == 0 else "Cedar Falls", "n": i} for i in range(n)]
+    return ids, vectors, metadata
+
+
+class IVFIndexTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = tmp.name
+        self.ids, self.vectors, self.metadata = _corpus()
+
+    def _backend(self, dtype="int8", nprobe=4, rerank=4):
+        build_ivf(os.path.join(self.path, "ns"), self.ids, self.vectors, self.metadata, nlist=12, dtype=dtype)
+        backend = IVFBackend.load(self.path, nprobe=nprobe, rerank=rerank)
+        for shard in backend._shards.values():
+            self.addCleanup(shard.close)
+        return backend
+
+    def test_recall_against_exact_search(self):
+        for dtype in ("int8", "float16"):
+            with self.subTest(dtype=dtype):
+                report = evaluate(self._backend(dtype), self.vectors[:40], top_k=5, namespace="ns")
+                self.assertGreaterEqual(report["recall@5"], 0.95)
+                self.assertIn("p95", report["ivf_ms"])
+
+    def test_scores_are_exact_float32_cosines(self):
+        backend = self._backend()
+        hit = backend.query(self.vectors[7], top_k=1, namespace="ns")[0]
+
+        self.assertEqual(hit["id"], "svc-7")
+        self.assertAlmostEqual(hit["score"], 1.0, places=5)
+
+    def test_filter_and_metadata_are_read_from_records(self):
+        backend = self._backend()
+        hits = backend.query(self.vectors[1], top_k=3, metadata_filter={"city": {"$eq": "Waterloo"}}, namespace="ns")
+
+        self.assertEqual(len(hits), 3)
+        self.assertTrue(all(h["metadata"]["city"] == "Waterloo" for h in hits))
+
+    def test_upserts_shadow_indexed_rows(self):
+        backend = self._backend()
+        backend.upsert([{"id": "svc-7", "values": list(self.vectors[8]), "metadata": {"edited": True}}], "ns")
+
+        hits = backend.query(self.vectors[8], top_k=5, namespace="ns")
+        self.assertEqual([h for h in hits if h["id"] == "svc-7"][0]["metadata"], {"edited": True})
+        self.assertEqual(len([h for h in hits if h["id"] == "svc-7"]), 1)
+
+        backend.flush()
+        reloaded = IVFBackend.load(self.path)
+        for shard in reloaded._shards.values():
+            self.addCleanup(shard.close)
+        self.assertIn("svc-7", reloaded.delta.ids("ns"))
+
+    def test_find_uses_the_saved_id_table(self):
+        shard = self._backend()._shards["ns"]
+        for rid in ("svc-0", "svc-7", "svc-599"):
+            self.assertEqual(shard.record(shard.find(rid))[0], rid)
+        self.assertIsNone(shard.find("svc-600"))
+
+        # Shards built before the table existed fall back to scanning the records.
+        os.remove(os.path.join(self.path, "ns", "id_hashes.npy"))
+        os.remove(os.path.join(self.path, "ns", "id_rows.npy"))
+        old = IVFBackend.load(self.path)._shards["ns"]
+        self.addCleanup(old.close)
+        self.assertEqual(old.find("svc-7"), shard.find("svc-7"))
+
+    def test_metadata_edit_moves_the_row_to_the_overlay(self):
+        backend = self._backend()
+
+        self.assertTrue(backend.update_metadata("svc-7", {"edited": True}, "ns"))
+        self.assertFalse(backend.update_metadata("svc-600", {"edited": True}, "ns"))
+        hit = backend.query(self.vectors[7], top_k=1, namespace="ns")[0]
+        self.assertEqual((hit["id"], hit["metadata"]), ("svc-7", {"edited": True}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+import orjson
+
+from app.jsonl_store import JsonlIndex, RecordStore
+
+
+class JsonlStoreTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "prepared_metadata.jsonl")
+        rows = [{"id": f"svc-{i}", "city": "Waterloo", "n": i} for i in range(20)]
+        rows.append({"resource_id": "res-1", "city": "Ames"})
+        rows.append({"id": "svc-3", "city": "Cedar Falls"})  # later line wins
+        with open(self.path, "wb") as f:
+            f.write(b"".join(orjson.dumps(r) + b"\n\n" for r in rows))
+
+    def test_reads_records_by_offset_and_persists_sidecar(self):
+        index = JsonlIndex(self.path, cache_items=4)
+        self.addCleanup(index.close)
+        self.assertEqual(len(index), 21)
+        self.assertEqual(index.get("svc-7")["n"], 7)
+        self.assertEqual(index.get("svc-3"), {"id": "svc-3", "city": "Cedar Falls"})
+        self.assertEqual(index.get("res-1")["city"], "Ames")
+        self.assertIsNone(index.get("missing"))
+        self.assertTrue(os.path.exists(index.sidecar))
+
+        with open(index.sidecar, "rb") as f:
+            sidecar = orjson.loads(f.read())
+        reopened = JsonlIndex(self.path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(reopened.get("svc-19")["n"], 19)
+        self.assertEqual(len(sidecar["ids"]), 21)
+
+    def test_stale_sidecar_is_rebuilt(self):
+        JsonlIndex(self.path).close()
+        with open(self.path, "ab") as f:
+            f.write(orjson.dumps({"id": "svc-new", "n": 99}) + b"\n")
+        index = JsonlIndex(self.path)
+        self.addCleanup(index.close)
+        self.assertEqual(index.get("svc-new")["n"], 99)
+
+    def test_overlay_and_compaction(self):
+        store = RecordStore(self.path)
+        self.addCleanup(store.close)
+        edited = {"id": "svc-1", "city": "Evansdale"}
+        store["svc-1"] = edited
+        store["svc-new"] = {"id": "svc-new"}
+        self.assertEqual(store["svc-1"]["city"], "Evansdale")
+        self.assertIn("svc-new", store)
+        self.assertEqual(len(store), 22)
+
+        snapshot = dict(store.overlay)
+        store["svc-2"] = {"id": "svc-2", "city": "edited during compaction"}
+        ids = sorted(set(store) - {"svc-2"})
+        store.compact(ids, snapshot, lambda rid: {"id": rid})
+        store.forget(snapshot)
+
+        self.assertEqual(list(store.overlay), ["svc-2"])
+        self.assertEqual(store.base.get("svc-1")["city"], "Evansdale")
+        self.assertEqual(store.base.get("svc-3")["city"], "Cedar Falls")
+        self.assertEqual(store.base.get("svc-new"), {"id": "svc-new"})
+        with open(self.path, "rb") as f:
+            self.assertEqual(len(f.read().splitlines()), len(ids))
+
+
+if __name__ == "__main__":
+    unittest.main()
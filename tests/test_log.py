@@ -0,0 +1,74 @@
+import asyncio
+import json
+import logging
+import queue
+import unittest
+
+from app import log as app_log
+from app.fanout import run_bounded
+
+
+def _record(level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord("app.retriever", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class LogTests(unittest.TestCase):
+    def test_json_lines_carry_request_id_and_extra_fields(self):
+        token = app_log.request_id.set("req-1")
+        self.addCleanup(app_log.request_id.reset, token)
+        record = _record(matches=3, sampled=True)
+        self.assertTrue(app_log._RequestContext(1.0).filter(record))
+
+        entry = json.loads(app_log.JsonFormatter().format(record))
+
+        self.assertEqual(entry["request_id"], "req-1")
+        self.assertEqual(entry["msg"], "hello world")
+        self.assertEqual(entry["level"], "info")
+        self.assertEqual(entry["matches"], 3)
+        self.assertNotIn("sampled", entry)
+
+    def test_sampling_drops_chatter_but_never_warnings(self):
+        never = app_log._RequestContext(0.0)
+        self.assertFalse(never.filter(_record(sampled=True)))
+        self.assertTrue(never.filter(_record()))
+        self.assertTrue(never.filter(_record(logging.WARNING, sampled=True)))
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = app_log._DroppingQueueHandler(queue.Queue(maxsize=1))
+        handler.handle(_record())
+        handler.handle(_record())
+        self.assertEqual(handler.dropped, 1)
+        queued = handler.queue.get_nowait()
+        self.assertEqual((queued.msg, queued.args), ("hello world", None))
+
+    def test_request_id_reaches_fanout_workers(self):
+        token = app_log.request_id.set("req-2")
+        self.addCleanup(app_log.request_id.reset, token)
+        seen = run_bounded([app_log.request_id.get] * 3, max_workers=3)
+        self.assertEqual(seen, ["req-2"] * 3)
+
+    def test_middleware_sets_and_echoes_request_id(self):
+        seen = []
+
+        async def inner(scope, receive, send):
+            seen.append(app_log.request_id.get())
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "headers": [(b"x-request-id", b"abc")]}
+        asyncio.run(app_log.RequestIdMiddleware(inner)(scope, None, send))
+
+        self.assertEqual(seen, ["abc"])
+        self.assertIn((b"x-request-id", b"abc"), sent[0]["headers"])
+        self.assertEqual(app_log.request_id.get(), "-")
+
+
+if __name__ == "__main__":
+    unittest.main()
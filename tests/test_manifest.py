@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+
+from app.manifest import EMBED, METADATA, SKIP, IndexManifest
+
+
+class IndexManifestTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "index_manifest.json")
+
+    def test_classifies_by_text_and_metadata_hash(self):
+        manifest = IndexManifest(self.path, "embed-v1")
+        md = {"id": "svc-1", "city": "Waterloo", "languages": ["English"]}
+        self.assertEqual(manifest.classify("svc-1", "Food pantry", md), EMBED)
+
+        manifest.record("svc-1", "Food pantry", md | {"text": "Food pantry"})
+        self.assertEqual(manifest.classify("svc-1", "Food pantry", dict(reversed(list(md.items())))), SKIP)
+        self.assertEqual(manifest.classify("svc-1", "Food pantry", md | {"city": "Cedar Falls"}), METADATA)
+        self.assertEqual(manifest.classify("svc-1", "Food pantry, open Tuesdays", md), EMBED)
+
+    def test_model_change_forces_reembed(self):
+        manifest = IndexManifest(self.path, "embed-v1")
+        manifest.record("svc-1", "Food pantry", {})
+        manifest.save()
+
+        self.assertEqual(IndexManifest(self.path, "embed-v1").classify("svc-1", "Food pantry", {}), SKIP)
+        self.assertEqual(IndexManifest(self.path, "embed-v2").classify("svc-1", "Food pantry", {}), EMBED)
+
+    def test_unreadable_manifest_starts_empty(self):
+        with open(self.path, "w") as f:
+            f.write("{not json")
+        self.assertEqual(len(IndexManifest(self.path, "embed-v1")), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import threading
+import unittest
+from types import SimpleNamespace
+
+from app import metrics
+from app.metrics import Counter, Gauge, Histogram, Registry
+
+
+class MetricsTests(unittest.TestCase):
+    def setUp(self):
+        # A private registry so these tests don't see (or leave behind) app metrics.
+        self.registry = Registry()
+        self.addCleanup(setattr, metrics, "REGISTRY", metrics.REGISTRY)
+        metrics.REGISTRY = self.registry
+
+    def test_renders_prometheus_text(self):
+        requests = Counter("test_requests_total", "Requests.", ("path",))
+        latency = Histogram("test_seconds", "Latency.", ("op",), buckets=(0.1, 1.0))
+        requests.labels('/a"b').inc()
+        requests.labels('/a"b').inc(2)
+        child = latency.labels("embed")
+        child.observe(0.05)
+        child.observe(0.5)
+        child.observe(5)
+
+        text = self.registry.render()
+
+        self.assertIn("# TYPE test_requests_total counter", text)
+        self.assertIn('test_requests_total{path="/a\\"b"} 3', text)
+        self.assertIn("# TYPE test_seconds histogram", text)
+        self.assertIn('test_seconds_bucket{op="embed",le="0.1"} 1', text)
+        self.assertIn('test_seconds_bucket{op="embed",le="1"} 2', text)
+        self.assertIn('test_seconds_bucket{op="embed",le="+Inf"} 3', text)
+        self.assertIn('test_seconds_count{op="embed"} 3', text)
+        self.assertIn('test_seconds_sum{op="embed"} 5.55', text)
+        self.assertTrue(text.endswith("\n"))
+
+    def test_updates_from_many_threads_are_not_lost(self):
+        counter = Counter("test_total", "Count.", ("worker",))
+        latency = Histogram("test_latency_seconds", "Latency.")
+        barrier = threading.Barrier(8)
+
+        def work():
+            barrier.wait()
+            for _ in range(2000):
+                counter.labels("shared").inc()
+                latency.labels().observe(0.01)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(counter.labels("shared").value, 16000)
+        self.assertIn("test_latency_seconds_count 16000", self.registry.render())
+
+    def test_wrong_label_count_is_rejected(self):
+        counter = Counter("test_labelled_total", "Count.", ("a", "b"))
+        with self.assertRaises(ValueError):
+            counter.labels("only-one")
+
+    def test_failing_gauge_is_logged_and_skipped(self):
+        def broken():
+            raise RuntimeError("stats unavailable")
+
+        Gauge("test_broken", "Broken.", ("cache",), broken)
+        with self.assertLogs("app.metrics", "WARNING") as logs:
+            text = self.registry.render()
+
+        self.assertNotIn("test_broken{", text)
+        self.assertIn("Gauge test_broken failed: stats unavailable", logs.output[0])
+
+
+class UsageTests(unittest.TestCase):
+    def test_records_openai_and_pinecone_usage(self):
+        tokens = metrics.OPENAI_TOKENS
+        before_in = tokens.labels("responses", "test-model", "input").value
+        before_out = tokens.labels("responses", "test-model", "output").value
+        before_embed = tokens.labels("embeddings", "test-embed", "input").value
+        before_ru = metrics.PINECONE_READ_UNITS.labels("query").value
+
+        metrics.record_openai_usage(
+            "responses", "test-model", SimpleNamespace(usage=SimpleNamespace(input_tokens=120, output_tokens=30))
+        )
+        metrics.record_openai_usage("embeddings", "test-embed", {"usage": {"prompt_tokens": 9}})
+        metrics.record_openai_usage("responses", "test-model", SimpleNamespace())
+        metrics.record_pinecone_usage("query", {"usage": {"read_units": 5}})
+        metrics.record_pinecone_usage("query", SimpleNamespace(usage=None))
+
+        self.assertEqual(tokens.labels("responses", "test-model", "input").value - before_in, 120)
+        self.assertEqual(tokens.labels("responses", "test-model", "output").value - before_out, 30)
+        self.assertEqual(tokens.labels("embeddings", "test-embed", "input").value - before_embed, 9)
+        self.assertEqual(metrics.PINECONE_READ_UNITS.labels("query").value - before_ru, 5)
+
+    def test_cache_gauges_read_stats_at_scrape_time(self):
+        registry = Registry()
+        self.addCleanup(setattr, metrics, "REGISTRY", metrics.REGISTRY)
+        metrics.REGISTRY = registry
+
+        stats = {"exact_hits": 2, "near_hits": 1, "misses": 4, "size": 7}
+        cache = SimpleNamespace(stats=lambda: dict(stats))
+        disk_cache = SimpleNamespace(stats=lambda: {"memory_hits": 3, "disk_hits": 2, "misses": 1, "memory_size": 5})
+        metrics.register_cache_gauges({"needs": cache, "summary": disk_cache})
+
+        stats["misses"] = 6
+        text = registry.render()
+
+        self.assertIn('rag_cache_hits{cache="needs"} 3', text)
+        self.assertIn('rag_cache_misses{cache="needs"} 6', text)
+        self.assertIn('rag_cache_size{cache="needs"} 7', text)
+        self.assertIn('rag_cache_hits{cache="summary"} 5', text)
+        self.assertIn('rag_cache_size{cache="summary"} 5', text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 import unittest
@@ -10,7 +11,9 @@ with mock.patch("pinecone.Pinecone") as MockPinecone:
     MockPinecone.return_value.Index.return_value = mock.MagicMock()
     from app.main import NeedRequest, needs as needs_endpoint
 
-from app.needs import FALLBACK_RESPONSE, extract_needs
+from app import needs as needs_module
+from app.needs import FALLBACK_RESPONSE, extract_needs, extract_needs_async
+from app.needs_cache import NeedsCache
 
 
 class NeedsExtractionTests(unittest.TestCase):
@@ -39,6 +42,114 @@ class NeedsExtractionTests(unittest.TestCase):
         result = extract_needs("Needs rent help", response_fetcher=stub_fetcher)
         self.assertEqual(result, FALLBACK_RESPONSE)
 
+    def test_async_extraction_matches_sync(self):
+        payload = {"needs": [{"slug": "Rent Help", "query": "emergency rent assistance"}], "confidence": 0.6}
+
+        async def stub_fetcher(messages, schema):
+            return json.dumps(payload)
+
+        result = asyncio.run(extract_needs_async("Behind on rent", response_fetcher=stub_fetcher))
+        self.assertEqual(result["needs"], [{"slug": "rent-help", "query": "emergency rent assistance"}])
+        self.assertAlmostEqual(result["confidence"], 0.6)
+
+
+class NeedsCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.cache = NeedsCache(max_items=8, ttl=None, threshold=0.95)
+        patcher = mock.patch.object(needs_module, "needs_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.calls = 0
+
+    def _fetcher(self, messages, schema):
+        self.calls += 1
+        return json.dumps({"needs": [{"slug": "food", "query": "food pantry"}], "confidence": 0.9})
+
+    def test_exact_repeat_skips_model(self):
+        first = extract_needs("Need  FOOD for my kids", response_fetcher=self._fetcher)
+        second = extract_needs("need food for my kids", response_fetcher=self._fetcher)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.stats()["exact_hits"], 1)
+
+    def test_near_duplicate_uses_story_vector(self):
+        extract_needs("I need food for my two kids", response_fetcher=self._fetcher, story_vector=[1.0, 0.1, 0.0])
+        extract_needs("I need food for my three kids", response_fetcher=self._fetcher, story_vector=[1.0, 0.12, 0.0])
+        extract_needs("Looking for a job", response_fetcher=self._fetcher, story_vector=[0.0, 0.0, 1.0])
+
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.cache.stats()["near_hits"], 1)
+
+    def test_fallback_results_are_not_cached(self):
+        def failing(messages, schema):
+            self.calls += 1
+            return "not-json"
+
+        extract_needs("Needs rent help", response_fetcher=failing)
+        result = extract_needs("Needs rent help", response_fetcher=self._fetcher)
+
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(result["needs"][0]["slug"], "food")
+
+    def test_cached_results_are_copies(self):
+        first = extract_needs("Need food", response_fetcher=self._fetcher)
+        first["needs"][0]["slug"] = "changed"
+
+        self.assertEqual(extract_needs("Need food", response_fetcher=self._fetcher)["needs"][0]["slug"], "food")
+
+    def test_async_extraction_shares_cache(self):
+        async def fetcher(messages, schema):
+            return self._fetcher(messages, schema)
+
+        asyncio.run(extract_needs_async("Need food", response_fetcher=fetcher))
+        extract_needs("Need food", response_fetcher=self._fetcher)
+
+        self.assertEqual(self.calls, 1)
+
+    def test_model_call_starts_before_the_story_vector_lands(self):
+        extract_needs("I need food for my two kids", response_fetcher=self._fetcher, story_vector=[1.0, 0.1, 0.0])
+        events = []
+
+        async def run():
+            vector = asyncio.get_running_loop().create_future()
+
+            async def fetcher(messages, schema):
+                events.append("model started")
+                await asyncio.sleep(1)
+                events.append("model finished")
+                return self._fetcher(messages, schema)
+
+            task = asyncio.create_task(
+                extract_needs_async("I need food for my three kids", response_fetcher=fetcher, story_vector=vector)
+            )
+            await asyncio.sleep(0.01)
+            events.append("vector ready")
+            vector.set_result([1.0, 0.12, 0.0])
+            return await task
+
+        result = asyncio.run(run())
+
+        # Near-duplicate found once the vector arrived; the in-flight model call was cancelled.
+        self.assertEqual(events, ["model started", "vector ready"])
+        self.assertEqual(result["needs"][0]["slug"], "food")
+        self.assertEqual(self.calls, 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["near_hits"], stats["misses"]), (1, 1, 1))
+
+    def test_vector_rows_are_reused_after_eviction(self):
+        cache = NeedsCache(max_items=2, ttl=None, threshold=0.95)
+        result = {"needs": [], "confidence": 0.0}
+        cache.put("a", result, [1.0, 0.0])
+        cache.put("b", result, [0.0, 1.0])
+        cache.put("a", result, [1.0, 0.05])
+        cache.put("c", result, [0.7, 0.7])  # evicts "b"
+
+        self.assertEqual(cache._matrix.shape[0], 3)
+        self.assertIsNone(cache.get_near([0.0, 1.0]))
+        self.assertIsNotNone(cache.get_near([0.71, 0.7]))
+        self.assertIsNotNone(cache.get_near([1.0, 0.0]))
+
 
 if __name__ == "__main__":
     unittest.main()
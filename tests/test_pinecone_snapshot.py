@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from app.pinecone_snapshot import PineconeSnapshot
+
+
+class FakeIndex:
+    """list_paginated/fetch over an in-memory namespace, pages of 3 ids."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.fetched = []
+        self.pages = 0
+
+    def list_paginated(self, namespace="", limit=100, pagination_token=None):
+        ids = sorted(self.vectors)
+        start = int(pagination_token or 0)
+        self.pages += 1
+        nxt = str(start + 3) if start + 3 < len(ids) else None
+        return SimpleNamespace(
+            vectors=[SimpleNamespace(id=rid) for rid in ids[start:start + 3]],
+            pagination=SimpleNamespace(next=nxt) if nxt else None,
+        )
+
+    def fetch(self, ids, namespace=""):
+        self.fetched.extend(ids)
+        return SimpleNamespace(vectors={
+            rid: SimpleNamespace(metadata=self.vectors[rid]) for rid in ids if rid in self.vectors
+        })
+
+
+def _vectors(n):
+    return {f"svc-{i}": {"text": f"text {i}", "city": "Waterloo", "rank": i} for i in range(n)}
+
+
+class PineconeSnapshotTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "pinecone_snapshot.jsonl")
+
+    def _snapshot(self):
+        snap = PineconeSnapshot(self.path)
+        self.addCleanup(snap.close)
+        return snap
+
+    def test_full_then_incremental_sync(self):
+        index = FakeIndex(_vectors(8))
+        snap = self._snapshot()
+        self.assertFalse(snap.synced)
+
+        report = snap.sync(index, "ns")
+        self.assertEqual((report["listed"], report["fetched"]), (8, 8))
+        self.assertEqual(index.pages, 3)
+        self.assertEqual(snap.get("svc-5")["text"], "text 5")
+
+        del index.vectors["svc-0"]
+        index.vectors["svc-9"] = {"text": "new"}
+        index.vectors["svc-3"] = {"text": "changed remotely"}
+        index.fetched.clear()
+        report = snap.sync(index, "ns", stale=["svc-3"])
+
+        self.assertEqual(sorted(index.fetched), ["svc-3", "svc-9"])
+        self.assertEqual(report["removed"], 1)
+        self.assertIsNone(snap.get("svc-0"))
+        self.assertEqual(snap.get("svc-3")["text"], "changed remotely")
+
+        reopened = self._snapshot()
+        self.assertTrue(reopened.synced)
+        self.assertEqual(len(reopened), 8)
+        self.assertEqual(reopened.get("svc-9"), {"text": "new"})
+
+    def test_applied_upserts_persist(self):
+        snap = self._snapshot()
+        snap.sync(FakeIndex(_vectors(3)), "ns")
+        snap.apply([("svc-1", {"text": "re-embedded"})])
+        snap.apply([("svc-2", {"city": "Ames"})], merge=True)
+        snap.save()
+
+        reopened = self._snapshot()
+        self.assertEqual(reopened.get("svc-1"), {"text": "re-embedded"})
+        self.assertEqual(reopened.get("svc-2"), {"text": "text 2", "city": "Ames", "rank": 2})
+
+    def test_drift_report(self):
+        remote = _vectors(4)
+        snap = self._snapshot()
+        snap.sync(FakeIndex(remote), "ns")
+
+        local = {rid: (md["text"], {k: v for k, v in md.items() if k != "text"}) for rid, md in remote.items()}
+        local["svc-1"] = ("edited text", local["svc-1"][1])
+        local["svc-2"] = (local["svc-2"][0], {"city": "Ames", "rank": 2, "phone": None})
+        local["svc-7"] = ("only here", {})
+        del local["svc-3"]
+        report = snap.drift(sorted(local), lambda rid: local[rid])
+
+        self.assertEqual(report["text_changed_ids"], ["svc-1"])
+        self.assertEqual(report["metadata_changed_ids"], ["svc-2"])
+        self.assertEqual(report["missing_remote_ids"], ["svc-7"])
+        self.assertEqual(report["extra_remote_ids"], ["svc-3"])
+        self.assertEqual(report["needs_upsert"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
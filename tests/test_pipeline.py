@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+
+from app.pipeline import Stage, iter_stages, run_stages
+
+
+class RunStagesTests(unittest.TestCase):
+    def test_independent_stages_overlap(self):
+        started = {}
+
+        def stage(name, delay, value):
+            async def fn(inputs):
+                started[name] = asyncio.get_running_loop().time()
+                await asyncio.sleep(delay)
+                return value(inputs)
+            return fn
+
+        stages = [
+            Stage("needs", stage("needs", 0.1, lambda _: ["food"])),
+            Stage("story", stage("story", 0.1, lambda _: ["svc-1"])),
+            Stage("merge", stage("merge", 0, lambda i: i["needs"] + i["story"]), ("needs", "story")),
+        ]
+
+        results, timings = asyncio.run(run_stages(stages))
+
+        self.assertEqual(results["merge"], ["food", "svc-1"])
+        self.assertLess(abs(started["needs"] - started["story"]), 0.05)
+        self.assertLess(timings["total"]["duration_ms"], 180)
+        self.assertGreaterEqual(timings["merge"]["start_ms"], 90)
+
+    def test_stage_order_is_validated(self):
+        async def noop(inputs):
+            return None
+
+        with self.assertRaises(ValueError):
+            asyncio.run(run_stages([Stage("b", noop, ("a",)), Stage("a", noop)]))
+
+    def test_errors_propagate(self):
+        async def boom(inputs):
+            raise RuntimeError("boom")
+
+        async def after(inputs):
+            return inputs
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run_stages([Stage("a", boom), Stage("b", after, ("a",))]))
+
+    def test_iter_stages_yields_in_completion_order(self):
+        def stage(delay, value):
+            async def fn(inputs):
+                await asyncio.sleep(delay)
+                return value
+            return fn
+
+        async def collect():
+            timings = {}
+            names = [name async for name, _ in iter_stages(
+                [Stage("slow", stage(0.05, 1)), Stage("fast", stage(0, 2))], timings
+            )]
+            return names, timings
+
+        names, timings = asyncio.run(collect())
+        self.assertEqual(names, ["fast", "slow"])
+        self.assertIn("total", timings)
+
+
+if __name__ == "__main__":
+    unittest.main()
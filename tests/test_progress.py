@@ -0,0 +1,69 @@
+import os
+import tempfile
+import time
+import unittest
+
+import orjson
+
+from app.progress import ProgressStore
+
+
+class ProgressStoreTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "progress.json")
+
+    def _on_disk(self):
+        with open(self.path, "rb") as f:
+            return orjson.loads(f.read())
+
+    def test_changes_are_coalesced_into_one_write(self):
+        store = ProgressStore(self.path, delay=60, max_pending=1000)
+        self.addCleanup(store.close)
+        for i in range(50):
+            store.set_dirty(f"svc-{i}")
+            store.mark_reviewed(f"svc-{i}")
+        self.assertEqual(store.writes, 0)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIn("svc-7", store.dirty)
+
+        self.assertTrue(store.flush())
+        self.assertFalse(store.flush())
+        self.assertEqual(store.writes, 1)
+        self.assertEqual(len(self._on_disk()["dirty"]), 50)
+
+    def test_background_flush_after_max_pending(self):
+        store = ProgressStore(self.path, delay=60, max_pending=3)
+        self.addCleanup(store.close)
+        for rid in ("a", "b", "c"):
+            store.set_dirty(rid)
+        deadline = time.monotonic() + 5
+        while store.writes == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self._on_disk(), {"reviewed": [], "dirty": ["a", "b", "c"]})
+
+    def test_background_flush_after_delay(self):
+        store = ProgressStore(self.path, delay=0.05, max_pending=1000)
+        self.addCleanup(store.close)
+        store.mark_reviewed("a")
+        deadline = time.monotonic() + 5
+        while store.writes == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self._on_disk()["reviewed"], ["a"])
+
+    def test_close_persists_and_reload_restores(self):
+        store = ProgressStore(self.path, delay=60)
+        store.set_dirty("a")
+        store.set_dirty("b")
+        store.clear_dirty(["a", "zzz"])
+        store.mark_reviewed("b")
+        store.close()
+
+        again = ProgressStore(self.path)
+        self.assertEqual((again.dirty, again.reviewed), ({"b"}, {"b"}))
+        self.assertEqual(again.pending, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
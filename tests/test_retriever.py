@@ -0,0 +1,146 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+os.environ.setdefault("PINECONE_API_KEY", "test-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-openai")
+
+with mock.patch("pinecone.Pinecone") as MockPinecone:
+    MockPinecone.return_value.Index.return_value = mock.MagicMock()
+    from app import retriever
+
+from app.cache import SQLiteStore
+from app.result_cache import RetrievalCache, canonical_filter
+
+
+def _match(rid, score):
+    return SimpleNamespace(id=rid, score=score, metadata={"resource_name": rid})
+
+
+class RetrievalCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.cache = RetrievalCache(16, ttl=60)
+        self.index = mock.MagicMock()
+        self.index.query.return_value = SimpleNamespace(matches=[_match("svc-1", 0.9)])
+        for target, value in (
+            ("retrieval_cache", self.cache),
+            ("index", self.index),
+            ("embed_query", lambda text: [0.1, 0.2]),
+        ):
+            patcher = mock.patch.object(retriever, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_identical_search_is_served_from_cache(self):
+        first = retriever.retrieve("food pantry in Waterloo", top_k=5, metadata_filters={"city": {"$eq": "Waterloo"}})
+        first[0]["metadata"]["mutated"] = True
+        second = retriever.retrieve("food  pantry in Waterloo", top_k=5, metadata_filters={"city": {"$eq": "Waterloo"}})
+
+        self.assertEqual(self.index.query.call_count, 1)
+        self.assertEqual(second[0]["id"], "svc-1")
+        self.assertNotIn("mutated", second[0]["metadata"])
+
+    def test_different_filter_or_top_k_misses(self):
+        retriever.retrieve("food", top_k=5, metadata_filters={"city": {"$eq": "Waterloo"}})
+        retriever.retrieve("food", top_k=5, metadata_filters={"city": {"$eq": "Cedar Falls"}})
+        retriever.retrieve("food", top_k=6, metadata_filters={"city": {"$eq": "Waterloo"}})
+
+        self.assertEqual(self.index.query.call_count, 3)
+
+    def test_invalidate_forces_fresh_search(self):
+        retriever.retrieve("food", top_k=5)
+        key = self.cache.key("food", 5, None, None)
+        self.cache.invalidate()
+        retriever.retrieve("food", top_k=5)
+
+        self.assertEqual(self.index.query.call_count, 2)
+        # Results from a search that started before the bump are never stored.
+        self.cache.put(key, [{"id": "stale", "metadata": {}}])
+        self.assertIsNone(self.cache.get(key))
+
+    def test_errors_are_not_cached(self):
+        self.index.query.side_effect = [RuntimeError("boom"), SimpleNamespace(matches=[_match("svc-2", 0.5)])]
+
+        self.assertEqual(retriever.retrieve("food", top_k=5), [])
+        self.assertEqual(retriever.retrieve("food", top_k=5)[0]["id"], "svc-2")
+
+    def test_retrieve_many_uses_cache_when_queries_given(self):
+        retriever.retrieve_many([[0.1], [0.2]], top_k=[3, 4], queries=["a", "b"])
+        results = retriever.retrieve_many([[0.1], [0.2]], top_k=[3, 4], queries=["a", "b"])
+
+        self.assertEqual(self.index.query.call_count, 2)
+        self.assertEqual([r[0]["id"] for r in results], ["svc-1", "svc-1"])
+
+    def test_retrieve_async_with_vector_skips_embedding_and_uses_cache(self):
+        backend = mock.MagicMock()
+        backend.query_async = mock.AsyncMock(return_value=[{"id": "svc-3", "score": 0.7, "metadata": {}}])
+        embed = mock.AsyncMock(return_value=[0.1, 0.2])
+        with mock.patch.object(retriever, "backend", backend), \
+             mock.patch.object(retriever, "embed_query_async", embed):
+            first = asyncio.run(retriever.retrieve_async("story", top_k=5, query_vector=[0.3, 0.4]))
+            second = asyncio.run(retriever.retrieve_async("story", top_k=5))
+
+        embed.assert_not_called()
+        backend.query_async.assert_awaited_once_with([0.3, 0.4], 5, None, retriever.NAMESPACE)
+        self.assertEqual([first[0]["id"], second[0]["id"]], ["svc-3", "svc-3"])
+
+    def _shared_store(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = SQLiteStore(os.path.join(tmp.name, "cache.sqlite3"), "cache_generations", 16)
+        self.addCleanup(store.close)
+        return store
+
+    def test_invalidation_reaches_other_workers_on_sync(self):
+        store = self._shared_store()
+        editor = RetrievalCache(16, ttl=60, shared=store, sync_interval=0)
+        other = RetrievalCache(16, ttl=60, shared=SQLiteStore(store.path, store.table, 16), sync_interval=0)
+        self.addCleanup(other.shared.close)
+
+        key = other.key("food", 5, None, None)
+        other.put(key, [{"id": "svc-1", "metadata": {}}])
+        editor.invalidate()
+        self.assertIsNotNone(other.get(other.key("food", 5, None, None)))
+
+        other.sync()
+        self.assertIsNone(other.get(other.key("food", 5, None, None)))
+        other.put(key, [{"id": "stale", "metadata": {}}])
+        self.assertIsNone(other.get(other.key("food", 5, None, None)))
+
+    def test_lookups_leave_sqlite_to_the_background_thread(self):
+        store = self._shared_store()
+        reads = []
+        original = store.get_many
+        store.get_many = lambda keys: reads.append(threading.get_ident()) or original(keys)
+        cache = RetrievalCache(16, ttl=60, shared=store, sync_interval=0.01)
+        self.addCleanup(cache.close)
+
+        cache.key("food", 5, None, None)
+        deadline = time.monotonic() + 5
+        while not reads and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(reads)
+        self.assertNotIn(threading.get_ident(), reads)
+
+    def test_disabled_cache_never_reads_the_shared_token(self):
+        store = mock.MagicMock()
+        cache = RetrievalCache(0, ttl=60, shared=store, sync_interval=0.01)
+        self.addCleanup(cache.close)
+
+        cache.key("food", 5, None, None)
+        time.sleep(0.05)
+        store.get_many.assert_not_called()
+
+    def test_canonical_filter_ignores_key_order(self):
+        a = {"city": {"$eq": "Waterloo"}, "languages": "Spanish"}
+        b = {"languages": "Spanish", "city": {"$eq": "Waterloo"}}
+        self.assertEqual(canonical_filter(a), canonical_filter(b))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+os.environ.setdefault("PINECONE_API_KEY", "test-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-openai")
+
+from app import generator
+from app.cache import LRUCache, SQLiteStore
+from app.summary_cache import SummaryCache
+
+
+def _resource(rid, text="Free groceries every Tuesday."):
+    return {"id": rid, "metadata": {"resource_name": f"Pantry {rid}", "text": text}}
+
+
+class SummaryCacheTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = SQLiteStore(os.path.join(tmp.name, "cache.sqlite3"), "card_summaries", 100)
+        self.addCleanup(store.close)
+        self.cache = SummaryCache("test-model", LRUCache(16), store)
+        self.prompts = []
+        self.needs_sent = []
+        self.contents = []
+
+        def fake_create(**kwargs):
+            content = kwargs["input"][1]["content"]
+            items = json.loads(content.split("Items JSON:\n", 1)[1].rsplit("\n", 1)[0])
+            self.prompts.append([it["id"] for it in items])
+            self.contents.append(content)
+            self.needs_sent.append([it.get("need") for it in items])
+            cards = [{"id": it["id"], "summary": f"model {it['id']}"} for it in items]
+            return SimpleNamespace(output_text=json.dumps({"cards": cards}))
+
+        fake_client = SimpleNamespace(responses=SimpleNamespace(create=fake_create))
+        for target, value in (("summary_cache", self.cache), ("client", fake_client)):
+            patcher = mock.patch.object(generator, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_only_misses_are_sent_to_the_model(self):
+        first = generator.generate_card_summaries("food pantry", [_resource("a")], need="food")
+        second = generator.generate_card_summaries(
+            "food pantry", [_resource("a"), _resource("b")], need="food"
+        )
+
+        self.assertEqual(self.prompts, [["a"], ["b"]])
+        self.assertEqual(first["a"], "model a")
+        self.assertEqual(second, {"a": "model a", "b": "model b"})
+
+    def test_changed_content_or_need_misses(self):
+        generator.generate_card_summaries("food pantry", [_resource("a")], need="food")
+        generator.generate_card_summaries("food pantry", [_resource("a", text="Now closed.")], need="food")
+        generator.generate_card_summaries("rent help", [_resource("a")], need="rent")
+
+        self.assertEqual(self.prompts, [["a"], ["a"], ["a"]])
+
+    def test_need_cards_are_written_without_the_story(self):
+        story = "I'm Dana, 34, recently evicted and need food and rent help"
+        generator.generate_card_summaries(
+            story, [_resource("a"), _resource("b"), _resource("c")],
+            needs={"a": ("food", "food pantry"), "b": ("rent", "rental assistance")},
+        )
+        other = "My name is Sam and I need groceries"
+        generator.generate_card_summaries(other, [_resource("a")], needs={"a": ("food", "food pantry")})
+
+        # Need cards go in one call without the story; the general card gets its own, with it.
+        self.assertEqual(self.prompts, [["a", "b"], ["c"]])
+        self.assertEqual(self.needs_sent, [["food pantry", "rental assistance"], [None]])
+        self.assertNotIn("Dana", self.contents[0])
+        self.assertIn("Dana", self.contents[1])
+
+    def test_invalidate_resource_drops_memory_and_disk_entries(self):
+        generator.generate_card_summaries("food pantry", [_resource("a")], need="food")
+        self.cache.invalidate_resource("a")
+        self.cache.memory.clear()
+        generator.generate_card_summaries("food pantry", [_resource("a")], need="food")
+
+        self.assertEqual(self.prompts, [["a"], ["a"]])
+
+    def test_fallback_summaries_are_not_cached(self):
+        def failing_create(**kwargs):
+            raise RuntimeError("upstream down")
+
+        with mock.patch.object(generator, "client", SimpleNamespace(responses=SimpleNamespace(create=failing_create))):
+            summaries = generator.generate_card_summaries("food", [_resource("a")], need="food")
+
+        self.assertTrue(summaries["a"].startswith("Pantry a"))
+        self.assertEqual(self.cache.store.count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
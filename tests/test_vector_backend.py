@@ -0,0 +1,109 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+os.environ.setdefault("PINECONE_API_KEY", "test-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-openai")
+
+from app.vector_backend import LocalBackend, match_filter
+
+
+def _records():
+    return [
+        {"id": "pantry", "values": [1.0, 0.0, 0.0],
+         "metadata": {"city": "Waterloo", "languages": ["English", "Spanish"], "free_or_low_cost": True}},
+        {"id": "shelter", "values": [0.8, 0.6, 0.0],
+         "metadata": {"city": "Waterloo", "languages": ["English"], "free_or_low_cost": False}},
+        {"id": "clinic", "values": [0.0, 1.0, 0.0],
+         "metadata": {"city": "Cedar Falls", "languages": ["Spanish"], "free_or_low_cost": True}},
+        {"id": "legal", "values": [0.0, 0.0, 2.0],
+         "metadata": {"city": "Cedar Falls", "languages": [], "free_or_low_cost": True}},
+    ]
+
+
+class MatchFilterTests(unittest.TestCase):
+    md = {"city": "Waterloo", "languages": ["English", "Spanish"], "free_or_low_cost": True, "rating": 4}
+
+    def test_build_filter_syntax(self):
+        self.assertTrue(match_filter(self.md, {"city": {"$eq": "Waterloo"}, "languages": "Spanish"}))
+        self.assertTrue(match_filter(self.md, {"free_or_low_cost": {"$eq": True}}))
+        self.assertFalse(match_filter(self.md, {"city": {"$eq": "Cedar Falls"}}))
+        self.assertFalse(match_filter(self.md, {"languages": "French"}))
+        self.assertTrue(match_filter(self.md, {}))
+
+    def test_operators(self):
+        self.assertTrue(match_filter(self.md, {"languages": {"$in": ["French", "Spanish"]}}))
+        self.assertTrue(match_filter(self.md, {"$and": [{"city": "Waterloo"}, {"rating": {"$gte": 4}}]}))
+        self.assertTrue(match_filter(self.md, {"$or": [{"city": "Ames"}, {"languages": "English"}]}))
+        self.assertFalse(match_filter(self.md, {"city": {"$nin": ["Waterloo"]}}))
+        self.assertFalse(match_filter(self.md, {"zip_code": {"$eq": "50701"}}))
+        self.assertTrue(match_filter(self.md, {"zip_code": {"$exists": False}}))
+        with self.assertRaises(ValueError):
+            match_filter(self.md, {"city": {"$regex": "W.*"}})
+
+
+class LocalBackendTests(unittest.TestCase):
+    def setUp(self):
+        self.backend = LocalBackend()
+        self.backend.upsert(_records(), namespace="ns")
+
+    def test_top_k_is_ordered_by_cosine(self):
+        hits = self.backend.query([1.0, 0.1, 0.0], top_k=2, namespace="ns")
+
+        self.assertEqual([h["id"] for h in hits], ["pantry", "shelter"])
+        self.assertGreater(hits[0]["score"], hits[1]["score"])
+        self.assertLessEqual(hits[0]["score"], 1.0 + 1e-6)
+
+    def test_filter_restricts_candidates(self):
+        hits = self.backend.query(
+            [1.0, 0.0, 0.0], top_k=5, namespace="ns",
+            metadata_filter={"city": {"$eq": "Cedar Falls"}, "languages": "Spanish"},
+        )
+        self.assertEqual([h["id"] for h in hits], ["clinic"])
+        self.assertEqual(self.backend.query([1.0, 0.0, 0.0], 5, {"city": "Ames"}, "ns"), [])
+
+    def test_unknown_namespace_and_dimension_mismatch(self):
+        self.assertEqual(self.backend.query([1.0, 0.0, 0.0], 3, namespace="other"), [])
+        with self.assertRaises(ValueError):
+            self.backend.query([1.0, 0.0], 3, namespace="ns")
+
+    def test_upsert_replaces_vector_and_metadata(self):
+        self.backend.query([0.0, 0.0, 1.0], 1, {"city": "Waterloo"}, "ns")
+        self.backend.upsert(
+            [{"id": "pantry", "values": [0.0, 0.0, 1.0], "metadata": {"city": "Waterloo"}}], namespace="ns"
+        )
+
+        hits = self.backend.query([0.0, 0.0, 1.0], 1, {"city": "Waterloo"}, "ns")
+        self.assertEqual(hits[0]["id"], "pantry")
+        self.assertEqual(len(self.backend), 4)
+
+    def test_one_at_a_time_upserts_grow_the_buffer_geometrically(self):
+        snapshot = self.backend._shards["ns"]
+        buffers = set()
+        for i in range(200):
+            self.backend.upsert([{"id": f"svc-{i}", "values": [1.0, i, 0.0]}], namespace="ns")
+            buffers.add(id(self.backend._shards["ns"].buffer))
+
+        self.assertEqual(len(self.backend), 204)
+        self.assertLessEqual(len(buffers), 7)
+        # A shard taken before the upserts still sees only its own four rows.
+        self.assertEqual(snapshot.count, 4)
+        self.assertEqual(len(snapshot.matrix), 4)
+
+    def test_save_load_round_trip_in_float16(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.backend.save(tmp)
+            loaded = LocalBackend.load(tmp, dtype="float16")
+
+        self.assertEqual(loaded._shards["ns"].matrix.dtype, np.float16)
+        expected = self.backend.query([0.6, 0.8, 0.0], 4, namespace="ns")
+        actual = asyncio.run(loaded.query_async([0.6, 0.8, 0.0], 4, namespace="ns"))
+        self.assertEqual([h["id"] for h in actual], [h["id"] for h in expected])
+        self.assertAlmostEqual(actual[0]["score"], expected[0]["score"], places=3)
+
+
+if __name__ == "__main__":
+    unittest.main()